@@ -1,20 +1,30 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-from ta.trend import MACD
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
 import logging
+from indicators import compute_indicators, INDICATOR_COLUMNS
+from price_cache import get_price_cache, base_interval
+from resample import resample_ohlcv
+from downsampling import chart_indices, CHART_MAX_POINTS, CHART_FULL_TAIL
+from metrics import timed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def fetch_stock_data(ticker, period='1y'):
+@timed('fetch_stock_data')
+def fetch_stock_data(ticker, period='1y', cache=None, interval='1d'):
+    """Price bars of a ticker over ``period``, at ``interval`` (1m ... 4h, 1d).
+    
+    Intraday bars are built from the finest interval Yahoo serves for the
+    period (see base_interval), so every timeframe of a ticker shares one
+    cached series and switching timeframes never downloads again.
+    """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        cache = cache or get_price_cache()
+        base = base_interval(interval, period)
+        hist = cache.get(ticker, period, interval=base)
+        if base != interval and not hist.empty:
+            hist = resample_ohlcv(hist, interval)
         
         if hist.empty:
             logger.warning(f"No data found for ticker: {ticker}")
@@ -31,57 +41,40 @@ def fetch_stock_data(ticker, period='1y'):
         logger.error(f"Error fetching data for {ticker}: {str(e)}")
         return pd.DataFrame()
 
-def calculate_technical_indicators(data):
+@timed('calculate_technical_indicators')
+def calculate_technical_indicators(data, dtype=np.float64):
     if data.empty:
         return pd.DataFrame()
     
-    df = data.copy()
-    
     try:
-        # Always calculate RSI and Bollinger Bands
-        if len(df) >= 14:
-            rsi = RSIIndicator(df['Close'])
-            df['RSI'] = rsi.rsi()
-        else:
-            df['RSI'] = np.nan
-            
-        if len(df) >= 20:
-            bb = BollingerBands(df['Close'])
-            df['BB_Upper'] = bb.bollinger_hband()
-            df['BB_Lower'] = bb.bollinger_lband()
-        else:
-            df['BB_Upper'] = np.nan
-            df['BB_Lower'] = np.nan
+        # A NaN close would poison the kernel's prefix sums from there on
+        close = data['Close']
+        if close.isna().any():
+            data = data[close.notna()]
+        n = len(data)
+        # Use longest possible moving average when there are fewer than 200 rows
+        long_window = 200 if n >= 200 else min(n, 100)
+        values = compute_indicators(data['Close'].to_numpy(), sma_slow=long_window, dtype=dtype)
         
-        # Moving averages
-        if len(df) >= 50:
-            df['SMA_50'] = df['Close'].rolling(window=50).mean()
-        else:
-            df['SMA_50'] = np.nan
-            
-        if len(df) >= 200:
-            df['SMA_200'] = df['Close'].rolling(window=200).mean()
-        else:
-            # Use longest possible moving average
-            window = min(len(df), 100)
-            df['SMA_Long'] = df['Close'].rolling(window=window).mean()
+        names = list(INDICATOR_COLUMNS)
+        names[names.index('SMA_Fast')] = 'SMA_50'
+        names[names.index('SMA_Slow')] = 'SMA_200' if n >= 200 else 'SMA_Long'
         
-        # MACD
-        if len(df) >= 26:
-            macd = MACD(df['Close'])
-            df['MACD'] = macd.macd()
-            df['Signal_Line'] = macd.macd_signal()
-        else:
-            df['MACD'] = np.nan
-            df['Signal_Line'] = np.nan
-            
-        return df.dropna()
+        # Keep only rows where every column is populated (same as dropna()).
+        # Indicator gaps are a warm-up prefix, so this is usually a slice.
+        valid = ~np.isnan(values).any(axis=1) & data.notna().all(axis=1).to_numpy()
+        first = valid.argmax() if valid.any() else len(valid)
+        rows = slice(first, None) if valid[first:].all() else valid
+        columns = {col: data[col].to_numpy()[rows] for col in data.columns}
+        columns.update((name, values[rows, i]) for i, name in enumerate(names))
+        return pd.DataFrame(columns, index=data.index[rows])
     
     except Exception as e:
         logger.error(f"Error calculating indicators: {str(e)}")
         return pd.DataFrame()
 
-def generate_signals(data):
+@timed('generate_signals')
+def generate_signals(data, rsi_upper=70, rsi_lower=30):
     if data.empty:
         return "NO DATA", 0.0
     
@@ -111,9 +104,9 @@ def generate_signals(data):
         
         # RSI signal
         if not pd.isna(latest.get('RSI', np.nan)):
-            if latest['RSI'] > 70:
+            if latest['RSI'] > rsi_upper:
                 rsi_signal = "Overbought"
-            elif latest['RSI'] < 30:
+            elif latest['RSI'] < rsi_lower:
                 rsi_signal = "Oversold"
         
         # Combine signals with priority logic
@@ -139,7 +132,82 @@ def generate_signals(data):
         logger.error(f"Error generating signals: {str(e)}")
         return "ERROR", 0.0
 
-def plot_technical_chart(data, ticker):
+# Action codes produced by signal_arrays, indexing into these tables
+ACTION_LABELS = np.array(['HOLD', 'BUY', 'STRONG BUY', 'SELL', 'STRONG SELL'])
+ACTION_ALLOCATIONS = np.array([0.0, 0.10, 0.15, 0.15, 0.25])
+# +1 for buy actions, -1 for sell actions
+ACTION_DIRECTIONS = np.array([0, 1, 1, -1, -1])
+
+def signal_arrays(trend_fast, trend_slow, macd, signal_line, rsi, rsi_upper=70, rsi_lower=30):
+    """Vectorized form of the generate_signals rules.
+
+    Takes indicator arrays of any shape and returns ``(codes, allocations)``
+    of the same shape, where ``codes`` index into ACTION_LABELS. The trend is
+    bullish when ``trend_fast > trend_slow`` (SMA 50 vs 200, or close vs the
+    long SMA on short histories).
+    """
+    trend_valid = ~(np.isnan(trend_fast) | np.isnan(trend_slow))
+    bullish = trend_valid & (trend_fast > trend_slow)
+    bearish = trend_valid & ~(trend_fast > trend_slow)
+
+    macd_valid = ~(np.isnan(macd) | np.isnan(signal_line))
+    macd_buy = macd_valid & (macd > signal_line)
+    macd_sell = macd_valid & ~(macd > signal_line)
+
+    overbought = rsi > rsi_upper
+    oversold = rsi < rsi_lower
+
+    codes = np.select(
+        [bullish & macd_buy & oversold,
+         bearish & macd_sell & overbought,
+         bullish & macd_buy,
+         bearish & macd_sell],
+        [2, 4, 1, 3],
+        default=0
+    ).astype(np.int8)
+    return codes, ACTION_ALLOCATIONS[codes]
+
+def generate_signal_series(data, rsi_upper=70, rsi_lower=30):
+    """Action label and allocation for every bar of a calculate_technical_indicators frame."""
+    if data.empty:
+        return np.array([], dtype=ACTION_LABELS.dtype), np.array([])
+    
+    nan = np.full(len(data), np.nan)
+    
+    def column(name):
+        return data[name].to_numpy(dtype=float) if name in data else nan
+    
+    trend_fast, trend_slow = column('SMA_50'), column('SMA_200')
+    # Fall back to close vs the long SMA where the 50/200 pair is unavailable
+    use_long = np.isnan(trend_fast) | np.isnan(trend_slow)
+    trend_fast = np.where(use_long, column('Close'), trend_fast)
+    trend_slow = np.where(use_long, column('SMA_Long'), trend_slow)
+    
+    codes, allocations = signal_arrays(
+        trend_fast, trend_slow, column('MACD'), column('Signal_Line'), column('RSI'),
+        rsi_upper=rsi_upper, rsi_lower=rsi_lower
+    )
+    return ACTION_LABELS[codes], allocations
+
+def _chart_view(data, columns, max_points, full_tail):
+    """Rows and trace type for one chart: all rows as SVG, or an LTTB subset as WebGL."""
+    import plotly.graph_objects as go
+    rows = chart_indices([data[col] for col in columns if col in data], max_points, full_tail)
+    if rows is None:
+        return data, go.Scatter
+    return data.iloc[rows], go.Scattergl
+
+@timed('plot_technical_chart')
+def plot_technical_chart(data, ticker, max_points=CHART_MAX_POINTS, full_tail=CHART_FULL_TAIL):
+    """Price, MACD and RSI figures.
+    
+    Charts with more than ``max_points`` bars use Scattergl traces and an
+    LTTB-downsampled history, with the last ``full_tail`` bars kept at full
+    resolution; ``max_points=0`` always plots every bar.
+    """
+    # Plotly is only loaded once a chart is drawn; screening and backtests never need it
+    import plotly.graph_objects as go
+    
     price_fig = go.Figure()
     macd_fig = go.Figure()
     rsi_fig = go.Figure()
@@ -153,28 +221,31 @@ def plot_technical_chart(data, ticker):
     try:
         # Price Chart
         price_fig = go.Figure()
-        price_fig.add_trace(go.Scatter(x=data.index, y=data['Close'], name='Price', line=dict(color='blue')))
+        view, scatter = _chart_view(
+            data, ['Close', 'SMA_50', 'SMA_200', 'SMA_Long', 'BB_Upper', 'BB_Lower'], max_points, full_tail
+        )
+        price_fig.add_trace(scatter(x=view.index, y=view['Close'], name='Price', line=dict(color='blue')))
         
         # Add moving averages if available
         if 'SMA_50' in data and not data['SMA_50'].isnull().all():
-            price_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['SMA_50'], 
+            price_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['SMA_50'], 
                 name='50-Day SMA', 
                 line=dict(color='orange', dash='dash')
             ))
             
         if 'SMA_200' in data and not data['SMA_200'].isnull().all():
-            price_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['SMA_200'], 
+            price_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['SMA_200'], 
                 name='200-Day SMA', 
                 line=dict(color='purple', dash='dash')
             ))
         elif 'SMA_Long' in data and not data['SMA_Long'].isnull().all():
-            price_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['SMA_Long'], 
+            price_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['SMA_Long'], 
                 name=f'{len(data)}-Day SMA', 
                 line=dict(color='green', dash='dash')
             ))
@@ -182,16 +253,16 @@ def plot_technical_chart(data, ticker):
         # Add Bollinger Bands if available
         if 'BB_Upper' in data and not data['BB_Upper'].isnull().all() and \
            'BB_Lower' in data and not data['BB_Lower'].isnull().all():
-            price_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['BB_Upper'], 
+            price_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['BB_Upper'], 
                 name='Upper Band', 
                 line=dict(color='rgba(255,0,0,0.3)'),
                 fill=None
             ))
-            price_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['BB_Lower'], 
+            price_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['BB_Lower'], 
                 name='Lower Band', 
                 line=dict(color='rgba(0,255,0,0.3)'),
                 fill='tonexty'
@@ -205,27 +276,29 @@ def plot_technical_chart(data, ticker):
         )
         
         # MACD Chart
+        view, scatter = _chart_view(data, ['MACD', 'Signal_Line'], max_points, full_tail)
         if 'MACD' in data and not data['MACD'].isnull().all() and \
            'Signal_Line' in data and not data['Signal_Line'].isnull().all():
-            macd_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['MACD'], 
+            macd_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['MACD'], 
                 name='MACD', 
                 line=dict(color='blue')
             ))
-            macd_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['Signal_Line'], 
+            macd_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['Signal_Line'], 
                 name='Signal Line', 
                 line=dict(color='orange')
             ))
             macd_fig.update_layout(title='MACD')
         
         # RSI Chart
+        view, scatter = _chart_view(data, ['RSI'], max_points, full_tail)
         if 'RSI' in data and not data['RSI'].isnull().all():
-            rsi_fig.add_trace(go.Scatter(
-                x=data.index, 
-                y=data['RSI'], 
+            rsi_fig.add_trace(scatter(
+                x=view.index, 
+                y=view['RSI'], 
                 name='RSI', 
                 line=dict(color='purple')
             ))
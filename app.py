@@ -1,13 +1,10 @@
 import streamlit as st
 from auth import auth_guard, logout
 from db import db
-from analysis import fetch_stock_data, calculate_technical_indicators, generate_signals, plot_technical_chart
-from reports import report_history_section, display_report
-from chatbot import chatbot  # Import the chatbot
+import metrics
 import json
 import os
-import pandas as pd
-import numpy as np
+import time
 
 # Initialize session state
 if 'authenticated' not in st.session_state:
@@ -17,6 +14,9 @@ if 'chat_history' not in st.session_state:
 if 'current_analysis' not in st.session_state:
     st.session_state.current_analysis = None
 
+# Prometheus endpoint/file if METRICS_PORT or METRICS_FILE is set (once per server process)
+metrics.start_exporter()
+
 # Page configuration
 st.set_page_config(
     page_title="Stock Analyst AI",
@@ -27,6 +27,28 @@ st.set_page_config(
 # Authentication guard
 auth_guard()
 
+# Imported after the login check, so the login page doesn't load the
+# analysis and chatbot stack
+from reports import report_history_section, report_picker, display_report
+from chatbot import chatbot, ChatReply  # Import the chatbot
+from screener import screen_watchlist
+from report_payload import report_digest, report_figures
+from jobs import enqueue_analysis, get_job, queue_position
+from price_cache import base_interval
+from conversation import ConversationMemory
+from ingest import latest_signals, is_stale
+
+# Bar sizes offered in the forms; intraday bars are built from one cached base series
+BAR_INTERVALS = ['1d', '4h', '1h', '30m', '15m', '5m', '1m']
+INTERVAL_HELP = "Yahoo keeps 1-minute bars for 7 days, 5 to 30-minute bars for 60 days and hourly bars for 2 years"
+# A day or a week of daily bars is too short to analyse, so those periods are intraday only
+DAILY_PERIODS = ['1mo', '3mo', '6mo', '1y', '2y']
+INTRADAY_PERIODS = ['1d', '5d'] + DAILY_PERIODS
+
+def period_options(interval):
+    """Analysis periods offered for bars of ``interval``."""
+    return DAILY_PERIODS if interval == '1d' else INTRADAY_PERIODS
+
 # Main application
 st.title(f"📈 Stock Analyst Portal - {st.session_state['role'].capitalize()} View")
 st.sidebar.title(f"Welcome, {st.session_state['username']}")
@@ -40,19 +62,24 @@ if st.sidebar.button("Logout"):
 st.sidebar.divider()
 st.sidebar.subheader("AI Analyst Assistant")
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Initialize chat memory (recent turns plus a running summary of older ones)
+if "conversation" not in st.session_state:
+    # Older turns are summarized on the LLM orchestrator's loop, not on this script thread
+    st.session_state.conversation = ConversationMemory(summarizer=chatbot.submit_summary)
+conversation = st.session_state.conversation
 
-# Display chat messages
-for message in st.session_state.messages:
+# Display the most recent chat messages
+if conversation.hidden():
+    with st.sidebar.expander(f"{conversation.hidden()} earlier messages (summarized)"):
+        st.markdown(conversation.summary or "No summary yet.")
+for message in conversation.display:
     with st.sidebar.chat_message(message["role"]):
         st.sidebar.markdown(message["content"])
 
 # Chat input
 if prompt := st.sidebar.chat_input("Ask about the analysis..."):
-    # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    # Earlier turns to send along with the new question
+    history = conversation.history()
     
     # Display user message
     with st.sidebar.chat_message("user"):
@@ -73,23 +100,113 @@ if prompt := st.sidebar.chat_input("Ask about the analysis..."):
         
         # Check if user is asking about charts
         if "chart" in prompt.lower() or "graph" in prompt.lower() or "visual" in prompt.lower():
-            if st.session_state.current_analysis and st.session_state.current_analysis.get('charts'):
-                # Use GPT-4 Vision to analyze the charts
-                analysis = chatbot.analyze_charts(
-                    st.session_state.current_analysis['charts'], 
-                    prompt
+            if st.session_state.current_analysis and st.session_state.current_analysis.get('digest'):
+                # Send the chart digest rather than the full figure JSON
+                chunks = chatbot.stream_analyze_charts(
+                    st.session_state.current_analysis['digest'], 
+                    prompt,
+                    history
                 )
-                full_response = analysis
             else:
-                full_response = "No charts available for analysis. Please generate a stock analysis first."
+                chunks = ChatReply(["No charts available for analysis. Please generate a stock analysis first."],
+                                   failed=True)
         else:
             # Use regular chat for other questions
-            full_response = chatbot.general_chat(prompt, context)
+            chunks = chatbot.stream_general_chat(prompt, context, history)
         
+        # Render tokens as they arrive
+        for chunk in chunks:
+            full_response += chunk
+            message_placeholder.markdown(full_response + "▌")
         message_placeholder.markdown(full_response)
     
-    # Add assistant response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": full_response})
+    # Add the turn to the chat history; failed replies are shown but not remembered
+    conversation.add("user", prompt, remember=not chunks.failed)
+    conversation.add("assistant", full_response, remember=not chunks.failed)
+
+# Background analysis jobs
+@st.fragment(run_every=1)
+def analysis_job_status(job_id):
+    """Polls a queued analysis without rerunning the page; reruns it once the job ends."""
+    job = get_job(job_id)
+    if job is None or job['status'] not in ('queued', 'running'):
+        st.rerun()
+    if job['status'] == 'running':
+        st.info(f"Analyzing {job['ticker']}...")
+    else:
+        ahead = queue_position(job_id) or 0
+        st.info(f"{job['ticker']} is queued for analysis ({ahead} jobs ahead)")
+        if time.time() - float(job['created']) > 10:
+            st.caption("No worker has picked this job up yet. Is `python worker.py` running?")
+
+# Published by ingest.py; the page rereads the hash, it never polls Yahoo
+@st.fragment(run_every=2)
+def live_signals(tickers):
+    signals = {t: s for t, s in latest_signals(include_stale=True).items() if not tickers or t in tickers}
+    now = time.time()
+    stale = sorted(t for t, s in signals.items() if is_stale(s, now))
+    rows = [
+        {'Ticker': t, 'Action': s['action'], 'Previous': s['previous'], 'Price': s.get('last_price', s['price']),
+         'Allocation': f"{float(s['allocation']) * 100:.0f}%",
+         'Since': time.strftime('%H:%M:%S', time.localtime(float(s['ts']))),
+         'Last Quote': time.strftime('%H:%M:%S', time.localtime(float(s.get('last_ts', s['ts']))))}
+        for t, s in signals.items() if t not in stale
+    ]
+    if rows:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    else:
+        st.caption("No live signals yet. Start `python ingest.py run <tickers>` to stream quotes.")
+    if stale:
+        st.caption(f"No recent quotes, not shown: {', '.join(stale)}")
+
+def show_analysis_job(job):
+    result = job['result']
+    ticker, action, allocation = job['ticker'], result['action'], result['allocation']
+
+    # Charts are rebuilt from the saved report once per job
+    cached = st.session_state.get('analysis_figures')
+    if not cached or cached[0] != job['id']:
+        report = db.get_report(result['report_id'])
+        cached = (job['id'], report_figures(json.loads(report['analysis'])))
+        st.session_state.analysis_figures = cached
+    price_fig, macd_fig, rsi_fig = cached[1]
+
+    # Store current analysis in session state for chatbot
+    st.session_state.current_analysis = {
+        'ticker': ticker,
+        'action': action,
+        'allocation': allocation * 100,
+        'summary': result['summary'],
+        'digest': result['digest']
+    }
+
+    st.success("Analysis completed! Report saved.")
+
+    # Display results
+    # Keyed, as the same report can be open in the history section below
+    interval = job.get('interval', '1d')
+    st.subheader(f"Analysis for {ticker}" + (f" ({interval} bars)" if interval != '1d' else ""))
+    with metrics.timer('render_charts'):
+        st.plotly_chart(price_fig, use_container_width=True, key=f"job_price_{job['id']}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(macd_fig, use_container_width=True, key=f"job_macd_{job['id']}")
+        with col2:
+            st.plotly_chart(rsi_fig, use_container_width=True, key=f"job_rsi_{job['id']}")
+
+    col1, col2 = st.columns(2)
+    col1.metric("Recommended Action", action)
+    col2.metric("Portfolio Allocation", f"{allocation * 100:.2f}%")
+
+    st.markdown("**Technical Analysis Summary:**")
+    st.markdown(result['summary'])
+
+    # Suggest questions for the chatbot
+    st.info("Ask the AI Analyst in the sidebar about this analysis. Try questions like:")
+    st.markdown("- Explain the MACD crossover in this chart")
+    st.markdown("- What does the RSI indicate about this stock?")
+    st.markdown("- Why was a BUY recommendation given?")
 
 # Analyst View
 if st.session_state['role'] == 'analyst':
@@ -106,136 +223,95 @@ if st.session_state['role'] == 'analyst':
     if selected_investor:
         st.subheader(f"Analysis for {selected_investor}")
         
+        # Watchlist screener
+        with st.expander("Screen Watchlist"):
+            saved_watchlist = db.get_watchlist(selected_investor)
+            watchlist = st.text_area(
+                "Tickers (comma or newline separated)",
+                ", ".join(saved_watchlist) or "AAPL, MSFT, GOOGL"
+            )
+            tickers = watchlist.replace(',', ' ').split()
+            col1, col2 = st.columns(2)
+            screen_interval = col2.selectbox("Screening Interval", BAR_INTERVALS, help=INTERVAL_HELP)
+            screen_periods = period_options(screen_interval)
+            screen_period = col1.selectbox("Screening Period", screen_periods, index=screen_periods.index('1y'))
+            col1, col2 = st.columns(2)
+            if col1.button("Screen"):
+                try:
+                    base_interval(screen_interval, screen_period)
+                    with st.spinner("Screening watchlist..."):
+                        st.dataframe(screen_watchlist(tickers, screen_period, interval=screen_interval),
+                                     use_container_width=True)
+                except ValueError as e:
+                    st.error(str(e))
+            if col2.button("Save Watchlist"):
+                # Used by the nightly batch_reports.py run
+                saved = db.set_watchlist(selected_investor, tickers)
+                st.success(f"Saved {len(saved)} tickers for {selected_investor}")
+
+        with st.expander("Live Signals"):
+            live_signals({t.upper() for t in tickers})
+
+        # Outside the form, so changing it updates the periods on offer
+        interval = st.selectbox("Bar Interval", BAR_INTERVALS, help=INTERVAL_HELP, key='analysis_interval')
+        
         # Stock analysis form
         with st.form("stock_analysis"):
-            col1, col2 = st.columns([2, 3])
+            col1, col2 = st.columns(2)
             with col1:
                 ticker = st.text_input("Stock Ticker", "AAPL").upper()
             with col2:
-                st.markdown("<small>Select at least 6 months for full analysis</small>", unsafe_allow_html=True)
-                period = st.selectbox("Analysis Period", ['1mo', '3mo', '6mo', '1y', '2y'], index=3)  # Default to 1y
+                st.markdown("<small>Select at least 6 months of daily bars for full analysis</small>", unsafe_allow_html=True)
+                periods = period_options(interval)
+                period = st.selectbox("Analysis Period", periods, index=periods.index('1y'))  # Default to 1y
             
             submitted = st.form_submit_button("Analyze Stock")
             
             if submitted:
-                with st.spinner("Analyzing stock..."):
-                    try:
-                        # Fetch and process data
-                        data = fetch_stock_data(ticker, period)
-                        if data.empty:
-                            st.error("No data found for this ticker. Please try a different stock symbol.")
-                        else:
-                            processed_data = calculate_technical_indicators(data)
-                            
-                            # Check if we have enough data for indicators
-                            if processed_data.empty:
-                                st.warning(f"Not enough data to calculate all indicators. Got {len(data)} data points.")
-                            else:
-                                action, allocation = generate_signals(processed_data)
-                                
-                                # Generate charts
-                                price_fig, macd_fig, rsi_fig = plot_technical_chart(processed_data, ticker)
-                                
-                                # Get RSI value safely
-                                rsi_value = processed_data.iloc[-1].get('RSI', np.nan)
-                                rsi_display = f"{rsi_value:.2f}" if not pd.isna(rsi_value) else "N/A"
-                                
-                                # Prepare report
-                                analysis_data = {
-                                    'price_chart': price_fig.to_json(),
-                                    'macd_chart': macd_fig.to_json(),
-                                    'rsi_chart': rsi_fig.to_json(),
-                                    'summary': f"""
-                                        **Technical Analysis Summary:**
-                                        - Trend: {'Bullish' if 'Bullish' in action else 'Bearish' if 'Bearish' in action else 'Neutral'}
-                                        - MACD: {'Bullish' if 'Buy' in action else 'Bearish' if 'Sell' in action else 'Neutral'}
-                                        - RSI: {rsi_display}
-                                    """
-                                }
-                                
-                                # Save report
-                                report_id = db.save_report(
-                                    analyst=st.session_state['username'],
-                                    investor=selected_investor,
-                                    stock=ticker,
-                                    analysis=analysis_data,
-                                    action=action,
-                                    allocation=allocation
-                                )
-                                
-                                # Store current analysis in session state for chatbot
-                                st.session_state.current_analysis = {
-                                    'ticker': ticker,
-                                    'action': action,
-                                    'allocation': allocation * 100,
-                                    'summary': analysis_data['summary'],
-                                    'charts': {
-                                        'price_chart': price_fig.to_json(),
-                                        'macd_chart': macd_fig.to_json(),
-                                        'rsi_chart': rsi_fig.to_json()
-                                    }
-                                }
-                                
-                                st.success("Analysis completed! Report saved.")
-                                
-                                # Display results
-                                st.subheader(f"Analysis for {ticker}")
-                                st.plotly_chart(price_fig, use_container_width=True)
-                                
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.plotly_chart(macd_fig, use_container_width=True)
-                                with col2:
-                                    st.plotly_chart(rsi_fig, use_container_width=True)
-                                
-                                col1, col2 = st.columns(2)
-                                col1.metric("Recommended Action", action)
-                                col2.metric("Portfolio Allocation", f"{allocation * 100:.2f}%")
-                                
-                                st.markdown("**Technical Analysis Summary:**")
-                                st.markdown(analysis_data['summary'])
-                                
-                                # Suggest questions for the chatbot
-                                st.info("Ask the AI Analyst in the sidebar about this analysis. Try questions like:")
-                                st.markdown("- Explain the MACD crossover in this chart")
-                                st.markdown("- What does the RSI indicate about this stock?")
-                                st.markdown("- Why was a BUY recommendation given?")
-                    except Exception as e:
-                        st.error(f"Error analyzing stock: {str(e)}")
+                try:
+                    # Fail here rather than in the worker when Yahoo has no such history
+                    base_interval(interval, period)
+                    # Analysis runs in worker.py; the page only polls the job
+                    st.session_state.analysis_job = enqueue_analysis(
+                        st.session_state['username'], selected_investor, ticker, period, interval=interval
+                    )
+                except Exception as e:
+                    st.error(f"Error queuing analysis: {str(e)}")
+        
+        if st.session_state.get('analysis_job'):
+            job = get_job(st.session_state.analysis_job)
+            if job is None:
+                st.session_state.analysis_job = None
+            elif job['status'] in ('queued', 'running'):
+                analysis_job_status(st.session_state.analysis_job)
+            elif job['status'] == 'failed':
+                st.error(f"Error analyzing stock: {job.get('error')}")
+            else:
+                show_analysis_job(job)
         
         # Report history section
         st.divider()
         st.subheader(f"Historical Reports for {selected_investor}")
-        investor_reports = db.get_reports(selected_investor)
+        report = report_picker(selected_investor, key="investor_report")
         
-        if investor_reports:
-            report_titles = [f"{r['stock']} - {r['date']}" for r in investor_reports]
-            selected_report = st.selectbox("Select Report", report_titles, key="investor_report")
+        if report:
+            display_report(report)
             
-            if selected_report:
-                report_index = report_titles.index(selected_report)
-                report = investor_reports[report_index]
-                display_report(report)
+            # Set current analysis for chatbot
+            try:
+                analysis = json.loads(report['analysis'])
+                st.session_state.current_analysis = {
+                    'ticker': report['stock'],
+                    'action': report['action'],
+                    'allocation': float(report['allocation']) * 100,
+                    'summary': analysis['summary'],
+                    'digest': report_digest(analysis, report['stock'])
+                }
                 
-                # Set current analysis for chatbot
-                try:
-                    analysis = json.loads(report['analysis'])
-                    st.session_state.current_analysis = {
-                        'ticker': report['stock'],
-                        'action': report['action'],
-                        'allocation': float(report['allocation']) * 100,
-                        'summary': analysis['summary'],
-                        'charts': {
-                            'price_chart': analysis.get('price_chart', ''),
-                            'macd_chart': analysis.get('macd_chart', ''),
-                            'rsi_chart': analysis.get('rsi_chart', '')
-                        }
-                    }
-                    
-                    st.info(f"Now viewing {report['stock']} report from {report['date']}. " 
-                            "You can ask about this report in the AI Analyst sidebar.")
-                except:
-                    st.warning("Could not load report data for chatbot context")
+                st.info(f"Now viewing {report['stock']} report from {report['date']}. " 
+                        "You can ask about this report in the AI Analyst sidebar.")
+            except:
+                st.warning("Could not load report data for chatbot context")
         else:
             st.info("No reports available for this investor")
 
@@ -254,15 +330,22 @@ elif st.session_state['role'] == 'investor':
                 'action': report['action'],
                 'allocation': float(report['allocation']) * 100,
                 'summary': analysis['summary'],
-                'charts': {
-                    'price_chart': analysis.get('price_chart', ''),
-                    'macd_chart': analysis.get('macd_chart', ''),
-                    'rsi_chart': analysis.get('rsi_chart', '')
-                }
+                'digest': report_digest(analysis, report['stock'])
             }
         except:
             pass
 
+# Stage timings of this server process, for debugging slow pages
+if metrics.ENABLED and os.getenv('METRICS_PANEL', 'off').lower() in ('1', 'on', 'true'):
+    with st.sidebar.expander("Performance Metrics"):
+        rows = metrics.registry.snapshot()
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nothing timed yet.")
+        st.json(metrics.registry.counters(), expanded=False)
+        st.caption("Queued analyses are timed in worker.py, see its metrics endpoint.")
+
 # Admin initialization (run once)
 if os.environ.get('INIT_DB') == 'true':
     db.create_user('analyst1', 'analystpass', 'analyst')
@@ -0,0 +1,158 @@
+import json
+import metrics
+from db import (create_async_client, ActionPage, analyst_investors_key, full_report_rows, queue_analyst_index,
+                queue_assignment, queue_full_reports, queue_report, queue_report_actions, queue_report_meta,
+                queue_user, queue_watchlist, report_index_key, report_key, report_list_key, report_meta_rows,
+                score_range, user_key, watchlist_key)
+
+class AsyncRedisDB:
+    """asyncio version of RedisDB for batch jobs, with the same key layout and methods.
+
+    Keys, report hashes and metrics come from the helpers in db.py, so only
+    the awaiting differs between the two clients.
+    """
+
+    def __init__(self, client=None, settings=None):
+        self.r = client or create_async_client(settings)
+
+    async def close(self):
+        await self.r.aclose()
+
+    async def create_user(self, username, password, role, assigned_analyst=None):
+        if await self.r.exists(user_key(username)):
+            return False
+
+        pipe = self.r.pipeline()
+        queue_user(pipe, username, password, role, assigned_analyst)
+        await pipe.execute()
+        return True
+
+    async def authenticate_user(self, username, password):
+        if not await self.r.exists(user_key(username)):
+            return False
+
+        stored_password = await self.r.hget(user_key(username), 'password')
+        return stored_password == password
+
+    async def get_user_role(self, username):
+        return await self.r.hget(user_key(username), 'role')
+
+    async def get_assigned_analyst(self, investor_username):
+        return await self.r.hget(user_key(investor_username), 'assigned_analyst')
+
+    async def assign_analyst(self, investor_username, analyst_username):
+        if not await self.r.exists(user_key(investor_username)):
+            return False
+
+        previous = await self.r.hget(user_key(investor_username), 'assigned_analyst')
+        pipe = self.r.pipeline()
+        queue_assignment(pipe, investor_username, previous, analyst_username)
+        await pipe.execute()
+        return True
+
+    async def get_investors_for_analyst(self, analyst_username):
+        return sorted(await self.r.smembers(analyst_investors_key(analyst_username)))
+
+    async def rebuild_analyst_index(self, batch_size=500):
+        """See RedisDB.rebuild_analyst_index."""
+        keys = [key async for key in self.r.scan_iter(user_key('*'), count=batch_size)]
+        analysts = []
+        for i in range(0, len(keys), batch_size):
+            pipe = self.r.pipeline(transaction=False)
+            for key in keys[i:i + batch_size]:
+                pipe.hget(key, 'assigned_analyst')
+            analysts += await pipe.execute()
+
+        pipe = self.r.pipeline()
+        stale = [key async for key in self.r.scan_iter(analyst_investors_key('*'), count=batch_size)]
+        indexed = queue_analyst_index(pipe, keys, analysts, stale)
+        await pipe.execute()
+        return indexed
+
+    async def get_analysts(self):
+        return sorted([key.split(':', 1)[1] async for key in self.r.scan_iter(analyst_investors_key('*'), count=500)])
+
+    async def get_watchlist(self, investor):
+        return sorted(await self.r.smembers(watchlist_key(investor)))
+
+    async def set_watchlist(self, investor, tickers):
+        pipe = self.r.pipeline()
+        tickers = queue_watchlist(pipe, investor, tickers)
+        await pipe.execute()
+        return tickers
+
+    @metrics.timed('save_report')
+    async def save_report(self, analyst, investor, stock, analysis, action, allocation):
+        pipe = self.r.pipeline()
+        report_id = queue_report(pipe, analyst, investor, stock, analysis, action, allocation)
+        await pipe.execute()
+        return report_id
+
+    async def save_reports(self, reports, pipe=None):
+        """See RedisDB.save_reports."""
+        execute = pipe is None
+        pipe = pipe if pipe is not None else self.r.pipeline()
+        report_ids = [queue_report(pipe, **report) for report in reports]
+        if execute:
+            await pipe.execute()
+        return report_ids
+
+    async def get_report(self, report_id):
+        report = await self.r.hgetall(report_key(report_id))
+        return report or None
+
+    async def list_reports(self, username, offset=0, limit=20, stock=None, action=None,
+                           since=None, until=None, batch_size=100):
+        """Report metadata (no analysis payload), newest first. See RedisDB.list_reports."""
+        index_key = report_index_key(username, stock)
+        min_score, max_score = score_range(since, until)
+
+        if not action:
+            report_ids = await self.r.zrevrangebyscore(index_key, max_score, min_score, start=offset, num=limit)
+            return await self._report_meta(report_ids)
+
+        page, start = ActionPage(action, offset, limit), 0
+        while not page.full:
+            report_ids = await self.r.zrevrangebyscore(index_key, max_score, min_score, start=start, num=batch_size)
+            if not report_ids:
+                break
+            start += len(report_ids)
+            page.add(await self._report_meta(report_ids))
+        return page.reports
+
+    async def count_reports(self, username, stock=None, since=None, until=None, action=None, batch_size=500):
+        """See RedisDB.count_reports."""
+        index_key = report_index_key(username, stock)
+        min_score, max_score = score_range(since, until)
+        if not action:
+            return await self.r.zcount(index_key, min_score, max_score)
+
+        count, start = 0, 0
+        while True:
+            report_ids = await self.r.zrevrangebyscore(index_key, max_score, min_score, start=start, num=batch_size)
+            if not report_ids:
+                return count
+            start += len(report_ids)
+            pipe = self.r.pipeline(transaction=False)
+            queue_report_actions(pipe, report_ids)
+            count += sum(value == action for value in await pipe.execute())
+
+    async def _report_meta(self, report_ids):
+        pipe = self.r.pipeline(transaction=False)
+        queue_report_meta(pipe, report_ids)
+        return report_meta_rows(await pipe.execute())
+
+    @metrics.timed('get_reports')
+    async def get_reports(self, username):
+        report_ids = await self.r.lrange(report_list_key(username), 0, -1)
+        pipe = self.r.pipeline(transaction=False)
+        queue_full_reports(pipe, report_ids)
+        return full_report_rows(await pipe.execute())
+
+    async def scan_report_ids(self, batch_size=500):
+        """Async iterator over every report id."""
+        async for key in self.r.scan_iter(report_key('*'), count=batch_size):
+            yield key.split(':', 1)[1]
+
+    async def update_report_analysis(self, report_id, analysis):
+        await self.r.hset(report_key(report_id), 'analysis', json.dumps(analysis))
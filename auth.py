@@ -20,6 +20,9 @@ def logout():
     st.session_state.pop('authenticated', None)
     st.session_state.pop('username', None)
     st.session_state.pop('role', None)
+    st.session_state.pop('conversation', None)
+    st.session_state.pop('analysis_job', None)
+    st.session_state.pop('analysis_figures', None)
 
 def auth_guard():
     if 'authenticated' not in st.session_state or not st.session_state['authenticated']:
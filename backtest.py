@@ -0,0 +1,156 @@
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from analysis import signal_arrays, ACTION_DIRECTIONS, ACTION_LABELS
+from indicators import compute_indicators, INDICATOR_COLUMNS
+from price_cache import get_price_cache
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+# Parameters of the generate_signals rules, as used in the app
+DEFAULT_PARAMS = {
+    'sma_fast': 50,
+    'sma_slow': 200,
+    'rsi_upper': 70,
+    'rsi_lower': 30,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+}
+
+METRIC_COLUMNS = [
+    'total_return', 'annual_return', 'buy_hold_return', 'volatility', 'sharpe',
+    'max_drawdown', 'hit_rate', 'exposure', 'trades', 'bars',
+]
+
+_COL = {name: i for i, name in enumerate(INDICATOR_COLUMNS)}
+
+
+def signal_positions(close, **params):
+    """Action codes and signed target allocation for every bar of a close array.
+
+    Buy actions hold ``+allocation`` of the portfolio in the stock, sell
+    actions hold ``-allocation`` (short) and HOLD is flat. Bars before the
+    slow SMA has warmed up have no trend signal and therefore stay flat.
+    """
+    p = {**DEFAULT_PARAMS, **params}
+    values = indicator_values(close, **p)
+    return positions_from_indicators(values, p['rsi_upper'], p['rsi_lower'])
+
+
+def indicator_values(close, sma_fast=50, sma_slow=200, macd_fast=12, macd_slow=26, macd_signal=9,
+                     **_):
+    """compute_indicators for a parameter set; signal-only parameters are ignored."""
+    return compute_indicators(
+        close, sma_fast=sma_fast, sma_slow=sma_slow,
+        macd_fast=macd_fast, macd_slow=macd_slow, macd_signal=macd_signal
+    )
+
+
+def positions_from_indicators(values, rsi_upper=70, rsi_lower=30):
+    """Action codes and signed allocations from a compute_indicators array."""
+    codes, allocations = signal_arrays(
+        values[:, _COL['SMA_Fast']], values[:, _COL['SMA_Slow']],
+        values[:, _COL['MACD']], values[:, _COL['Signal_Line']], values[:, _COL['RSI']],
+        rsi_upper=rsi_upper, rsi_lower=rsi_lower
+    )
+    return codes, ACTION_DIRECTIONS[codes] * allocations
+
+
+def backtest_close(close, cost=0.0, periods_per_year=TRADING_DAYS, **params):
+    """Simulate the recommended allocations over a close price array.
+
+    The position decided at the close of bar ``t`` earns the return from
+    ``t`` to ``t + 1``; ``cost`` is charged per unit of allocation traded.
+    Returns a dict of METRIC_COLUMNS.
+    """
+    close = np.asarray(close, dtype=float)
+    _, positions = signal_positions(close, **params)
+    return simulate(close, positions, cost, periods_per_year)[0]
+
+
+def run_backtest(data, cost=0.0, periods_per_year=TRADING_DAYS, **params):
+    """Backtest one OHLCV frame, returning (per-bar DataFrame, metrics dict)."""
+    close = data['Close'].to_numpy(dtype=float)
+    codes, positions = signal_positions(close, **params)
+    metrics, equity = simulate(close, positions, cost, periods_per_year)
+    bars = pd.DataFrame({
+        'Close': close,
+        'Action': ACTION_LABELS[codes],
+        'Position': positions,
+        'Equity': equity,
+    }, index=data.index)
+    return bars, metrics
+
+
+def simulate(close, positions, cost=0.0, periods_per_year=TRADING_DAYS):
+    """Returns (metrics dict, equity curve) for a given signed position array."""
+    metrics = dict.fromkeys(METRIC_COLUMNS, np.nan)
+    metrics.update(trades=0, bars=len(close))
+    if len(close) < 2:
+        return metrics, np.ones(len(close))
+
+    asset_returns = close[1:] / close[:-1] - 1
+    held = positions[:-1]
+    turnover = np.abs(np.diff(positions, prepend=0.0))[:-1]
+    strategy_returns = held * asset_returns - cost * turnover
+
+    equity = np.cumprod(1 + strategy_returns)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+    active = held != 0
+    std = strategy_returns.std()
+
+    metrics.update(
+        total_return=equity[-1] - 1,
+        annual_return=equity[-1] ** (periods_per_year / len(strategy_returns)) - 1,
+        buy_hold_return=close[-1] / close[0] - 1,
+        volatility=std * np.sqrt(periods_per_year),
+        sharpe=strategy_returns.mean() / std * np.sqrt(periods_per_year) if std > 0 else np.nan,
+        max_drawdown=min(drawdown.min(), 0.0),
+        hit_rate=(strategy_returns[active] > 0).mean() if active.any() else np.nan,
+        exposure=active.mean(),
+        trades=int(np.count_nonzero(turnover)),
+    )
+    return metrics, np.concatenate(([1.0], equity))
+
+
+def backtest_universe(prices, cost=0.0, **params):
+    """Backtest every ticker in ``{ticker: frame or close array}``.
+
+    Returns one row of METRIC_COLUMNS per ticker, best total return first.
+    """
+    rows = []
+    start = time.perf_counter()
+    for ticker, data in prices.items():
+        close = data['Close'].to_numpy(dtype=float) if isinstance(data, pd.DataFrame) else data
+        try:
+            rows.append({'Ticker': ticker, **backtest_close(close, cost=cost, **params)})
+        except Exception as e:
+            logger.error(f"Error backtesting {ticker}: {str(e)}")
+
+    logger.info(f"Backtested {len(rows)} tickers in {time.perf_counter() - start:.2f}s")
+    table = pd.DataFrame(rows, columns=['Ticker'] + METRIC_COLUMNS)
+    return table.sort_values('total_return', ascending=False, na_position='last').reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the generate_signals rules")
+    parser.add_argument('tickers', nargs='+', help="Ticker symbols")
+    parser.add_argument('--period', default='5y')
+    parser.add_argument('--cost', type=float, default=0.0, help="Cost per unit of allocation traded")
+    parser.add_argument('--output', help="Write the table to this CSV file")
+    args = parser.parse_args()
+
+    prices = get_price_cache().get_many(args.tickers, args.period)
+    table = backtest_universe({t: f for t, f in prices.items() if not f.empty}, cost=args.cost)
+    if args.output:
+        table.to_csv(args.output, index=False)
+    print(table.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
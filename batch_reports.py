@@ -0,0 +1,227 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from db import db
+import metrics
+from pipeline import run_analysis
+from price_cache import get_price_cache
+
+logger = logging.getLogger(__name__)
+
+# Checkpoints are kept this long so a failed run can be resumed
+RUN_TTL = 7 * 24 * 3600
+
+
+def collect_jobs(database=None):
+    """{ticker: [(analyst, investor), ...]} for every investor's watchlist."""
+    database = database or db
+    jobs = {}
+    for analyst in database.get_analysts():
+        for investor in database.get_investors_for_analyst(analyst):
+            for ticker in database.get_watchlist(investor):
+                jobs.setdefault(ticker, []).append((analyst, investor))
+    return jobs
+
+
+def default_run_id(period, now=None):
+    return f"{(now or datetime.now()):%Y-%m-%d}-{period}"
+
+
+class BatchRun:
+    """One batch report run with a Redis checkpoint.
+
+    Every written report is recorded in ``batch_run:{run_id}:done`` in the
+    same transaction as the report itself, so running again with the same
+    run id skips what was already written and retries the rest.
+    """
+
+    def __init__(self, run_id, database=None):
+        self.run_id = run_id
+        self.db = database or db
+        self.key = f"batch_run:{run_id}"
+
+    def done(self):
+        return self.db.r.smembers(f"{self.key}:done")
+
+    def start(self, total):
+        pipe = self.db.r.pipeline()
+        pipe.hsetnx(self.key, 'started', str(datetime.now()))
+        pipe.hset(self.key, mapping={'status': 'running', 'total': total})
+        pipe.expire(self.key, RUN_TTL)
+        pipe.execute()
+
+    def write(self, reports):
+        """Save reports and mark their (investor, ticker) pairs done atomically."""
+        pipe = self.db.r.pipeline()
+        report_ids = self.db.save_reports(reports, pipe=pipe)
+        pipe.sadd(f"{self.key}:done", *(f"{r['investor']}:{r['stock']}" for r in reports))
+        pipe.expire(f"{self.key}:done", RUN_TTL)
+        pipe.hincrby(self.key, 'written', len(reports))
+        pipe.execute()
+        return report_ids
+
+    def finish(self, status, summary):
+        # 'written' is kept as the running total across resumed attempts
+        self.db.r.hset(self.key, mapping={'status': status, 'finished': str(datetime.now()),
+                                          **{k: str(v) for k, v in summary.items() if k != 'written'}})
+
+    def reset(self):
+        self.db.r.delete(self.key, f"{self.key}:done")
+
+
+def run_batch(period='1y', run_id=None, batch_size=100, write_batch=200, window=None,
+              progress_every=10.0, cache=None, database=None):
+    """Write a report for every (investor, watched ticker) pair.
+
+    Each ticker is fetched and analysed once, however many investors watch
+    it; prices are fetched in batches of ``batch_size`` with the next batch
+    downloading while the current one is analysed, and reports are written
+    ``write_batch`` at a time in one pipelined transaction. ``window`` (in
+    minutes) only warns when the run is projected to overrun it.
+    """
+    database = database or db
+    cache = cache or get_price_cache()
+    run = BatchRun(run_id or default_run_id(period), database)
+
+    jobs = collect_jobs(database)
+    done = run.done()
+    pending = {
+        ticker: [(a, i) for a, i in pairs if f"{i}:{ticker}" not in done]
+        for ticker, pairs in jobs.items()
+    }
+    pending = {ticker: pairs for ticker, pairs in pending.items() if pairs}
+    total = sum(len(pairs) for pairs in jobs.values())
+    todo = sum(len(pairs) for pairs in pending.values())
+    run.start(total)
+    logger.info(
+        f"Batch run {run.run_id}: {todo} of {total} reports to write for {len(pending)} tickers"
+        + (f" ({total - todo} already done)" if total > todo else "")
+    )
+
+    tickers = sorted(pending)
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    buffer, written, failed = [], 0, []
+    start = last_progress = time.perf_counter()
+    deadline = start + window * 60 if window else None
+
+    def flush():
+        nonlocal written
+        if buffer:
+            run.write(buffer)
+            written += len(buffer)
+            buffer.clear()
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        next_batch = prefetch.submit(cache.get_many, batches[0], period) if batches else None
+        for b, batch in enumerate(batches):
+            try:
+                next_batch.result()
+            except Exception as e:
+                # Tickers fall back to single fetches in run_analysis
+                logger.error(f"Error fetching batch {b + 1}/{len(batches)}: {str(e)}")
+            if b + 1 < len(batches):
+                next_batch = prefetch.submit(cache.get_many, batches[b + 1], period)
+
+            for ticker in batch:
+                try:
+                    result = run_analysis(ticker, period, price_cache=cache)
+                except Exception as e:
+                    logger.error(f"Error analyzing {ticker}: {str(e)}")
+                    result = {'status': 'error'}
+                if result['status'] != 'ok':
+                    failed.append(ticker)
+                    continue
+
+                for analyst, investor in pending[ticker]:
+                    buffer.append({
+                        'analyst': analyst, 'investor': investor, 'stock': ticker,
+                        'analysis': result['analysis_json'],
+                        'action': result['action'], 'allocation': result['allocation'],
+                    })
+                if len(buffer) >= write_batch:
+                    flush()
+
+                now = time.perf_counter()
+                if now - last_progress >= progress_every:
+                    last_progress = now
+                    _log_progress(written + len(buffer), todo, now - start, deadline)
+        flush()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'total': total,
+        'written': written,
+        'skipped': total - todo,
+        'failed_tickers': len(failed),
+        'elapsed_s': round(elapsed, 2),
+        'reports_per_s': round(written / elapsed, 1) if elapsed else 0.0,
+    }
+    run.finish('failed' if failed else 'done', summary)
+    if failed:
+        logger.warning(f"No report for {len(failed)} tickers: {', '.join(failed[:20])}")
+    logger.info(
+        f"Batch run {run.run_id} finished: {written} reports in {elapsed:.1f}s "
+        f"({summary['reports_per_s']} reports/s)"
+    )
+    return summary
+
+
+def _log_progress(count, todo, elapsed, deadline):
+    rate = count / elapsed if elapsed else 0.0
+    eta = (todo - count) / rate if rate else float('inf')
+    logger.info(f"{count}/{todo} reports, {rate:.1f} reports/s, ETA {eta:.0f}s")
+    if deadline is not None and time.perf_counter() + eta > deadline:
+        logger.warning(f"Projected to overrun the window by {time.perf_counter() + eta - deadline:.0f}s")
+
+
+def next_run_time(at, now=None):
+    """Next datetime for a daily 'HH:MM' schedule."""
+    now = now or datetime.now()
+    hour, minute = map(int, at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return target if target > now else target + timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reports for every investor's watchlist")
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--run-id', help="Checkpoint id; defaults to today's date and the period")
+    parser.add_argument('--fresh', action='store_true', help="Ignore the checkpoint of this run id")
+    parser.add_argument('--at', help="Run every day at this time (HH:MM) instead of once")
+    parser.add_argument('--window', type=float, help="Minutes the run should finish within")
+    parser.add_argument('--batch-size', type=int, default=100, help="Tickers fetched per download")
+    parser.add_argument('--write-batch', type=int, default=200, help="Reports per pipelined write")
+    args = parser.parse_args()
+    if args.at and args.run_id:
+        parser.error("--run-id can't be combined with --at, scheduled runs use one id per day")
+    metrics.start_exporter()
+
+    while True:
+        if args.at:
+            wake = next_run_time(args.at)
+            logger.info(f"Next batch run at {wake}")
+            time.sleep(max((wake - datetime.now()).total_seconds(), 0))
+
+        run_id = args.run_id or default_run_id(args.period)
+        try:
+            if args.fresh:
+                BatchRun(run_id).reset()
+            summary = run_batch(
+                period=args.period, run_id=run_id, batch_size=args.batch_size,
+                write_batch=args.write_batch, window=args.window
+            )
+        except Exception as e:
+            if not args.at:
+                raise
+            # One failed night must not end the schedule
+            logger.error(f"Batch run {run_id} failed: {str(e)}")
+            continue
+        print(' '.join(f"{k}={v}" for k, v in summary.items()))
+        if not args.at:
+            break
+
+
+if __name__ == '__main__':
+    main()
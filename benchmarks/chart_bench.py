@@ -0,0 +1,112 @@
+"""Figure size and build/serialize/render time of plot_technical_chart, full vs downsampled.
+
+Run from the repository root:
+
+    python -m benchmarks.chart_bench --bars 500 2500 10000 50000 --html charts.html
+
+Browser render time can't be measured from Python; --html writes a page that
+draws each variant with plotly.js and reports Plotly.newPlot times. If the
+optional kaleido package is installed, static image export time is measured
+as a rough render proxy as well.
+"""
+import argparse
+import json
+import time
+import pandas as pd
+import plotly
+from analysis import calculate_technical_indicators, plot_technical_chart
+from downsampling import CHART_MAX_POINTS
+from benchmarks.synthetic import synthetic_ohlcv
+
+
+def synthetic_frame(bars, seed=0):
+    """Synthetic daily bars run through the indicators, with warm-up rows dropped."""
+    data = synthetic_ohlcv('BENCH', bars + 200, seed, end='2025-01-01')
+    return calculate_technical_indicators(data).iloc[-bars:]
+
+
+def _timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def measure(data, max_points, repeat=3):
+    figures, build = _timed(lambda: plot_technical_chart(data, 'BENCH', max_points=max_points), repeat)
+    payloads, serialize = _timed(lambda: [fig.to_json() for fig in figures], repeat)
+    row = {
+        'bars': len(data),
+        'mode': 'downsampled' if max_points else 'full',
+        'trace_type': type(figures[0].data[0]).__name__,
+        'points': sum(len(trace.x) for fig in figures for trace in fig.data),
+        'json_kb': round(sum(len(p) for p in payloads) / 1024, 1),
+        'build_ms': round(build * 1000, 1),
+        'to_json_ms': round(serialize * 1000, 1),
+    }
+    try:
+        import kaleido  # noqa: F401
+        _, image = _timed(lambda: [fig.to_image(format='png') for fig in figures], 1)
+        row['image_ms'] = round(image * 1000, 1)
+    except ImportError:
+        pass
+    return row, payloads
+
+
+def write_html(path, cases):
+    """Page drawing every case with plotly.js and timing Plotly.newPlot."""
+    blocks, specs = [], []
+    for i, (label, payloads) in enumerate(cases):
+        blocks.append(f"<h3>{label}</h3><div id='t{i}'></div>" + ''.join(
+            f"<div id='c{i}_{j}' style='height:300px'></div>" for j in range(len(payloads))
+        ))
+        specs.append({'label': label, 'figs': [json.loads(p) for p in payloads]})
+    script = """
+    const cases = %s;
+    (async () => {
+      for (const [i, c] of cases.entries()) {
+        const start = performance.now();
+        for (const [j, f] of c.figs.entries()) {
+          await Plotly.newPlot(`c${i}_${j}`, f.data, f.layout);
+        }
+        document.getElementById(`t${i}`).textContent =
+          `newPlot: ${(performance.now() - start).toFixed(1)} ms`;
+      }
+    })();
+    """ % json.dumps(specs)
+    with open(path, 'w') as f:
+        f.write("<html><head><script src='https://cdn.plot.ly/plotly-2.35.2.min.js'></script></head><body>")
+        f.write(''.join(blocks))
+        f.write(f"<script>{script}</script></body></html>")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs downsampled technical charts")
+    parser.add_argument('--bars', type=int, nargs='+', default=[500, 2500, 10000, 50000])
+    parser.add_argument('--max-points', type=int, default=CHART_MAX_POINTS or 2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    parser.add_argument('--html', help="Write a browser render benchmark page")
+    args = parser.parse_args()
+
+    rows, cases = [], []
+    for bars in args.bars:
+        data = synthetic_frame(bars)
+        for max_points in (0, args.max_points):
+            row, payloads = measure(data, max_points, args.repeat)
+            rows.append(row)
+            cases.append((f"{bars} bars, {row['mode']}", payloads))
+
+    print(pd.DataFrame(rows).to_string(index=False))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'charts', 'plotly': plotly.__version__, 'results': rows}, f, indent=2)
+    if args.html:
+        write_html(args.html, cases)
+        print(f"Open {args.html} in a browser for plotly.js render times")
+
+
+if __name__ == '__main__':
+    main()
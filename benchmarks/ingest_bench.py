@@ -0,0 +1,95 @@
+"""Quote ingestion throughput and signal fan-out latency.
+
+Run from the repository root:
+
+    python -m benchmarks.ingest_bench --tickers 20 --json ingest.json
+
+Synthetic minute bars are turned into four quotes each (open, high, low,
+close) and replayed through a QuoteIngestor without warm-up, as fast as
+possible and --batch-size quotes per pipeline. A consumer thread blocks
+on read_signals and records how long each signal change took from being
+published to being read. Uses the memory:// Redis stand-in unless
+--redis-url is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def replay_file(tickers, days):
+    from benchmarks.synthetic import synthetic_minutes
+    from ingest import write_replay
+    quotes = []
+    for ticker in tickers:
+        frame = synthetic_minutes(ticker, days)
+        epoch = frame.index.tz_convert('UTC').asi8 / 1e9
+        prices = frame[['Open', 'High', 'Low', 'Close']].to_numpy()
+        volumes = frame['Volume'].to_numpy() / 4
+        for ts, bar, volume in zip(epoch, prices, volumes):
+            quotes += [(ticker, ts + offset, price, volume) for offset, price in zip((1, 20, 40, 59), bar)]
+    quotes.sort(key=lambda q: q[1])
+    path = tempfile.mktemp(prefix='ingest_bench_', suffix='.csv')
+    write_replay(quotes, path)
+    return path, len(quotes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live quote ingestion")
+    parser.add_argument('--tickers', type=int, default=20)
+    parser.add_argument('--days', type=int, default=2, help="Sessions of minute bars per ticker")
+    parser.add_argument('--batch-size', type=int, default=100, help="Quotes per Redis pipeline")
+    parser.add_argument('--redis-url', help="Redis to benchmark against (default memory://)")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    args = parser.parse_args()
+    os.environ['REDIS_URL'] = args.redis_url or 'memory://'
+
+    from benchmarks.synthetic import ticker_names
+    from ingest import QuoteIngestor, ReplaySource, read_signals
+
+    path, count = replay_file(ticker_names(args.tickers), args.days)
+    latencies, stop = [], threading.Event()
+
+    def consume():
+        last_id = '$'
+        while not stop.is_set():
+            last_id, changes = read_signals(last_id, block=200, count=1000)
+            now = time.time()
+            latencies.extend(now - float(change['published']) for change in changes)
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    time.sleep(0.3)
+    try:
+        start = time.perf_counter()
+        QuoteIngestor('1m', warmup=False).run(ReplaySource(path, batch_size=args.batch_size))
+        elapsed = time.perf_counter() - start
+    finally:
+        os.remove(path)
+    time.sleep(0.5)
+    stop.set()
+    consumer.join()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) if latencies else float('nan')
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float('nan')
+    print(f"{count} quotes for {args.tickers} tickers in {elapsed:.2f}s ({count / elapsed:.0f} quotes/s)")
+    print(f"  {len(latencies)} signal changes, published -> read: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'benchmark': 'ingest',
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'params': {'tickers': args.tickers, 'days': args.days, 'batch_size': args.batch_size},
+                'results': {'quotes': count, 'seconds': round(elapsed, 3),
+                            'quotes_per_s': round(count / elapsed), 'signal_changes': len(latencies),
+                            'latency_p50_ms': round(p50 * 1000, 2), 'latency_p99_ms': round(p99 * 1000, 2)},
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
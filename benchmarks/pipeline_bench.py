@@ -0,0 +1,181 @@
+"""Stage timings of the analysis pipeline on synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_bench --json bench.json
+    python -m benchmarks.pipeline_bench --json new.json --compare bench.json
+
+Prices come from a deterministic stub provider (benchmarks/synthetic.py)
+behind an in-memory PriceCache, and reports go to the 'memory://' Redis
+stand-in unless --redis-url points at a real server. Every stage is timed
+per ticker (best of --repeat) and summarised per period as median, p95 and
+total milliseconds.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import plotly
+from analysis import fetch_stock_data, calculate_technical_indicators, generate_signals, plot_technical_chart
+from chart_digest import build_digest
+from db import RedisDB, redis_settings
+from pipeline import build_summary
+from price_cache import PriceCache
+from report_payload import encode_analysis
+from benchmarks.synthetic import PERIOD_BARS, FETCH_PERIODS, SyntheticSource, ticker_names
+
+STAGES = ['fetch_cold', 'fetch_warm', 'indicators', 'signals', 'chart', 'to_json', 'digest',
+          'save_report', 'get_reports']
+
+
+def _timed(func, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def bench_period(period, tickers, database, repeat=3, seed=0):
+    """{stage: [seconds per ticker]} plus the median bar count for one period.
+
+    Stages after the indicators are skipped for tickers whose history is
+    too short to produce any indicator rows.
+    """
+    source = SyntheticSource(seed)
+    source.prepare(tickers)
+    cache = PriceCache(':memory:', source=source)
+    fetch_period = FETCH_PERIODS.get(period, period)
+    investor = f"bench_investor_{period}"
+    timings = {stage: [] for stage in STAGES}
+    bars = []
+
+    for ticker in tickers:
+        data, t = _timed(lambda: fetch_stock_data(ticker, fetch_period, cache=cache))
+        timings['fetch_cold'].append(t)
+        _, t = _timed(lambda: fetch_stock_data(ticker, fetch_period, cache=cache), repeat)
+        timings['fetch_warm'].append(t)
+        bars.append(len(data))
+
+        processed, t = _timed(lambda: calculate_technical_indicators(data), repeat)
+        timings['indicators'].append(t)
+        if processed.empty:
+            # Too short for the indicator warm-up; nothing downstream runs in the app either
+            continue
+        (action, allocation), t = _timed(lambda: generate_signals(processed), repeat)
+        timings['signals'].append(t)
+        figures, t = _timed(lambda: plot_technical_chart(processed, ticker), repeat)
+        timings['chart'].append(t)
+        _, t = _timed(lambda: [fig.to_json() for fig in figures], repeat)
+        timings['to_json'].append(t)
+        _, t = _timed(lambda: build_digest(processed, ticker), repeat)
+        timings['digest'].append(t)
+
+        summary = build_summary(action, processed.iloc[-1].get('RSI', np.nan))
+        payload = json.dumps(encode_analysis(processed, ticker, summary))
+        _, t = _timed(lambda: database.save_report(
+            analyst='bench_analyst', investor=investor, stock=ticker,
+            analysis=payload, action=action, allocation=allocation
+        ))
+        timings['save_report'].append(t)
+
+    # Reads of everything written for the period, as the report list does
+    for _ in range(repeat if timings['save_report'] else 0):
+        _, t = _timed(lambda: database.get_reports(investor))
+        timings['get_reports'].append(t)
+    database.r.delete(f"reports:{investor}")
+    return timings, int(np.median(bars))
+
+
+def summarize(period, bars, timings):
+    rows = []
+    for stage, values in timings.items():
+        if not values:
+            continue
+        ms = np.array(values) * 1000
+        rows.append({
+            'period': period,
+            'bars': bars,
+            'stage': stage,
+            'calls': len(ms),
+            'median_ms': round(float(np.median(ms)), 3),
+            'p95_ms': round(float(np.percentile(ms, 95)), 3),
+            'total_ms': round(float(ms.sum()), 1),
+        })
+    return rows
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip()
+    except Exception:
+        commit = ''
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def compare(rows, baseline_path):
+    """Print the median change of every (period, stage) against an earlier result file."""
+    with open(baseline_path) as f:
+        baseline = {(r['period'], r['stage']): r for r in json.load(f)['results']}
+    table = []
+    for row in rows:
+        old = baseline.get((row['period'], row['stage']))
+        if old and old['median_ms']:
+            table.append({
+                'period': row['period'], 'stage': row['stage'],
+                'baseline_ms': old['median_ms'], 'median_ms': row['median_ms'],
+                'change': f"{row['median_ms'] / old['median_ms'] - 1:+.1%}",
+            })
+    print(pd.DataFrame(table).to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic data")
+    parser.add_argument('--periods', nargs='+', default=list(PERIOD_BARS), choices=list(PERIOD_BARS))
+    parser.add_argument('--tickers', type=int, default=20, help="Synthetic tickers per period")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per ticker; the best is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--redis-url', default='memory://', help="Redis for the report stages")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Earlier --json file to compare against")
+    args = parser.parse_args()
+
+    database = RedisDB(settings={**redis_settings(), 'url': args.redis_url})
+    tickers = ticker_names(args.tickers)
+    rows = []
+    for period in args.periods:
+        timings, bars = bench_period(period, tickers, database, args.repeat, args.seed)
+        rows.extend(summarize(period, bars, timings))
+
+    results = pd.DataFrame(rows)
+    print(results.pivot(index='stage', columns='period', values='median_ms')
+          .reindex(index=STAGES, columns=args.periods).to_string())
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'benchmark': 'pipeline',
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'environment': environment(),
+                'params': {'tickers': args.tickers, 'repeat': args.repeat, 'seed': args.seed,
+                           'redis': 'memory' if args.redis_url == 'memory://' else 'server'},
+                'results': rows,
+            }, f, indent=2)
+    if args.compare:
+        compare(rows, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Rolling minute bars of a watchlist up to coarser timeframes.
+
+Run from the repository root:
+
+    python -m benchmarks.resample_bench --tickers 500 --json resample.json
+
+Every ticker gets --days sessions of synthetic minute bars. Three ways of
+building all of --intervals are timed: pandas resample().agg() per ticker
+and interval, resample_many over the stacked watchlist, and BarAggregator
+fed one minute at a time as a live feed would (reported per update).
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+import pandas as pd
+from resample import AGGREGATIONS, SESSION_OPEN, BarAggregator, frame_arrays, resample_many
+from benchmarks.synthetic import synthetic_minutes, ticker_names
+
+PANDAS_RULES = {'5m': '5min', '15m': '15min', '30m': '30min', '1h': '1h', '4h': '4h', '1d': '1D'}
+
+
+def pandas_resample(frames, intervals):
+    hours, minutes = SESSION_OPEN.split(':')
+    offset = pd.Timedelta(hours=int(hours), minutes=int(minutes))
+    result = {}
+    for interval in intervals:
+        kwargs = {} if interval == '1d' else {'origin': 'start_day', 'offset': offset}
+        result[interval] = {
+            ticker: frame.resample(PANDAS_RULES[interval], **kwargs).agg(AGGREGATIONS).dropna(subset=['Close'])
+            for ticker, frame in frames.items()
+        }
+    return result
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def stream(frames, intervals, tickers):
+    """Median and p99 seconds of one BarAggregator update with a single new minute."""
+    timings = []
+    for ticker in tickers:
+        stamps, columns, tz = frame_arrays(frames[ticker])
+        aggregator = BarAggregator(intervals)
+        for i in range(len(stamps)):
+            start = time.perf_counter()
+            aggregator.update_arrays(stamps[i:i + 1], {col: values[i:i + 1] for col, values in columns.items()}, tz)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-timeframe resampling")
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--days', type=int, default=1, help="Sessions of minute bars per ticker")
+    parser.add_argument('--intervals', nargs='+', default=list(PANDAS_RULES), choices=list(PANDAS_RULES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stream-tickers', type=int, default=5, help="Tickers replayed through BarAggregator")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    tickers = ticker_names(args.tickers)
+    frames = {ticker: synthetic_minutes(ticker, args.days) for ticker in tickers}
+    bars = sum(len(frame) for frame in frames.values())
+
+    pandas_s = best_of(lambda: pandas_resample(frames, args.intervals), args.repeat)
+    vectorized_s = best_of(lambda: resample_many(frames, args.intervals), args.repeat)
+    median_s, p99_s = stream(frames, args.intervals, tickers[:args.stream_tickers])
+
+    print(f"{args.tickers} tickers, {bars} minute bars -> {', '.join(args.intervals)}")
+    print(f"  pandas per ticker:   {pandas_s * 1000:.1f} ms")
+    print(f"  resample_many:       {vectorized_s * 1000:.1f} ms ({pandas_s / vectorized_s:.1f}x)")
+    print(f"  BarAggregator update: median {median_s * 1e6:.0f} us, p99 {p99_s * 1e6:.0f} us per minute")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'benchmark': 'resample',
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'params': {'tickers': args.tickers, 'days': args.days, 'intervals': args.intervals},
+                'results': {'bars': bars, 'pandas_ms': round(pandas_s * 1000, 2),
+                            'resample_many_ms': round(vectorized_s * 1000, 2),
+                            'update_median_us': round(median_s * 1e6, 1), 'update_p99_us': round(p99_s * 1e6, 1)},
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Cold-start time of the web app and the worker, and which heavy modules they load.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_bench --json startup.json
+
+Every case runs in a fresh interpreter, so module caches don't carry
+over. "login" renders app.py with Streamlit's AppTest and no session,
+which is what a new visitor gets; "worker" imports worker.py; "full
+stack" loads everything an analysis and a chat need, for reference.
+Streamlit itself imports plotly when it is installed, so "login" always
+lists it.
+Redis defaults to the 'memory://' stand-in.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HEAVY_MODULES = ['yfinance', 'plotly', 'groq', 'openai', 'ta', 'pandas', 'numpy', 'redis', 'fakeredis']
+
+_REPORT = """
+import json, sys, time
+print(json.dumps({{
+    'seconds': time.perf_counter() - _start,
+    'loaded': [m for m in {heavy!r} if m in sys.modules],
+    **_extra,
+}}))
+"""
+
+CASES = {
+    'login': """
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=120)
+at.run()
+_extra = {'login_form': any(t.label == 'Username' for t in at.text_input),
+          'exception': [e.message for e in at.exception]}
+""",
+    'worker': """
+import worker
+_extra = {}
+""",
+    'full stack': """
+import analysis, pipeline, chatbot, report_payload, yfinance, plotly.graph_objects
+chatbot.chatbot.orchestrator
+_extra = {}
+""",
+}
+
+
+def run_case(code, env):
+    snippet = "import time\n_start = time.perf_counter()\n" + code + _REPORT.format(heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'failed')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app and worker cold start")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    env = {**os.environ, 'REDIS_URL': os.getenv('REDIS_URL', 'memory://'),
+           'GROQ_API_KEY': os.getenv('GROQ_API_KEY', 'benchmark'), 'PYTHONPATH': os.getcwd()}
+    rows = []
+    for case in args.cases:
+        runs = [run_case(CASES[case], env) for _ in range(args.repeat)]
+        last = runs[-1]
+        rows.append({
+            'case': case,
+            'median_s': round(statistics.median(r['seconds'] for r in runs), 3),
+            'process_median_s': round(statistics.median(r['process_seconds'] for r in runs), 3),
+            'loaded': last['loaded'],
+            **{k: v for k, v in last.items() if k not in ('seconds', 'process_seconds', 'loaded')},
+        })
+        row = rows[-1]
+        print(f"{case:>10}: {row['median_s']:.3f}s in script, {row['process_median_s']:.3f}s process, "
+              f"loaded {', '.join(row['loaded']) or 'none'}"
+              + (f", login form {'shown' if row['login_form'] else 'MISSING'}" if 'login_form' in row else ''))
+        if row.get('exception'):
+            print(f"{'':>12}exception: {row['exception']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'startup', 'created': datetime.now().isoformat(timespec='seconds'),
+                       'python': sys.version.split()[0], 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
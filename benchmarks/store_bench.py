@@ -0,0 +1,111 @@
+"""Per-process memory and load time of a price universe: SQLite PriceCache vs memory-mapped PriceStore.
+
+Run from the repository root (Linux, memory is read from /proc):
+
+    python -m benchmarks.store_bench --tickers 2000 --processes 4 --json store.json
+
+Both backends are filled with the same synthetic 20-year histories. Then
+--processes fresh interpreters each load the whole universe as frames
+and keep them alive, the way several Streamlit servers or batch scripts
+would. RssAnon is private heap, duplicated in every process; RssFile is
+file pages mapped from the page cache, shared between processes.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from benchmarks.synthetic import SyntheticSource, ticker_names
+from price_cache import PriceCache
+from price_store import PriceStore
+
+_LOADER = """
+import json, sys, time
+from benchmarks.synthetic import ticker_names
+from price_cache import PriceCache
+from price_store import PriceStore
+
+class NoSource:
+    def history(self, *args, **kwargs):
+        raise RuntimeError('benchmark store is incomplete')
+
+backend, path, count = sys.argv[1], sys.argv[2], int(sys.argv[3])
+if backend == 'mmap':
+    cache = PriceStore(path, source=NoSource(), max_age=10**9)
+else:
+    cache = PriceCache(path, source=NoSource(), max_bars=10**9, max_age=10**9)
+start = time.perf_counter()
+frames = [cache.get(t, 'max') for t in ticker_names(count)]
+elapsed = time.perf_counter() - start
+# Touch every close, as an indicator pass would
+total = sum(float(f['Close'].sum()) for f in frames)
+status = dict(line.split(':', 1) for line in open('/proc/self/status') if ':' in line)
+kb = lambda key: int(status.get(key, '0 kB').split()[0])
+print(json.dumps({'load_s': elapsed, 'bars': sum(map(len, frames)),
+                  'rss_anon_mb': kb('RssAnon') / 1024, 'rss_file_mb': kb('RssFile') / 1024}))
+"""
+
+
+def fill(tickers, workdir):
+    source = SyntheticSource()
+    source.prepare(tickers)
+    sqlite_path = os.path.join(workdir, 'prices.sqlite')
+    store_path = os.path.join(workdir, 'store')
+    cache = PriceCache(sqlite_path, source=source, max_bars=10**9, max_age=10**9)
+    store = PriceStore(store_path, source=source, max_age=10**9)
+    for i in range(0, len(tickers), 200):
+        cache.get_many(tickers[i:i + 200], 'max')
+        store.get_many(tickers[i:i + 200], 'max')
+    cache.close()
+    return {'sqlite': sqlite_path, 'mmap': store_path}
+
+
+def measure(backend, path, count, processes):
+    env = {**os.environ, 'PYTHONPATH': os.getcwd()}
+    procs = [subprocess.Popen([sys.executable, '-c', _LOADER, backend, path, str(count)],
+                              stdout=subprocess.PIPE, text=True, env=env)
+             for _ in range(processes)]
+    runs = [json.loads(proc.communicate()[0].strip().splitlines()[-1]) for proc in procs]
+    return {
+        'backend': backend,
+        'processes': processes,
+        'bars_per_process': runs[0]['bars'],
+        'load_s': round(max(r['load_s'] for r in runs), 2),
+        'rss_anon_mb': round(sum(r['rss_anon_mb'] for r in runs) / processes, 1),
+        'rss_file_mb': round(sum(r['rss_file_mb'] for r in runs) / processes, 1),
+        'private_total_mb': round(sum(r['rss_anon_mb'] for r in runs), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare price backends across processes")
+    parser.add_argument('--tickers', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--workdir', help="Keep the filled stores here instead of a temporary directory")
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='store_bench_')
+    try:
+        start = time.perf_counter()
+        paths = fill(ticker_names(args.tickers), workdir)
+        print(f"Filled both backends with {args.tickers} tickers in {time.perf_counter() - start:.1f}s")
+        rows = [measure(backend, path, args.tickers, args.processes) for backend, path in paths.items()]
+        for row in rows:
+            print(f"{row['backend']:>6}: load {row['load_s']}s, per process {row['rss_anon_mb']} MB private "
+                  f"+ {row['rss_file_mb']} MB shared file pages, {row['private_total_mb']} MB private in total")
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'benchmark': 'store', 'created': datetime.now().isoformat(timespec='seconds'),
+                           'tickers': args.tickers, 'results': rows}, f, indent=2)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
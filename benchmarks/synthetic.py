@@ -0,0 +1,140 @@
+"""Deterministic synthetic market data for benchmarks.
+
+The same ticker, length and seed always give the same prices, so timings
+from different runs and machines are measured on identical inputs.
+"""
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from price_cache import COLUMNS, period_start
+from resample import resample_ohlcv
+
+# Trading days per benchmarked period; '20y' is served as the 'max' period
+PERIOD_BARS = {
+    '1mo': 21,
+    '3mo': 63,
+    '6mo': 126,
+    '1y': 252,
+    '2y': 504,
+    '5y': 1260,
+    '10y': 2520,
+    '20y': 5040,
+}
+FETCH_PERIODS = {'20y': 'max'}
+MAX_BARS = max(PERIOD_BARS.values())
+# Sessions of minute bars behind every intraday interval
+INTRADAY_DAYS = 60
+SESSION_MINUTES = 390
+
+
+def ticker_names(count):
+    return [f"SYN{i:04d}" for i in range(count)]
+
+
+def synthetic_ohlcv(ticker, bars, seed=0, end=None):
+    """Daily OHLCV frame shaped like yfinance history, ending at ``end`` (today by default).
+
+    Closes follow a geometric random walk with per-ticker drift and
+    volatility; prices depend only on ``ticker``, ``bars`` and ``seed``,
+    while the dates move with ``end``.
+    """
+    rng = np.random.default_rng([zlib.crc32(ticker.encode()), seed])
+    drift = rng.normal(0.0003, 0.0002)
+    vol = rng.uniform(0.008, 0.03)
+    start_price = rng.uniform(10, 500)
+
+    returns = rng.normal(drift, vol, bars)
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[start_price], close[:-1]]) * np.exp(rng.normal(0, vol / 4, bars))
+    wick = np.abs(rng.normal(0, vol / 2, (2, bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(15, 0.5, bars).astype('int64')
+
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize()
+    index = pd.bdate_range(end=end, periods=bars, tz='America/New_York', name='Date')
+    frame = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                         index=index)
+    frame['Dividends'] = 0.0
+    frame['Stock Splits'] = 0.0
+    return frame[COLUMNS]
+
+
+def synthetic_minutes(ticker, days, seed=0, end=None):
+    """Regular-session (09:30-16:00) minute bars for ``days`` weekdays ending at ``end``."""
+    rng = np.random.default_rng([zlib.crc32(ticker.encode()), seed, 1])
+    vol = rng.uniform(0.008, 0.03) / np.sqrt(SESSION_MINUTES)
+    bars = days * SESSION_MINUTES
+
+    close = rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(0, vol, bars)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    wick = np.abs(rng.normal(0, vol / 2, (2, bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(9, 0.8, bars).astype('int64')
+
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize()
+    sessions = pd.bdate_range(end=end, periods=days).asi8
+    minutes = np.arange(SESSION_MINUTES) * 60 * 10**9 + (9 * 60 + 30) * 60 * 10**9
+    stamps = (sessions[:, None] + minutes[None, :]).ravel()
+    index = pd.DatetimeIndex(stamps.astype('datetime64[ns]'), name='Date').tz_localize('America/New_York')
+    frame = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                         index=index)
+    frame['Dividends'] = 0.0
+    frame['Stock Splits'] = 0.0
+    return frame[COLUMNS]
+
+
+class SyntheticSource:
+    """Stub price provider for PriceCache, with the YahooSource interface.
+
+    Every ticker has MAX_BARS of daily history and INTRADAY_DAYS of minute
+    bars (rolled up for coarser intervals) ending today; requests are sliced
+    from it like Yahoo slices a period. ``latency`` seconds are added per
+    request to stand in for the network.
+    """
+
+    def __init__(self, seed=0, latency=0.0):
+        self.seed = seed
+        self.latency = latency
+        self.requests = 0
+        self._frames = {}
+        self._intraday = {}
+
+    def prepare(self, tickers):
+        """Generate the histories up front, so fetch timings don't include it."""
+        for ticker in tickers:
+            self._full(ticker)
+
+    def _full(self, ticker):
+        if ticker not in self._frames:
+            self._frames[ticker] = synthetic_ohlcv(ticker, MAX_BARS, self.seed)
+        return self._frames[ticker]
+
+    def _bars(self, ticker, interval):
+        if interval == '1d':
+            return self._full(ticker)
+        if (ticker, interval) not in self._intraday:
+            minutes = self._intraday.get((ticker, '1m'))
+            if minutes is None:
+                minutes = self._intraday[(ticker, '1m')] = synthetic_minutes(ticker, INTRADAY_DAYS, self.seed)
+            self._intraday[(ticker, interval)] = resample_ohlcv(minutes, interval)
+        return self._intraday[(ticker, interval)]
+
+    def history(self, ticker, period=None, start=None, interval='1d'):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        frame = self._bars(ticker, interval)
+        if start is None:
+            start = period_start(period) if period else None
+        if start is None:
+            return frame.copy()
+        # PriceCache top-ups pass a plain 'YYYY-MM-DD' date
+        start = pd.Timestamp(start)
+        start = start.tz_localize(frame.index.tz) if start.tz is None else start.tz_convert(frame.index.tz)
+        return frame[frame.index >= start].copy()
+
+    def history_many(self, tickers, period=None, start=None, interval='1d'):
+        return {ticker: self.history(ticker, period, start, interval) for ticker in tickers}
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+# Rough size of a token for English/number-heavy text
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 600
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _fmt(value, digits=2):
+    if value is None or pd.isna(value):
+        return 'n/a'
+    return f"{value:.{digits}f}"
+
+
+def _date(ts):
+    ts = pd.Timestamp(ts)
+    return ts.strftime('%Y-%m-%d') if ts == ts.normalize() else ts.strftime('%Y-%m-%d %H:%M')
+
+
+def _long_sma(data):
+    for column in ('SMA_200', 'SMA_Long'):
+        if column in data and not data[column].isna().all():
+            return column
+    return None
+
+
+def latest_values(data):
+    latest = data.iloc[-1]
+    close = latest['Close']
+    lines = [f"Last bar {_date(data.index[-1])}: close {_fmt(close)}"]
+
+    for bars in (5, 20, 60):
+        if len(data) > bars:
+            change = close / data['Close'].iloc[-bars - 1] - 1
+            lines.append(f"{bars}-bar change {change * 100:+.1f}%")
+
+    sma_long = _long_sma(data)
+    if 'SMA_50' in data:
+        lines.append(f"SMA50 {_fmt(latest['SMA_50'])}")
+    if sma_long:
+        lines.append(f"{sma_long.replace('_', '')} {_fmt(latest[sma_long])}")
+    if 'BB_Upper' in data and 'BB_Lower' in data:
+        width = latest['BB_Upper'] - latest['BB_Lower']
+        pct_b = (close - latest['BB_Lower']) / width if width else np.nan
+        lines.append(f"Bollinger {_fmt(latest['BB_Lower'])}-{_fmt(latest['BB_Upper'])} (%B {_fmt(pct_b)})")
+    if 'RSI' in data:
+        lines.append(f"RSI {_fmt(latest['RSI'], 1)}")
+    if 'MACD' in data and 'Signal_Line' in data:
+        hist = latest['MACD'] - latest['Signal_Line']
+        lines.append(f"MACD {_fmt(latest['MACD'], 3)} signal {_fmt(latest['Signal_Line'], 3)} hist {_fmt(hist, 3)}")
+    return '; '.join(lines)
+
+
+def _crosses(fast, slow):
+    """Indices where ``fast`` crosses ``slow``: +1 upwards, -1 downwards."""
+    above = (fast > slow).astype(int)
+    valid = ~(np.isnan(fast) | np.isnan(slow))
+    change = np.diff(above)
+    change[~(valid[1:] & valid[:-1])] = 0
+    idx = np.flatnonzero(change) + 1
+    return idx, change[idx - 1]
+
+
+def crossover_events(data, max_events=6):
+    """Most recent indicator crossovers and threshold breaks, newest last."""
+    events = []
+    close = data['Close'].to_numpy(dtype=float)
+    sma_long = _long_sma(data)
+
+    if 'SMA_50' in data and sma_long:
+        idx, direction = _crosses(data['SMA_50'].to_numpy(dtype=float), data[sma_long].to_numpy(dtype=float))
+        events += [(i, 'golden cross (SMA50 above long SMA)' if d > 0 else 'death cross (SMA50 below long SMA)')
+                   for i, d in zip(idx, direction)]
+    if 'MACD' in data and 'Signal_Line' in data:
+        idx, direction = _crosses(data['MACD'].to_numpy(dtype=float), data['Signal_Line'].to_numpy(dtype=float))
+        events += [(i, 'MACD crossed above signal' if d > 0 else 'MACD crossed below signal')
+                   for i, d in zip(idx, direction)]
+    if 'RSI' in data:
+        rsi = data['RSI'].to_numpy(dtype=float)
+        for level, up_text, down_text in ((70, 'RSI entered overbought', 'RSI left overbought'),
+                                          (30, 'RSI left oversold', 'RSI entered oversold')):
+            idx, direction = _crosses(rsi, np.full_like(rsi, level))
+            events += [(i, up_text if d > 0 else down_text) for i, d in zip(idx, direction)]
+    if 'BB_Upper' in data and 'BB_Lower' in data:
+        idx, direction = _crosses(close, data['BB_Upper'].to_numpy(dtype=float))
+        events += [(i, 'close broke above upper band') for i, d in zip(idx, direction) if d > 0]
+        idx, direction = _crosses(close, data['BB_Lower'].to_numpy(dtype=float))
+        events += [(i, 'close broke below lower band') for i, d in zip(idx, direction) if d < 0]
+
+    events.sort()
+    return [f"{_date(data.index[i])} {text}" for i, text in events[-max_events:]]
+
+
+def divergences(data, lookback=30):
+    """Price/RSI and price/MACD divergences between the last two ``lookback`` windows."""
+    if len(data) < 2 * lookback:
+        return []
+    close = data['Close'].to_numpy(dtype=float)
+    recent, prior = slice(-lookback, None), slice(-2 * lookback, -lookback)
+    found = []
+    for column, name in (('RSI', 'RSI'), ('MACD', 'MACD')):
+        if column not in data:
+            continue
+        osc = data[column].to_numpy(dtype=float)
+        if close[recent].max() > close[prior].max() and osc[recent].max() < osc[prior].max():
+            found.append(f"bearish {name} divergence: higher price high, lower {name} high")
+        if close[recent].min() < close[prior].min() and osc[recent].min() > osc[prior].min():
+            found.append(f"bullish {name} divergence: lower price low, higher {name} low")
+    return found
+
+
+def support_resistance(data, order=5, levels=2):
+    """Nearest swing-low supports below and swing-high resistances above the last close."""
+    close = data['Close'].to_numpy(dtype=float)
+    n = len(close)
+    if n < 2 * order + 1:
+        return [], []
+    windows = np.lib.stride_tricks.sliding_window_view(close, 2 * order + 1)
+    centre = close[order:n - order]
+    highs = centre[centre == windows.max(axis=1)]
+    lows = centre[centre == windows.min(axis=1)]
+
+    last = close[-1]
+    supports = np.unique(np.round(lows[lows < last], 2))[::-1][:levels]
+    resistances = np.unique(np.round(highs[highs > last], 2))[:levels]
+    return list(supports), list(resistances)
+
+
+def downsample(series, points):
+    """Evenly spaced samples of ``series`` always including the last value."""
+    if len(series) <= points:
+        return series
+    idx = np.unique(np.linspace(0, len(series) - 1, points).round().astype(int))
+    return series.iloc[idx]
+
+
+def _series_line(data, column, points, digits):
+    sampled = downsample(data[column].dropna(), points)
+    values = ' '.join(_fmt(v, digits) for v in sampled)
+    return f"{column} ({_date(sampled.index[0])} to {_date(sampled.index[-1])}, {len(sampled)} pts): {values}"
+
+
+def build_digest(data, ticker, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Compact text summary of an indicator frame for the LLM prompt.
+
+    Sections are added in priority order (latest values, crossovers,
+    divergences, support/resistance, downsampled series) and the series
+    resolution is reduced until the digest fits ``token_budget``.
+    """
+    if data is None or data.empty:
+        return f"No chart data available for {ticker}."
+
+    sections = [f"{ticker} technical digest ({len(data)} bars)", latest_values(data)]
+    events = crossover_events(data)
+    if events:
+        sections.append("Recent events: " + '; '.join(events))
+    found = divergences(data)
+    if found:
+        sections.append("Divergences: " + '; '.join(found))
+    supports, resistances = support_resistance(data)
+    year = data['Close'].iloc[-252:]
+    levels = [f"{len(year)}-bar high {_fmt(year.max())}", f"{len(year)}-bar low {_fmt(year.min())}"]
+    if supports:
+        levels.append("support " + ', '.join(_fmt(v) for v in supports))
+    if resistances:
+        levels.append("resistance " + ', '.join(_fmt(v) for v in resistances))
+    sections.append("Levels: " + '; '.join(levels))
+
+    head = '\n'.join(sections)
+    series_columns = [(col, digits) for col, digits in (('Close', 2), ('RSI', 0), ('MACD', 3)) if col in data]
+    for points in (40, 30, 20, 12, 8):
+        lines = [_series_line(data, col, points, digits) for col, digits in series_columns]
+        digest = head + '\n' + '\n'.join(lines)
+        if estimate_tokens(digest) <= token_budget:
+            return digest
+
+    # Still over budget: keep the series for price only, then trim lines
+    digest = head + '\n' + _series_line(data, 'Close', 8, 2)
+    while estimate_tokens(digest) > token_budget and '\n' in digest:
+        digest = digest.rsplit('\n', 1)[0]
+    return digest
@@ -1,21 +1,36 @@
-import openai
+import logging
 import os
-import json
-import base64
-import plotly
+import time
 from dotenv import load_dotenv
-from groq import Groq
+from chart_digest import estimate_tokens
+from llm_cache import ResponseCache
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+class ChatReply:
+    """Text chunks of a streamed reply.
+    
+    ``failed`` is set when the reply is an error message rather than an
+    answer, so callers can leave the turn out of the conversation memory.
+    """
+    
+    def __init__(self, chunks=(), failed=False):
+        self.chunks = chunks
+        self.failed = failed
+    
+    def __iter__(self):
+        return iter(self.chunks)
+
 class StockAnalystChatbot:
-    def __init__(self):
+    def __init__(self, cache=None, orchestrator=None):
         self.api_key = os.getenv("GROQ_API_KEY")
+        self.cache = cache
         
-        self.client = Groq(
-        api_key= self.api_key,
-        )
+        self._orchestrator = orchestrator
         self.system_prompt = """
         You are a senior stock market analyst with 20 years of experience in technical analysis. 
         Your task is to help users understand stock charts and technical indicators, and provide 
@@ -35,54 +50,209 @@ class StockAnalystChatbot:
         Provide clear, concise explanations suitable for both novice and experienced investors.
         """
     
-    def analyze_charts(self, charts, user_question):
-        """Analyze Plotly charts using Groq's Llama model (text-only, send chart JSON)"""
-        if not self.api_key:
-            return "GROQ API key not configured. Please set GROQ_API_KEY environment variable."
+    @property
+    def orchestrator(self):
+        """Rate limiting, retries and deadlines for the Groq calls.
         
-        # Prepare the chat messages 
+        Created on the first request, so pages that never chat don't load
+        the Groq client; it reads GROQ_BASE_URL itself, e.g. to use stub_llm.py.
+        """
+        if self._orchestrator is None:
+            from llm_orchestrator import get_orchestrator
+            self._orchestrator = get_orchestrator()
+        return self._orchestrator
+    
+    def _chart_messages(self, digest, user_question, history=None):
         messages = [
             {"role": "system", "content": self.system_prompt},
+            *(history or []),
+            {"role": "user", "content": user_question},
+            {"role": "user", "content": f"Here is a compact digest of the price, MACD and RSI charts:\n{digest}"}
+        ]
+        prompt_chars = self._record_prompt('charts', messages)
+        logger.info(f"Chart prompt: {prompt_chars} chars, ~{estimate_tokens(digest)} digest tokens")
+        return messages
+    
+    def _chat_messages(self, user_question, context=None, history=None):
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            *(history or []),
             {"role": "user", "content": user_question}
         ]
         
-        # Add chart JSONs to the message
-        for chart_type, chart_json in charts.items():
-            if chart_json:
-                messages.append({
-                    "role": "user",
-                    "content": f"Here is the {chart_type.replace('_', ' ')} chart in Plotly JSON format: {chart_json}"
-                })
+        if context:
+            messages.insert(1, {"role": "system", "content": f"Context: {context}"})
+        self._record_prompt('chat', messages)
+        return messages
+    
+    def _record_prompt(self, call, messages):
+        text = ''.join(m["content"] for m in messages)
+        metrics.inc('llm_prompt_chars_total', len(text), call=call)
+        metrics.observe('llm_prompt_tokens', estimate_tokens(text), metrics.TOKEN_BUCKETS, call=call)
+        return len(text)
+    
+    def _cache_context(self, context, history):
+        # Follow-up questions only share answers within the same conversation
+        if not history:
+            return context
+        return (context or '') + '\n' + '\n'.join(f"{m['role']}: {m['content']}" for m in history)
+    
+    def _cached(self, kind, context, user_question):
+        if self.cache is None:
+            return None
+        return self.cache.get(kind, context, user_question)
+    
+    def _store(self, kind, context, user_question, response):
+        if self.cache is not None and response:
+            self.cache.set(kind, context, user_question, response)
+    
+    def _stream(self, messages, error_prefix, cache_key):
+        """ChatReply yielding the completion text piece by piece as Groq streams it"""
+        if not self.api_key:
+            return ChatReply(["GROQ API key not configured. Please set GROQ_API_KEY environment variable."], failed=True)
+        reply = ChatReply()
+        
+        def chunks():
+            parts = []
+            start = time.perf_counter()
+            try:
+                for chunk in self.orchestrator.stream(messages):
+                    if not parts:
+                        metrics.observe('stage_seconds', time.perf_counter() - start, stage='chatbot.first_token')
+                    parts.append(chunk)
+                    yield chunk
+            except Exception as e:
+                metrics.inc('stage_errors_total', stage='chatbot.stream')
+                reply.failed = True
+                yield f"{error_prefix}: {str(e)}"
+                return
+            metrics.observe('stage_seconds', time.perf_counter() - start, stage='chatbot.stream')
+            self._store(*cache_key, ''.join(parts))
+        
+        reply.chunks = chunks()
+        return reply
+    
+    @metrics.timed('chatbot.analyze_charts')
+    def analyze_charts(self, digest, user_question, history=None):
+        """Analyze the charts using Groq's Llama model from a compact chart digest (see chart_digest.py)"""
+        if not self.api_key:
+            return "GROQ API key not configured. Please set GROQ_API_KEY environment variable."
+        
+        cache_context = self._cache_context(digest, history)
+        cached = self._cached('charts', cache_context, user_question)
+        if cached is not None:
+            return cached
         
         try:
-            response = self.client.chat.completions.create(
-                messages=messages,
-                model="llama3-70b-8192",
-            )
-            return response.choices[0].message.content
+            response = self.orchestrator.complete(self._chart_messages(digest, user_question, history))
+            self._store('charts', cache_context, user_question, response)
+            return response
         except Exception as e:
             return f"Error analyzing charts: {str(e)}"
     
-    def general_chat(self, user_question, context=None):
-        """Handle general chat questions"""
+    def stream_analyze_charts(self, digest, user_question, history=None):
+        """Streaming version of analyze_charts, a ChatReply of text chunks as they arrive"""
+        cache_context = self._cache_context(digest, history)
+        cached = self._cached('charts', cache_context, user_question)
+        if cached is not None:
+            return ChatReply([cached])
+        return self._stream(
+            self._chart_messages(digest, user_question, history), "Error analyzing charts",
+            ('charts', cache_context, user_question)
+        )
+    
+    @metrics.timed('chatbot.general_chat')
+    def general_chat(self, user_question, context=None, history=None):
+        """Handle general chat questions, with earlier turns from ConversationMemory.history()"""
         if not self.api_key:
             return "GROQ API key not configured. Please set GROQ_API_KEY environment variable."
+        
+        cache_context = self._cache_context(context, history)
+        cached = self._cached('chat', cache_context, user_question)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = self.orchestrator.complete(self._chat_messages(user_question, context, history))
+            self._store('chat', cache_context, user_question, response)
+            return response
+        except Exception as e:
+            return f"Error in chatbot: {str(e)}"
+    
+    def stream_general_chat(self, user_question, context=None, history=None):
+        """Streaming version of general_chat, a ChatReply of text chunks as they arrive"""
+        cache_context = self._cache_context(context, history)
+        cached = self._cached('chat', cache_context, user_question)
+        if cached is not None:
+            return ChatReply([cached])
+        return self._stream(
+            self._chat_messages(user_question, context, history), "Error in chatbot",
+            ('chat', cache_context, user_question)
+        )
+    
+    def _summary_messages(self, summary, turns):
+        transcript = '\n'.join(
+            f"{'User' if t['role'] == 'user' else 'Analyst'}: {t['content']}" for t in turns
+        )
         messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": user_question}
+            {"role": "system", "content": "Update the running summary of a conversation between a user and a "
+                                          "stock analyst. Keep tickers, figures, recommendations and open "
+                                          "questions. Reply with the summary only, in at most 120 words."},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
         ]
+        self._record_prompt('summary', messages)
+        return messages
+    
+    @metrics.timed('chatbot.summarize_turns')
+    def summarize_turns(self, summary, turns):
+        """Fold older chat turns into the running conversation summary (see ConversationMemory)"""
+        return self.orchestrator.complete(self._summary_messages(summary, turns), max_tokens=200)
+    
+    def submit_summary(self, summary, turns):
+        """summarize_turns on the orchestrator's background loop; returns a Future of the summary.
         
-        if context:
-            messages.insert(1, {"role": "system", "content": f"Context: {context}"})
+        ConversationMemory accepts it as summarizer, so folding turns never
+        blocks a Streamlit rerun.
+        """
+        return self.orchestrator.submit(self._summary_messages(summary, turns), max_tokens=200)
+
+    @metrics.timed('chatbot.aanalyze_charts')
+    async def aanalyze_charts(self, digest, user_question, history=None):
+        """analyze_charts for batch jobs running an event loop"""
+        if not self.api_key:
+            return "GROQ API key not configured. Please set GROQ_API_KEY environment variable."
+        
+        cache_context = self._cache_context(digest, history)
+        cached = self._cached('charts', cache_context, user_question)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await self.orchestrator.acomplete(self._chart_messages(digest, user_question, history))
+            self._store('charts', cache_context, user_question, response)
+            return response
+        except Exception as e:
+            return f"Error analyzing charts: {str(e)}"
+    
+    @metrics.timed('chatbot.ageneral_chat')
+    async def ageneral_chat(self, user_question, context=None, history=None):
+        """general_chat for batch jobs running an event loop"""
+        if not self.api_key:
+            return "GROQ API key not configured. Please set GROQ_API_KEY environment variable."
+        
+        cache_context = self._cache_context(context, history)
+        cached = self._cached('chat', cache_context, user_question)
+        if cached is not None:
+            return cached
         
         try:
-            response = self.client.chat.completions.create(
-            messages= messages,
-            model="llama3-70b-8192",
-            )
-            return response.choices[0].message.content
+            response = await self.orchestrator.acomplete(self._chat_messages(user_question, context, history))
+            self._store('chat', cache_context, user_question, response)
+            return response
         except Exception as e:
             return f"Error in chatbot: {str(e)}"
 
-# Initialize chatbot
-chatbot = StockAnalystChatbot()
\ No newline at end of file
+# Initialize chatbot, sharing cached responses through Redis unless LLM_CACHE=off
+chatbot = StockAnalystChatbot(
+    cache=None if os.getenv("LLM_CACHE", "on").lower() in ("0", "off", "false") else ResponseCache()
+)
\ No newline at end of file
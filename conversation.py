@@ -0,0 +1,136 @@
+import logging
+import re
+from concurrent.futures import Future
+from chart_digest import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_BUDGET = 1200
+DEFAULT_SUMMARY_BUDGET = 250
+# Messages kept on screen in the sidebar; older ones live on in the summary
+DEFAULT_DISPLAY_LIMIT = 20
+
+
+def _first_sentence(text, limit=160):
+    sentence = re.split(r'(?<=[.!?])\s', text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit].rstrip() + '...'
+
+
+def extractive_summary(summary, turns):
+    """Fallback summary: the first sentence of every folded question and answer."""
+    lines = [summary] if summary else []
+    for turn in turns:
+        who = 'User' if turn['role'] == 'user' else 'Analyst'
+        lines.append(f"{who}: {_first_sentence(turn['content'])}")
+    return '\n'.join(lines)
+
+
+def _trim_to_budget(text, budget):
+    # Drop the oldest lines of the summary first
+    lines = text.split('\n')
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > budget:
+        lines.pop(0)
+    text = '\n'.join(lines)
+    max_chars = budget * 4
+    return text if len(text) <= max_chars else text[-max_chars:]
+
+
+class ConversationMemory:
+    """Multi-turn chat memory kept within a token budget.
+
+    The most recent turns are sent verbatim while they fit ``history_budget``
+    tokens; older turns are folded into a running summary of at most
+    ``summary_budget`` tokens by ``summarizer(summary, turns)``, or
+    extractively without one. The summarizer may return the text or a
+    concurrent.futures.Future of it (e.g. StockAnalystChatbot.submit_summary);
+    in the meantime the extractive summary stands in, so folding never waits
+    on the LLM. Only the last ``display_limit`` messages are kept for
+    rendering.
+    """
+
+    def __init__(self, summarizer=None, history_budget=DEFAULT_HISTORY_BUDGET,
+                 summary_budget=DEFAULT_SUMMARY_BUDGET, display_limit=DEFAULT_DISPLAY_LIMIT):
+        self.summarizer = summarizer
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.display_limit = display_limit
+        self.clear()
+
+    @property
+    def summary(self):
+        self._collect()
+        return self._summary
+
+    def add(self, role, content, remember=True):
+        """Show a message; with ``remember=False`` (e.g. an error reply) it is not sent as history."""
+        message = {'role': role, 'content': content}
+        self.display.append(message)
+        del self.display[:-self.display_limit]
+        self.messages += 1
+        if not remember:
+            return
+        self.turns.append(message)
+        if role == 'assistant':
+            self._fold()
+
+    def _tokens(self):
+        return sum(estimate_tokens(turn['content']) for turn in self.turns)
+
+    def _fold(self):
+        # Fold whole question/answer pairs, always keeping the latest pair
+        old = []
+        while len(self.turns) > 2 and self._tokens() > self.history_budget:
+            old.extend(self.turns[:2])
+            del self.turns[:2]
+        if not old:
+            return
+
+        previous = self.summary
+        self._summary = _trim_to_budget(extractive_summary(previous, old), self.summary_budget)
+        # A summary still being written for an earlier fold is superseded
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        if self.summarizer is None:
+            return
+        try:
+            summary = self.summarizer(previous, old)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {str(e)}")
+            return
+        if isinstance(summary, Future):
+            self._pending = summary
+        elif summary:
+            self._summary = _trim_to_budget(summary, self.summary_budget)
+
+    def _collect(self):
+        """Take over the summarizer's result once it has arrived."""
+        pending = self._pending
+        if pending is None or not pending.done():
+            return
+        self._pending = None
+        try:
+            summary = pending.result()
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {str(e)}")
+            return
+        if summary:
+            self._summary = _trim_to_budget(summary, self.summary_budget)
+
+    def history(self):
+        """Messages to send before the new question: running summary plus recent turns."""
+        messages = []
+        if self.summary:
+            messages.append({'role': 'system', 'content': f"Summary of the earlier conversation:\n{self.summary}"})
+        return messages + list(self.turns)
+
+    def hidden(self):
+        """Number of messages no longer rendered."""
+        return max(self.messages - len(self.display), 0)
+
+    def clear(self):
+        self._summary = ''
+        self._pending = None
+        self.turns = []
+        self.display = []
+        self.messages = 0
@@ -4,90 +4,440 @@ import uuid
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+import metrics
 
 load_dotenv()
 
-class RedisDB:
-    def __init__(self):
-        self.r = redis.Redis(
-    host='redis-13702.c11.us-east-1-2.ec2.redns.redis-cloud.com',
-    port=13702,
-    decode_responses=True,
-    username="default",
-    password=os.getenv("REDIS_PASSWORD"),
-)
+# Report fields needed to list reports, everything except the analysis payload
+REPORT_META_FIELDS = ['id', 'analyst', 'investor', 'stock', 'date', 'action', 'allocation']
+
+MEMORY_URL = 'memory://'
+
+# Shared in-process server for the 'memory://' stand-in, so sync and async
+# clients in one process see the same data
+_memory_server = None
+
+def redis_settings():
+    """Connection settings from the environment (or .env).
+    
+    REDIS_URL takes precedence over the individual host settings; set it to
+    'memory://' for an in-process stand-in (requires fakeredis) or to
+    'redis://localhost:6379/0' for a local server.
+    """
+    return {
+        'url': os.getenv('REDIS_URL', ''),
+        'host': os.getenv('REDIS_HOST', 'redis-13702.c11.us-east-1-2.ec2.redns.redis-cloud.com'),
+        'port': int(os.getenv('REDIS_PORT', '13702')),
+        'username': os.getenv('REDIS_USERNAME', 'default'),
+        'password': os.getenv('REDIS_PASSWORD'),
+        'db': int(os.getenv('REDIS_DB', '0')),
+        'ssl': os.getenv('REDIS_SSL', '').lower() in ('1', 'true', 'yes'),
+        'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', '20')),
+        'pool_timeout': float(os.getenv('REDIS_POOL_TIMEOUT', '10')),
+        'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', '5')),
+        'connect_timeout': float(os.getenv('REDIS_CONNECT_TIMEOUT', '5')),
+        'health_check_interval': int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', '30')),
+    }
+
+def _memory_client(asyncio=False):
+    global _memory_server
+    try:
+        import fakeredis
+    except ImportError:
+        raise RuntimeError("REDIS_URL=memory:// requires the fakeredis package, "
+                           "install it with pip install -r requirements-dev.txt") from None
+    
+    if _memory_server is None:
+        _memory_server = fakeredis.FakeServer()
+    if asyncio:
+        return fakeredis.FakeAsyncRedis(server=_memory_server, decode_responses=True)
+    return fakeredis.FakeRedis(server=_memory_server, decode_responses=True)
+
+def _pool_kwargs(settings):
+    return {
+        'max_connections': settings['max_connections'],
+        'timeout': settings['pool_timeout'],
+        'socket_timeout': settings['socket_timeout'],
+        'socket_connect_timeout': settings['connect_timeout'],
+        'health_check_interval': settings['health_check_interval'],
+        'retry_on_timeout': True,
+        'decode_responses': True,
+    }
+
+def create_client(settings=None):
+    """Build a redis client on a bounded, blocking connection pool."""
+    settings = settings or redis_settings()
+    if settings['url'] == MEMORY_URL:
+        return _memory_client()
+    
+    if settings['url']:
+        pool = redis.BlockingConnectionPool.from_url(settings['url'], **_pool_kwargs(settings))
+    else:
+        connection_class = redis.SSLConnection if settings['ssl'] else redis.Connection
+        pool = redis.BlockingConnectionPool(
+            connection_class=connection_class,
+            host=settings['host'],
+            port=settings['port'],
+            username=settings['username'],
+            password=settings['password'],
+            db=settings['db'],
+            **_pool_kwargs(settings)
+        )
+    return redis.Redis(connection_pool=pool)
+
+def create_async_client(settings=None):
+    """Asyncio counterpart of create_client."""
+    import redis.asyncio as aioredis
+    
+    settings = settings or redis_settings()
+    if settings['url'] == MEMORY_URL:
+        return _memory_client(asyncio=True)
+    
+    if settings['url']:
+        pool = aioredis.BlockingConnectionPool.from_url(settings['url'], **_pool_kwargs(settings))
+    else:
+        connection_class = aioredis.SSLConnection if settings['ssl'] else aioredis.Connection
+        pool = aioredis.BlockingConnectionPool(
+            connection_class=connection_class,
+            host=settings['host'],
+            port=settings['port'],
+            username=settings['username'],
+            password=settings['password'],
+            db=settings['db'],
+            **_pool_kwargs(settings)
+        )
+    return aioredis.Redis(connection_pool=pool)
+
+# Key layout and pipeline helpers shared by RedisDB and AsyncRedisDB, so the
+# sync and async clients write the same schema with the same instrumentation.
+# Pipelines queue commands synchronously in both redis and redis.asyncio.
+
+def user_key(username):
+    return f"user:{username}"
+
+def analyst_investors_key(analyst):
+    return f"analyst_investors:{analyst}"
+
+def watchlist_key(investor):
+    return f"watchlist:{investor}"
+
+def report_key(report_id):
+    return f"report:{report_id}"
+
+def report_list_key(investor):
+    return f"reports:{investor}"
+
+def report_index_key(username, stock=None):
+    return f"report_index:{username}" + (f":stock:{stock}" if stock else '')
+
+def score_range(since=None, until=None):
+    """(min, max) sorted-set scores for report dates between ``since`` and ``until``."""
+    return (since.timestamp() if since else '-inf', until.timestamp() if until else '+inf')
+
+def queue_user(pipe, username, password, role, assigned_analyst=None):
+    pipe.hset(user_key(username), mapping={
+        'password': password,
+        'role': role,
+        'assigned_analyst': assigned_analyst or ''
+    })
+    if assigned_analyst:
+        pipe.sadd(analyst_investors_key(assigned_analyst), username)
+
+def queue_assignment(pipe, investor, previous, analyst):
+    pipe.hset(user_key(investor), 'assigned_analyst', analyst or '')
+    if previous:
+        pipe.srem(analyst_investors_key(previous), investor)
+    if analyst:
+        pipe.sadd(analyst_investors_key(analyst), investor)
+
+def queue_watchlist(pipe, investor, tickers):
+    """Queue replacing a watchlist; returns the normalized tickers."""
+    tickers = {ticker.strip().upper() for ticker in tickers if ticker.strip()}
+    pipe.delete(watchlist_key(investor))
+    if tickers:
+        pipe.sadd(watchlist_key(investor), *tickers)
+    return sorted(tickers)
+
+def queue_analyst_index(pipe, user_keys, analysts, stale_keys):
+    """Queue rebuilding analyst_investors:* from user keys and their assigned analysts.
+    
+    Returns the number of assignments indexed.
+    """
+    assignments = {}
+    for key, analyst in zip(user_keys, analysts):
+        if analyst:
+            assignments.setdefault(analyst, []).append(key.split(':', 1)[1])
+    for key in stale_keys:
+        pipe.delete(key)
+    for analyst, investors in assignments.items():
+        pipe.sadd(analyst_investors_key(analyst), *investors)
+    return sum(len(investors) for investors in assignments.values())
+
+def queue_report(pipe, analyst, investor, stock, analysis, action, allocation):
+    """Queue the writes of a new report; returns its id."""
+    report_id = str(uuid.uuid4())
+    now = datetime.now()
+    
+    report_data = {
+        'id': report_id,
+        'analyst': analyst,
+        'investor': investor,
+        'stock': stock,
+        'date': str(now),
+        'analysis': analysis if isinstance(analysis, str) else json.dumps(analysis),
+        'action': action,
+        'allocation': str(allocation)
+    }
+    
+    payload_bytes = len(report_data['analysis'])
+    metrics.inc('redis_bytes_total', payload_bytes, op='write')
+    metrics.observe('payload_bytes', payload_bytes, metrics.BYTE_BUCKETS)
+    pipe.hset(report_key(report_id), mapping=report_data)
+    
+    # Add to investor's report list and the date-sorted metadata indexes
+    pipe.lpush(report_list_key(investor), report_id)
+    pipe.zadd(report_index_key(investor), {report_id: now.timestamp()})
+    pipe.zadd(report_index_key(investor, stock), {report_id: now.timestamp()})
+    return report_id
+
+def queue_report_meta(pipe, report_ids):
+    for report_id in report_ids:
+        pipe.hmget(report_key(report_id), REPORT_META_FIELDS)
 
+def queue_report_actions(pipe, report_ids):
+    for report_id in report_ids:
+        pipe.hget(report_key(report_id), 'action')
 
+def report_meta_rows(rows):
+    """Metadata dicts from queue_report_meta results, skipping deleted reports."""
+    return [dict(zip(REPORT_META_FIELDS, values)) for values in rows if values[0] is not None]
 
+def queue_full_reports(pipe, report_ids):
+    for report_id in report_ids:
+        pipe.hgetall(report_key(report_id))
 
+def full_report_rows(rows):
+    """Report dicts from queue_full_reports results; counts the payload bytes read."""
+    reports = [report for report in rows if report]
+    metrics.inc('redis_bytes_total', sum(len(r.get('analysis', '')) for r in reports), op='read')
+    return reports
+
+class ActionPage:
+    """One page of reports with a given action, filled from batches of the index.
+    
+    list_reports pages through the index in batches and feeds each batch's
+    metadata to add() until the page is full or the index is exhausted.
+    """
+    
+    def __init__(self, action, offset, limit):
+        self.action = action
+        self.offset = offset
+        self.limit = limit
+        self.skipped = 0
+        self.reports = []
+    
+    @property
+    def full(self):
+        return len(self.reports) >= self.limit
+    
+    def add(self, reports):
+        for report in reports:
+            if self.full:
+                return
+            if report['action'] != self.action:
+                continue
+            if self.skipped < self.offset:
+                self.skipped += 1
+                continue
+            self.reports.append(report)
+
+class RedisDB:
+    def __init__(self, client=None, settings=None):
+        self._client = client
+        self._settings = settings
+    
+    @property
+    def r(self):
+        # Created on first use, so importing this module stays cheap
+        if self._client is None:
+            self._client = create_client(self._settings)
+        return self._client
     
     def create_user(self, username, password, role, assigned_analyst=None):
-        user_key = f"user:{username}"
-        if self.r.exists(user_key):
+        if self.r.exists(user_key(username)):
             return False
         
-        user_data = {
-            'password': password,
-            'role': role,
-            'assigned_analyst': assigned_analyst or ''
-        }
-        self.r.hset(user_key, mapping=user_data)
+        pipe = self.r.pipeline()
+        queue_user(pipe, username, password, role, assigned_analyst)
+        pipe.execute()
         return True
     
     def authenticate_user(self, username, password):
-        user_key = f"user:{username}"
-        if not self.r.exists(user_key):
+        if not self.r.exists(user_key(username)):
             return False
         
-        stored_password = self.r.hget(user_key, 'password')
+        stored_password = self.r.hget(user_key(username), 'password')
         return stored_password == password
     
     def get_user_role(self, username):
-        user_key = f"user:{username}"
-        return self.r.hget(user_key, 'role')
+        return self.r.hget(user_key(username), 'role')
     
     def get_assigned_analyst(self, investor_username):
-        user_key = f"user:{investor_username}"
-        return self.r.hget(user_key, 'assigned_analyst')
+        return self.r.hget(user_key(investor_username), 'assigned_analyst')
+    
+    def assign_analyst(self, investor_username, analyst_username):
+        if not self.r.exists(user_key(investor_username)):
+            return False
+        
+        previous = self.r.hget(user_key(investor_username), 'assigned_analyst')
+        pipe = self.r.pipeline()
+        queue_assignment(pipe, investor_username, previous, analyst_username)
+        pipe.execute()
+        return True
     
     def get_investors_for_analyst(self, analyst_username):
-        investors = []
-        for key in self.r.keys('user:*'):
-            user_data = self.r.hgetall(key)
-            if user_data.get('assigned_analyst') == analyst_username:
-                investors.append(key.split(':')[1])
-        return investors
+        return sorted(self.r.smembers(analyst_investors_key(analyst_username)))
+    
+    def rebuild_analyst_index(self, batch_size=500):
+        """Rebuild every analyst_investors:* set from the user:* hashes."""
+        keys = list(self.r.scan_iter(user_key('*'), count=batch_size))
+        analysts = []
+        for i in range(0, len(keys), batch_size):
+            pipe = self.r.pipeline(transaction=False)
+            for key in keys[i:i + batch_size]:
+                pipe.hget(key, 'assigned_analyst')
+            analysts += pipe.execute()
+        
+        pipe = self.r.pipeline()
+        stale = list(self.r.scan_iter(analyst_investors_key('*'), count=batch_size))
+        indexed = queue_analyst_index(pipe, keys, analysts, stale)
+        pipe.execute()
+        return indexed
+    
+    def get_analysts(self):
+        """Analysts with at least one assigned investor."""
+        return sorted(key.split(':', 1)[1] for key in self.r.scan_iter(analyst_investors_key('*'), count=500))
+    
+    def get_watchlist(self, investor):
+        return sorted(self.r.smembers(watchlist_key(investor)))
     
+    def set_watchlist(self, investor, tickers):
+        pipe = self.r.pipeline()
+        tickers = queue_watchlist(pipe, investor, tickers)
+        pipe.execute()
+        return tickers
+    
+    @metrics.timed('save_report')
     def save_report(self, analyst, investor, stock, analysis, action, allocation):
-        report_id = str(uuid.uuid4())
-        report_key = f"report:{report_id}"
+        pipe = self.r.pipeline()
+        report_id = queue_report(pipe, analyst, investor, stock, analysis, action, allocation)
+        pipe.execute()
+        return report_id
+    
+    def save_reports(self, reports, pipe=None):
+        """Save many reports (dicts of save_report arguments) in one round trip.
+        
+        With ``pipe`` the writes are only queued and the caller executes the
+        pipeline, e.g. to commit other writes in the same transaction.
+        """
+        execute = pipe is None
+        pipe = pipe if pipe is not None else self.r.pipeline()
+        report_ids = [queue_report(pipe, **report) for report in reports]
+        if execute:
+            pipe.execute()
+        return report_ids
+    
+    def get_report(self, report_id):
+        report = self.r.hgetall(report_key(report_id))
+        return report or None
+    
+    def list_reports(self, username, offset=0, limit=20, stock=None, action=None,
+                     since=None, until=None, batch_size=100):
+        """Report metadata (no analysis payload), newest first.
         
-        report_data = {
-            'id': report_id,
-            'analyst': analyst,
-            'investor': investor,
-            'stock': stock,
-            'date': str(datetime.now()),
-            'analysis': json.dumps(analysis),
-            'action': action,
-            'allocation': str(allocation)
-        }
+        ``since``/``until`` are datetimes bounding the report date. Filtering
+        by ``action`` is applied while paging through the index in pipelined
+        batches of ``batch_size``.
+        """
+        index_key = report_index_key(username, stock)
+        min_score, max_score = score_range(since, until)
         
-        self.r.hset(report_key, mapping=report_data)
+        if not action:
+            report_ids = self.r.zrevrangebyscore(index_key, max_score, min_score, start=offset, num=limit)
+            return self._report_meta(report_ids)
         
-        # Add to investor's report list
-        self.r.lpush(f"reports:{investor}", report_id)
-        return report_id
+        page, start = ActionPage(action, offset, limit), 0
+        while not page.full:
+            report_ids = self.r.zrevrangebyscore(index_key, max_score, min_score, start=start, num=batch_size)
+            if not report_ids:
+                break
+            start += len(report_ids)
+            page.add(self._report_meta(report_ids))
+        return page.reports
     
+    def count_reports(self, username, stock=None, since=None, until=None, action=None, batch_size=500):
+        """Number of reports list_reports can page through with the same filters.
+        
+        With ``action`` the index is scanned in pipelined batches, reading
+        only the action field of each report.
+        """
+        index_key = report_index_key(username, stock)
+        min_score, max_score = score_range(since, until)
+        if not action:
+            return self.r.zcount(index_key, min_score, max_score)
+        
+        count, start = 0, 0
+        while True:
+            report_ids = self.r.zrevrangebyscore(index_key, max_score, min_score, start=start, num=batch_size)
+            if not report_ids:
+                return count
+            start += len(report_ids)
+            pipe = self.r.pipeline(transaction=False)
+            queue_report_actions(pipe, report_ids)
+            count += sum(value == action for value in pipe.execute())
+    
+    def _report_meta(self, report_ids):
+        pipe = self.r.pipeline(transaction=False)
+        queue_report_meta(pipe, report_ids)
+        return report_meta_rows(pipe.execute())
+    
+    @metrics.timed('get_reports')
     def get_reports(self, username):
-        report_ids = self.r.lrange(f"reports:{username}", 0, -1)
-        reports = []
-        for report_id in report_ids:
-            report_key = f"report:{report_id}"
-            report = self.r.hgetall(report_key)
-            if report:
-                reports.append(report)
-        return reports
-
-# Initialize database connection
+        report_ids = self.r.lrange(report_list_key(username), 0, -1)
+        pipe = self.r.pipeline(transaction=False)
+        queue_full_reports(pipe, report_ids)
+        return full_report_rows(pipe.execute())
+    
+    def scan_report_ids(self, batch_size=500):
+        for key in self.r.scan_iter(report_key('*'), count=batch_size):
+            yield key.split(':', 1)[1]
+    
+    def update_report_analysis(self, report_id, analysis):
+        self.r.hset(report_key(report_id), 'analysis', json.dumps(analysis))
+    
+    def rebuild_report_index(self, batch_size=500):
+        """Rebuild the report_index:* sorted sets from the reports:* lists."""
+        indexed = 0
+        for list_key in self.r.scan_iter(report_list_key('*'), count=batch_size):
+            username = list_key.split(':', 1)[1]
+            report_ids = self.r.lrange(list_key, 0, -1)
+            for i in range(0, len(report_ids), batch_size):
+                batch = report_ids[i:i + batch_size]
+                pipe = self.r.pipeline(transaction=False)
+                for report_id in batch:
+                    pipe.hmget(report_key(report_id), 'stock', 'date')
+                rows = pipe.execute()
+                
+                writes = self.r.pipeline(transaction=False)
+                for report_id, (stock, date) in zip(batch, rows):
+                    if date is None:
+                        continue
+                    score = datetime.fromisoformat(date).timestamp()
+                    writes.zadd(report_index_key(username), {report_id: score})
+                    writes.zadd(report_index_key(username, stock), {report_id: score})
+                    indexed += 1
+                writes.execute()
+        return indexed
+
+# Shared database handle; the connection pool is created on first use
 db = RedisDB()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+
+# Figures with more points than this per chart switch to WebGL traces and
+# are downsampled; 0 disables downsampling
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '2000'))
+# Most recent bars that are always drawn at full resolution
+CHART_FULL_TAIL = int(os.getenv('CHART_FULL_TAIL', '250'))
+
+
+def lttb_indices(y, threshold, x=None):
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points that keep the shape of ``y``.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the average of the next bucket.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    if np.isnan(y).any():
+        y = np.where(np.isnan(y), np.nanmean(y) if not np.isnan(y).all() else 0.0, y)
+
+    # Bucket boundaries of the n - 2 inner points
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Average of each bucket, the last "bucket" being the final point
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    # area = |y*(xa - ax) + x*(ay - ya) + (ax*ya - xa*ay)| for the selected
+    # point a and the next bucket's average; narrow buckets are faster as
+    # plain Python than as many tiny NumPy calls
+    ys, xs, el = y.tolist(), x.tolist(), edges.tolist()
+    avg_x, avg_y = avg_x[1:].tolist(), avg_y[1:].tolist()
+    narrow = (n - 2) / (threshold - 2) <= 32
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        xa, ya, ax, ay = xs[a], ys[a], avg_x[i], avg_y[i]
+        dx, dy, c = xa - ax, ay - ya, ax * ya - xa * ay
+        start, stop = el[i], el[i + 1]
+        if narrow:
+            best, best_area = start, -1.0
+            for j in range(start, stop):
+                area = abs(ys[j] * dx + xs[j] * dy + c)
+                if area > best_area:
+                    best, best_area = j, area
+            a = best
+        else:
+            a = start + int(np.abs(y[start:stop] * dx + x[start:stop] * dy + c).argmax())
+        selected.append(a)
+    selected.append(n - 1)
+    return np.array(selected, dtype=np.int64)
+
+
+def chart_indices(columns, max_points=CHART_MAX_POINTS, full_tail=CHART_FULL_TAIL):
+    """Row indices to plot for a chart showing several aligned series.
+
+    Returns None when no downsampling is needed. Otherwise the history
+    before the last ``full_tail`` rows is reduced with LTTB per series and
+    the union of the selected rows is used, so traces stay aligned for the
+    unified hover.
+    """
+    columns = [np.asarray(values, dtype=float) for values in columns]
+    n = len(columns[0]) if columns else 0
+    if not max_points or n <= max_points:
+        return None
+
+    tail = min(full_tail, max_points // 2)
+    head = n - tail
+    per_series = max((max_points - tail) // len(columns), 3)
+    picked = [lttb_indices(values[:head], per_series) for values in columns]
+    return np.union1d(np.unique(np.concatenate(picked)), np.arange(head, n))
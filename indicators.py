@@ -0,0 +1,142 @@
+import numpy as np
+
+# Output columns of compute_indicators, in order
+INDICATOR_COLUMNS = ['RSI', 'BB_Upper', 'BB_Lower', 'SMA_Fast', 'SMA_Slow', 'MACD', 'Signal_Line']
+
+# Bollinger windows whose variance is below this fraction of the prefix sum
+# of squares (about 1e8 float64 rounding errors of it) are recomputed from
+# the window itself. Ordinary price series never get close.
+_VAR_RECOMPUTE = 1e8 * np.finfo(np.float64).eps
+
+# Largest log-growth of the EMA scaling factor inside one vectorized chunk
+_EMA_LOG_LIMIT = {np.dtype(np.float64): 200.0, np.dtype(np.float32): 30.0}
+
+
+def compute_indicators(close, sma_fast=50, sma_slow=200, rsi_window=14, bb_window=20,
+                       bb_dev=2.0, macd_fast=12, macd_slow=26, macd_signal=9,
+                       dtype=np.float64):
+    """Compute all technical indicators for a close price array in one pass.
+
+    Returns an ``(n, len(INDICATOR_COLUMNS))`` Fortran-ordered array so each
+    indicator column is contiguous. Warm-up rows are NaN and follow the same
+    conventions as the ``ta`` package (``fillna=False``) and pandas rolling
+    means, so the output matches the previous per-indicator implementation.
+    ``close`` must not contain NaN.
+    """
+    dtype = np.dtype(dtype)
+    x = np.ascontiguousarray(close, dtype=dtype)
+    n = len(x)
+    out = np.full((n, len(INDICATOR_COLUMNS)), np.nan, dtype=dtype, order='F')
+    if n == 0:
+        return out
+
+    # Shared prefix sums of the close, centred on the first value to limit
+    # cancellation in the variance. They are always accumulated in float64,
+    # float32 only applies to the stored indicators and the EMA recursions.
+    centred = x.astype(np.float64) - x[0]
+    csum = np.empty(n + 1)
+    csum[0] = 0
+    np.cumsum(centred, out=csum[1:])
+
+    _rsi(x, rsi_window, out[:, 0])
+    _bollinger(centred, csum, x[0], bb_window, bb_dev, out[:, 1], out[:, 2])
+    _sma(csum, x[0], sma_fast, out[:, 3])
+    _sma(csum, x[0], sma_slow, out[:, 4])
+    _macd(x, macd_fast, macd_slow, macd_signal, out[:, 5], out[:, 6])
+    return out
+
+
+def ema(x, alpha, out=None):
+    """Recursive EMA ``y[t] = (1 - alpha) * y[t-1] + alpha * x[t]`` with ``y[0] = x[0]``.
+
+    Equivalent to ``Series.ewm(alpha=alpha, adjust=False).mean()``. The
+    recursion is unrolled into chunks where it can be written as a scaled
+    cumulative sum, so no Python-level loop runs per element.
+    """
+    x = np.asarray(x)
+    n = len(x)
+    if out is None:
+        out = np.empty(n, dtype=x.dtype)
+    if n == 0:
+        return out
+
+    decay = 1.0 - alpha
+    log_growth = -np.log(decay)
+    chunk = max(1, int(_EMA_LOG_LIMIT.get(x.dtype, 30.0) / log_growth)) if log_growth > 0 else n
+    chunk = min(chunk, n)
+    # growth[i] = decay ** -(i + 1)
+    growth = np.exp(log_growth * np.arange(1, chunk + 1, dtype=x.dtype))
+    weights = alpha * growth
+
+    prev = x[0]
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        size = stop - start
+        seg = out[start:stop]
+        np.multiply(x[start:stop], weights[:size], out=seg)
+        np.cumsum(seg, out=seg)
+        seg += prev
+        seg /= growth[:size]
+        prev = seg[-1]
+    return out
+
+
+def _sma(csum, offset, window, out):
+    if window > len(out):
+        return
+    np.subtract(csum[window:], csum[:-window], out=out[window - 1:])
+    out[window - 1:] /= window
+    out[window - 1:] += offset
+
+
+def _bollinger(centred, csum, offset, window, dev, upper, lower):
+    n = len(centred)
+    if window > n:
+        return
+    sq = np.empty(n + 1)
+    sq[0] = 0
+    np.cumsum(centred * centred, out=sq[1:])
+
+    mean = (csum[window:] - csum[:-window]) / window
+    var = (sq[window:] - sq[:-window]) / window - mean * mean
+    # The difference of prefix sums loses the digits of a variance that is
+    # tiny next to the accumulated squares (flat runs far from the first
+    # close); those few windows are recomputed directly
+    lossy = np.flatnonzero(var < _VAR_RECOMPUTE * sq[window:] / window)
+    if len(lossy):
+        var[lossy] = np.lib.stride_tricks.sliding_window_view(centred, window)[lossy].var(axis=1)
+    np.maximum(var, 0, out=var)
+    std = np.sqrt(var, out=var)
+    std *= dev
+    mean += offset
+    np.add(mean, std, out=upper[window - 1:])
+    np.subtract(mean, std, out=lower[window - 1:])
+
+
+def _rsi(x, window, out):
+    n = len(x)
+    if window > n:
+        return
+    diff = np.empty(n, dtype=x.dtype)
+    diff[0] = 0
+    np.subtract(x[1:], x[:-1], out=diff[1:])
+    up = ema(np.maximum(diff, 0), 1.0 / window)
+    down = ema(np.maximum(-diff, 0), 1.0 / window)
+
+    up, down = up[window - 1:], down[window - 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + up / down)
+    out[window - 1:] = np.where(down == 0, 100, rsi)
+
+
+def _macd(x, fast, slow, signal, macd_out, signal_out):
+    n = len(x)
+    if slow > n:
+        return
+    fast_ema = ema(x, 2.0 / (fast + 1))
+    slow_ema = ema(x, 2.0 / (slow + 1))
+    np.subtract(fast_ema[slow - 1:], slow_ema[slow - 1:], out=macd_out[slow - 1:])
+    if slow - 1 + signal > n:
+        return
+    signal_ema = ema(macd_out[slow - 1:], 2.0 / (signal + 1))
+    signal_out[slow + signal - 2:] = signal_ema[signal - 1:]
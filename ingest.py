@@ -0,0 +1,443 @@
+import argparse
+import csv
+import importlib
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+import metrics
+from analysis import fetch_stock_data, signal_arrays, ACTION_LABELS
+from db import db
+from resample import bucket_starts, interval_seconds
+from streaming import IndicatorState
+
+logger = logging.getLogger(__name__)
+
+# Redis keys: one quote stream and one closed-bar stream per ticker, one
+# stream of signal changes for all tickers and a hash of the latest signals
+QUOTE_STREAM = 'quotes:{ticker}'
+BAR_STREAM = 'bars:{ticker}:{interval}'
+SIGNAL_STREAM = 'signals'
+LATEST_KEY = 'signals:latest'
+# Streams are trimmed to about this many entries
+STREAM_MAXLEN = int(os.getenv('INGEST_STREAM_MAXLEN', '10000'))
+# The latest-signals hash expires when no quote arrived for this long
+LATEST_TTL = int(os.getenv('INGEST_LATEST_TTL', str(24 * 3600)))
+# A ticker without quotes for this many bar intervals is shown as stale
+STALE_BARS = int(os.getenv('INGEST_STALE_BARS', '3'))
+# Parallel history downloads for tickers that first appear in the quotes
+WARMUP_WORKERS = int(os.getenv('INGEST_WARMUP_WORKERS', '4'))
+# Quote timestamps are epoch seconds; bars use the exchange wall clock like the price cache
+EXCHANGE_TZ = os.getenv('EXCHANGE_TZ', 'America/New_York')
+
+# History loaded per bar interval before the first quote, enough for the 200-bar SMA
+WARMUP_PERIODS = {
+    '1m': '5d',
+    '5m': '1mo',
+    '15m': '1mo',
+    '30m': '1mo',
+    '1h': '6mo',
+    '4h': '1y',
+    '1d': '2y',
+}
+
+
+def _signal(indicators):
+    """generate_signals rules applied to the latest row of an IndicatorState."""
+    row = indicators.current
+    # The moving averages are named after the windows the state was built with
+    codes, allocations = signal_arrays(
+        np.float64(row[f'SMA_{indicators.sma_fast.window}']), np.float64(row[f'SMA_{indicators.sma_slow.window}']),
+        np.float64(row['MACD']), np.float64(row['Signal_Line']), np.float64(row['RSI'])
+    )
+    return str(ACTION_LABELS[codes]), float(allocations)
+
+
+class ReplaySource:
+    """Quotes from a CSV file with ``ts,ticker,price,size`` columns, for testing.
+
+    ``ts`` is epoch seconds or an ISO timestamp. With ``speed=0`` the file
+    is replayed as fast as the ingestor takes it, in batches of
+    ``batch_size``; otherwise quotes are paced at ``speed`` times the
+    recorded rate.
+    """
+
+    def __init__(self, path, speed=0.0, batch_size=500):
+        self.path = path
+        self.speed = speed
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _ts(value):
+        try:
+            return float(value)
+        except ValueError:
+            return datetime.fromisoformat(value).timestamp()
+
+    def batches(self):
+        batch, first_ts, started = [], None, time.monotonic()
+        with open(self.path, newline='') as f:
+            for row in csv.DictReader(f):
+                quote = (row['ticker'], self._ts(row['ts']), float(row['price']), float(row.get('size') or 0))
+                if self.speed > 0:
+                    first_ts = quote[1] if first_ts is None else first_ts
+                    wait = (quote[1] - first_ts) / self.speed - (time.monotonic() - started)
+                    if wait > 0:
+                        if batch:
+                            yield batch
+                            batch = []
+                        time.sleep(wait)
+                batch.append(quote)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+def write_replay(quotes, path):
+    """Write (ticker, ts, price, size) quotes as a ReplaySource file."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ts', 'ticker', 'price', 'size'])
+        writer.writerows((ts, ticker, price, size) for ticker, ts, price, size in quotes)
+
+
+class YahooQuoteSource:
+    """Polls Yahoo's latest minute bar every ``poll`` seconds and emits it as a quote.
+
+    Only bars whose close or volume changed since the previous poll are
+    emitted; ``size`` is the volume added since then.
+    """
+
+    def __init__(self, tickers, poll=15.0):
+        self.tickers = list(tickers)
+        self.poll = poll
+        self._last = {}
+
+    def batches(self):
+        import yfinance as yf
+        while True:
+            started = time.monotonic()
+            try:
+                batch = self._poll(yf)
+            except Exception as e:
+                logger.error(f"Error polling quotes: {str(e)}")
+                batch = []
+            yield batch
+            time.sleep(max(0.0, self.poll - (time.monotonic() - started)))
+
+    def _poll(self, yf):
+        raw = yf.download(self.tickers, period='1d', interval='1m', group_by='ticker',
+                          progress=False, threads=True)
+        batch = []
+        for ticker in self.tickers:
+            if raw.empty or ticker not in raw.columns.get_level_values(0):
+                continue
+            bars = raw[ticker].dropna(subset=['Close'])
+            if bars.empty:
+                continue
+            stamp, close, volume = bars.index[-1], float(bars['Close'].iloc[-1]), float(bars['Volume'].iloc[-1])
+            last = self._last.get(ticker)
+            if last == (stamp, close, volume):
+                continue
+            size = volume - last[2] if last is not None and last[0] == stamp else volume
+            self._last[ticker] = (stamp, close, volume)
+            batch.append((ticker, time.time(), close, max(size, 0.0)))
+        return batch
+
+
+def load_source(spec, tickers):
+    """'yahoo', or 'module:Class' for a class taking the ticker list and providing batches()."""
+    if spec == 'yahoo':
+        return YahooQuoteSource(tickers)
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)(tickers)
+
+
+class LiveTicker:
+    """Forming bar, indicator state and latest signal of one ticker."""
+
+    def __init__(self, indicators=None, bar_start=None):
+        self.indicators = indicators or IndicatorState()
+        # [start (wall-clock ns), open, high, low, close, volume] of the newest bar
+        self.bar = [bar_start, None, None, None, None, 0.0] if bar_start is not None else None
+        self.action, self.allocation = _signal(self.indicators) if self.indicators.bars else ('NO DATA', 0.0)
+        # Fields of the latest signal, as stored in signals:latest
+        self.latest = None
+        self.last_quote = None
+
+
+class QuoteIngestor:
+    """Appends quotes to Redis Streams and publishes signal changes.
+
+    Every quote goes to ``quotes:<TICKER>``. Quotes are folded into
+    ``interval`` bars; closed bars go to ``bars:<TICKER>:<interval>``. The
+    forming bar is kept in the ticker's IndicatorState with
+    ``replace=True``, so indicators and the generate_signals action are up
+    to date after every quote. When the action changes it is appended to
+    the ``signals`` stream. The ``signals:latest`` hash holds the current
+    signal of every ticker and when it last had a quote, so dashboards
+    and alerts read pushes instead of polling Yahoo and can tell live
+    tickers from stale ones.
+
+    Tickers that first show up in the quotes are warmed up on a background
+    thread; their quotes are held back until the history is loaded, so the
+    download never stalls the other tickers.
+    """
+
+    def __init__(self, interval='1m', database=None, warmup=True, maxlen=STREAM_MAXLEN, tz=EXCHANGE_TZ):
+        self.interval = interval
+        self.r = (database or db).r
+        self.warmup = warmup
+        self.maxlen = maxlen
+        self.tz = ZoneInfo(tz)
+        self.tickers = {}
+        # Ticker -> (future of its LiveTicker, quotes held back meanwhile)
+        self._warming = {}
+        self._pool = None
+
+    def add_ticker(self, ticker):
+        """Start following a ticker, warming its indicators up from the price cache (blocking)."""
+        ticker = ticker.upper()
+        if ticker not in self.tickers:
+            self.tickers[ticker] = self._warm_up(ticker)
+        return self.tickers[ticker]
+
+    def _warm_up(self, ticker):
+        live = LiveTicker()
+        if not self.warmup:
+            return live
+        data = fetch_stock_data(ticker, WARMUP_PERIODS[self.interval], interval=self.interval)
+        if data.empty:
+            return live
+        index = data.index.tz_convert(self.tz).tz_localize(None) if data.index.tz else data.index
+        live = LiveTicker(IndicatorState.from_history(data['Close'].to_numpy()), int(index.asi8[-1]))
+        live.latest = self._entry(ticker, live, 'NO DATA', float(data['Close'].iloc[-1]),
+                                  pd.Timestamp(data.index[-1]).timestamp())
+        logger.info(f"Warmed up {ticker} from {len(data)} {self.interval} bars: {live.action}")
+        return live
+
+    def _start_warm_up(self, ticker):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(WARMUP_WORKERS, thread_name_prefix='ingest-warmup')
+        logger.info(f"New ticker {ticker} in the quotes, warming it up")
+        self._warming[ticker] = (self._pool.submit(self._warm_up, ticker), [])
+
+    def _wall_ns(self, ts):
+        offset = datetime.fromtimestamp(ts, self.tz).utcoffset().total_seconds()
+        return int(round((ts + offset) * 1e9))
+
+    def process(self, quotes):
+        """Ingest a batch of (ticker, ts, price, size) quotes; returns the signal changes."""
+        changes, touched = [], set()
+        with metrics.timer('ingest_batch'):
+            pipe = self.r.pipeline(transaction=False)
+            for ticker, ts, price, size in self._warmed_up():
+                touched.add(ticker)
+                changes.append(self._apply(ticker, ts, price, size, pipe))
+            for ticker, ts, price, size in quotes:
+                ticker = ticker.upper()
+                pipe.xadd(QUOTE_STREAM.format(ticker=ticker), {'ts': ts, 'price': price, 'size': size},
+                          maxlen=self.maxlen, approximate=True)
+                if ticker not in self.tickers:
+                    if not self.warmup:
+                        self.tickers[ticker] = LiveTicker()
+                    else:
+                        if ticker not in self._warming:
+                            self._start_warm_up(ticker)
+                        self._warming[ticker][1].append((ts, price, size))
+                        continue
+                touched.add(ticker)
+                changes.append(self._apply(ticker, ts, price, size, pipe))
+            self._queue_latest(touched, pipe)
+            pipe.execute()
+        metrics.inc('ingest_quotes_total', len(quotes))
+        return [change for change in changes if change]
+
+    def _warmed_up(self):
+        """Install tickers whose warm-up finished; returns their held-back quotes."""
+        quotes = []
+        for ticker, (future, waiting) in list(self._warming.items()):
+            if not future.done():
+                continue
+            del self._warming[ticker]
+            try:
+                self.tickers[ticker] = future.result()
+            except Exception as e:
+                logger.error(f"Error warming up {ticker}: {str(e)}")
+                self.tickers[ticker] = LiveTicker()
+            quotes += [(ticker, ts, price, size) for ts, price, size in waiting]
+        return quotes
+
+    def _entry(self, ticker, live, previous, price, ts):
+        row = live.indicators.current
+        entry = {
+            'ticker': ticker, 'action': live.action, 'previous': previous, 'allocation': live.allocation,
+            'price': price, 'ts': ts, 'published': time.time(), 'interval': self.interval,
+            'rsi': row['RSI'], 'macd': row['MACD'], 'signal_line': row['Signal_Line'],
+        }
+        return {k: '' if isinstance(v, float) and np.isnan(v) else v for k, v in entry.items()}
+
+    def _apply(self, ticker, ts, price, size, pipe):
+        live = self.tickers[ticker]
+        live.last_quote = (ts, price)
+        start = int(bucket_starts(np.array([self._wall_ns(ts)], dtype='int64'), self.interval)[0])
+        bar = live.bar
+
+        if bar is not None and start < bar[0]:
+            # Too late for a bar that is already closed
+            metrics.inc('ingest_late_quotes_total')
+            return None
+        if bar is None or start > bar[0]:
+            if bar is not None and bar[1] is not None:
+                self._close_bar(ticker, bar, pipe)
+            live.bar = [start, price, price, price, price, size]
+            live.indicators.update(price)
+        else:
+            if bar[1] is None:
+                # The bar was loaded with the warm-up history; quotes take it over from here
+                bar[1:5] = [price, price, price, price]
+            bar[2], bar[3], bar[4] = max(bar[2], price), min(bar[3], price), price
+            bar[5] += size
+            live.indicators.update(price, replace=True)
+
+        action, allocation = _signal(live.indicators)
+        if action == live.action:
+            return None
+        previous = live.action
+        live.action, live.allocation = action, allocation
+        live.latest = self._entry(ticker, live, previous, price, ts)
+        pipe.xadd(SIGNAL_STREAM, live.latest, maxlen=self.maxlen, approximate=True)
+        metrics.inc('signal_changes_total', action=action)
+        return live.latest
+
+    def _queue_latest(self, tickers, pipe):
+        """Store the latest signal of ``tickers`` with the time and price of their last quote."""
+        for ticker in tickers:
+            live = self.tickers[ticker]
+            if live.latest is None:
+                continue
+            ts, price = live.last_quote
+            pipe.hset(LATEST_KEY, ticker, json.dumps({**live.latest, 'last_ts': ts, 'last_price': price}))
+        if tickers:
+            # Left over from a service that stopped, the hash goes away on its own
+            pipe.expire(LATEST_KEY, LATEST_TTL)
+
+    def _close_bar(self, ticker, bar, pipe):
+        start, open_, high, low, close, volume = bar
+        pipe.xadd(BAR_STREAM.format(ticker=ticker, interval=self.interval),
+                  {'start': str(np.datetime64(start, 'ns').astype('datetime64[s]')), 'open': open_, 'high': high,
+                   'low': low, 'close': close, 'volume': volume},
+                  maxlen=self.maxlen, approximate=True)
+
+    def run(self, source, stop=None):
+        """Ingest batches from ``source`` until it ends or ``stop`` is set; returns the quote count."""
+        count = 0
+        for batch in source.batches():
+            if stop is not None and stop.is_set():
+                break
+            if not batch and not self._warming:
+                continue
+            count += self._process_safely(batch)
+        if self._warming and not (stop is not None and stop.is_set()):
+            # The source ended; apply the quotes still waiting for a warm-up
+            wait([future for future, _ in self._warming.values()])
+            self._process_safely([])
+        return count
+
+    def _process_safely(self, batch):
+        try:
+            self.process(batch)
+            return len(batch)
+        except Exception as e:
+            # A Redis hiccup loses this batch, not the service
+            logger.error(f"Error ingesting {len(batch)} quotes: {str(e)}")
+            time.sleep(1)
+            return 0
+
+
+def is_stale(entry, now=None):
+    """True when a signals:latest entry has had no quote for STALE_BARS bar intervals."""
+    # Judged by the quote's own timestamp, not when the ingestor wrote it
+    last_ts = float(entry.get('last_ts') or entry.get('ts') or 0)
+    width = interval_seconds(entry.get('interval') or '1m')
+    return (now or time.time()) - last_ts > STALE_BARS * width
+
+
+def latest_signals(database=None, include_stale=False):
+    """{ticker: latest signal} as published by the ingestor, without stale tickers unless asked."""
+    raw = (database or db).r.hgetall(LATEST_KEY)
+    signals = {ticker: json.loads(value) for ticker, value in raw.items()}
+    if include_stale:
+        return signals
+    now = time.time()
+    return {ticker: entry for ticker, entry in signals.items() if not is_stale(entry, now)}
+
+
+def read_signals(last_id='$', block=5000, count=100, database=None):
+    """Signal changes after ``last_id``, waiting up to ``block`` ms for one.
+
+    Returns ``(last_id, changes)``; pass the returned id to the next call.
+    """
+    reply = (database or db).r.xread({SIGNAL_STREAM: last_id}, count=count, block=block)
+    changes = []
+    for _, entries in reply or []:
+        for entry_id, fields in entries:
+            changes.append(fields)
+            last_id = entry_id
+    return last_id, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest live quotes into Redis Streams and publish signal changes")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run = subparsers.add_parser('run', help="Run the ingestion service")
+    run.add_argument('tickers', nargs='*', help="Tickers to warm up and poll")
+    run.add_argument('--interval', default='1m', choices=list(WARMUP_PERIODS))
+    run.add_argument('--replay', help="CSV file of ts,ticker,price,size quotes to replay instead of a live source")
+    run.add_argument('--speed', type=float, default=0.0, help="Replay pace, 0 for as fast as possible")
+    run.add_argument('--source', default='yahoo', help="'yahoo' or module:Class of a custom quote source")
+    run.add_argument('--no-warmup', action='store_true', help="Start indicators without history")
+    watch = subparsers.add_parser('watch', help="Print signal changes as they are published")
+    watch.add_argument('tickers', nargs='*', help="Only these tickers")
+    args = parser.parse_args()
+
+    if args.command == 'watch':
+        only = {t.upper() for t in args.tickers}
+        last_id = '$'
+        while True:
+            last_id, changes = read_signals(last_id)
+            for change in changes:
+                if not only or change['ticker'] in only:
+                    print(f"{change['ticker']}: {change['previous']} -> {change['action']} at {change['price']}")
+        return
+
+    metrics.start_exporter()
+    ingestor = QuoteIngestor(args.interval, warmup=not args.no_warmup)
+    for ticker in args.tickers:
+        ingestor.add_ticker(ticker)
+    source = ReplaySource(args.replay, args.speed) if args.replay else load_source(args.source, args.tickers)
+
+    stop = threading.Event()
+
+    def shutdown(signum, frame):
+        logger.info("Stopping ingestion")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    start = time.perf_counter()
+    count = ingestor.run(source, stop)
+    logger.info(f"Ingested {count} quotes in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
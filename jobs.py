@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from db import db
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'jobs:queue'
+PROCESSING_KEY = 'jobs:processing'
+# Finished jobs are kept this long for the UI to pick up the result
+JOB_TTL = int(os.getenv('JOB_TTL', str(24 * 3600)))
+# A running job without a heartbeat for this long is assumed lost with its worker
+STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '300'))
+MAX_ATTEMPTS = 3
+# Off runs jobs in the calling process, for development without worker.py
+QUEUE_ENABLED = os.getenv('ANALYSIS_QUEUE', 'on').lower() not in ('0', 'off', 'false')
+
+
+def enqueue_analysis(analyst, investor, ticker, period, database=None, interval='1d'):
+    """Queue an "Analyze Stock" job and return its id; poll it with get_job()."""
+    database = database or db
+    job_id = str(uuid.uuid4())
+    job = {
+        'id': job_id,
+        'type': 'analysis',
+        'status': 'queued',
+        'analyst': analyst,
+        'investor': investor,
+        'ticker': ticker,
+        'period': period,
+        'interval': interval,
+        'attempts': 0,
+        'created': time.time(),
+    }
+    pipe = database.r.pipeline()
+    pipe.hset(f"job:{job_id}", mapping=job)
+    if QUEUE_ENABLED:
+        pipe.lpush(QUEUE_KEY, job_id)
+    pipe.execute()
+    if not QUEUE_ENABLED:
+        # No workers: run it here, with the same bookkeeping
+        _execute(database.r, job_id, job, 'inline', database, held=False)
+    return job_id
+
+
+def get_job(job_id, database=None):
+    """Job hash with 'result' decoded, or None once it expired."""
+    job = (database or db).r.hgetall(f"job:{job_id}")
+    if not job:
+        return None
+    if job.get('result'):
+        job['result'] = json.loads(job['result'])
+    return job
+
+
+def queue_position(job_id, database=None):
+    """Number of jobs ahead of a queued job, or None when it is not queued."""
+    r = (database or db).r
+    index = r.lpos(QUEUE_KEY, job_id)
+    if index is None:
+        return None
+    return r.llen(QUEUE_KEY) - index - 1
+
+
+def run_job(job, database=None):
+    """Run the analysis pipeline for a job and save the report; returns the result dict."""
+    # The web app only queues and polls jobs, so it never loads the analysis stack
+    from pipeline import run_analysis
+    from price_cache import base_interval
+    database = database or db
+    # Jobs queued before intervals existed have none
+    interval = job.get('interval', '1d')
+    base_interval(interval, job['period'])  # ValueError when Yahoo has no such history
+    result = run_analysis(job['ticker'], job['period'], interval=interval)
+    if result['status'] == 'no_data':
+        raise ValueError("No data found for this ticker. Please try a different stock symbol.")
+    if result['status'] == 'insufficient':
+        raise ValueError(f"Not enough data to calculate all indicators. Got {result['bars']} data points.")
+
+    report_id = database.save_report(
+        analyst=job['analyst'],
+        investor=job['investor'],
+        stock=job['ticker'],
+        analysis=result['analysis_json'],
+        action=result['action'],
+        allocation=result['allocation']
+    )
+    return {
+        'report_id': report_id,
+        'action': result['action'],
+        'allocation': result['allocation'],
+        'summary': result['summary'],
+        'digest': result['digest'],
+    }
+
+
+def _store(r, job_id, **fields):
+    pipe = r.pipeline()
+    pipe.hset(f"job:{job_id}", mapping={**fields, 'finished': time.time()})
+    pipe.expire(f"job:{job_id}", JOB_TTL)
+    pipe.execute()
+
+
+def _finish(r, job_id, **fields):
+    """Record the outcome of a job this worker still holds; False when it was requeued meanwhile."""
+    # Whoever removes the id from the processing list owns the outcome, so a
+    # run that was requeued doesn't overwrite the status of the newer attempt
+    if not r.lrem(PROCESSING_KEY, 1, job_id):
+        logger.warning(f"Job {job_id} was requeued while it ran, discarding this run's status")
+        return False
+    _store(r, job_id, **fields)
+    return True
+
+
+def _heartbeat(r, job_id, stop, every):
+    """Refresh the heartbeat of a running job until ``stop`` is set."""
+    while not stop.wait(every):
+        try:
+            r.hset(f"job:{job_id}", 'heartbeat', time.time())
+        except Exception as e:
+            logger.error(f"Heartbeat failed for job {job_id}: {str(e)}")
+
+
+def _execute(r, job_id, job, worker, database, held=True):
+    """Run a job; ``held`` is False for inline jobs that never were on the processing list."""
+    r.hset(f"job:{job_id}", mapping={
+        'status': 'running', 'worker': worker, 'started': time.time(), 'heartbeat': time.time()
+    })
+    r.hincrby(f"job:{job_id}", 'attempts', 1)
+    finish = _finish if held else _store
+
+    # Keep the job from looking lost to requeue_stale() however long it runs
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(r, job_id, stop, max(STALE_AFTER / 3, 1)),
+                     name=f"heartbeat-{job_id}", daemon=True).start()
+    start = time.perf_counter()
+    try:
+        result = run_job(job, database)
+    except Exception as e:
+        stop.set()
+        logger.error(f"Job {job_id} ({job.get('ticker')}) failed: {str(e)}")
+        finish(r, job_id, status='failed', error=str(e))
+    else:
+        stop.set()
+        if finish(r, job_id, status='done', result=json.dumps(result)):
+            logger.info(f"Job {job_id} ({job['ticker']}) done in {time.perf_counter() - start:.2f}s")
+
+
+def process_next(worker, timeout=5, database=None):
+    """Take one job off the queue and run it; returns the job id or None after ``timeout`` seconds.
+
+    The job id moves atomically to the processing list while it runs, so a
+    job of a crashed worker can be requeued by requeue_stale().
+    """
+    database = database or db
+    r = database.r
+    job_id = r.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, 'RIGHT', 'LEFT')
+    if job_id is None:
+        return None
+
+    job = r.hgetall(f"job:{job_id}")
+    if not job:
+        r.lrem(PROCESSING_KEY, 1, job_id)
+        return job_id
+    _execute(r, job_id, job, worker, database)
+    return job_id
+
+
+def requeue_stale(stale_after=STALE_AFTER, max_attempts=MAX_ATTEMPTS, database=None):
+    """Put jobs whose worker stopped sending heartbeats back on the queue."""
+    r = (database or db).r
+    now = time.time()
+    requeued = 0
+    for job_id in r.lrange(PROCESSING_KEY, 0, -1):
+        job = r.hgetall(f"job:{job_id}")
+        if job and not job.get('heartbeat'):
+            # Claimed but not started yet: blmove and the first heartbeat are
+            # separate steps, so the grace period starts when it is first seen
+            r.hsetnx(f"job:{job_id}", 'heartbeat', now)
+            continue
+        if job and now - float(job['heartbeat']) < stale_after:
+            continue
+        # Only the caller that removes the id may requeue it
+        if not r.lrem(PROCESSING_KEY, 1, job_id) or not job:
+            continue
+        if int(job.get('attempts', 0)) >= max_attempts:
+            _store(r, job_id, status='failed', error=f"Gave up after {job['attempts']} attempts")
+            continue
+        pipe = r.pipeline()
+        pipe.hset(f"job:{job_id}", 'status', 'queued')
+        # The next worker to claim it gets a fresh grace period
+        pipe.hdel(f"job:{job_id}", 'heartbeat')
+        pipe.rpush(QUEUE_KEY, job_id)
+        pipe.execute()
+        requeued += 1
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale jobs")
+    return requeued
+
+
+def queue_stats(database=None):
+    r = (database or db).r
+    return {'queued': r.llen(QUEUE_KEY), 'running': r.llen(PROCESSING_KEY)}
@@ -0,0 +1,214 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from db import db
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'llm_cache'
+DEFAULT_TTL = int(os.getenv('LLM_CACHE_TTL', str(24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+DEFAULT_THRESHOLD = float(os.getenv('LLM_CACHE_THRESHOLD', '0.6'))
+
+# Most cached questions a lookup compares against for one context
+MAX_CANDIDATES = 200
+
+STOPWORDS = frozenset("""
+a an the is are was were be been being do does did doing this that these those it its of in on at
+to for from by with about as and or but if then so than what whats which who whom why how when
+where can could would should will shall may might must me my i you your we our us they their them
+please tell explain show give describe say mean stock chart graph current currently here there
+any some now just indicate indicating indication suggest suggesting s t
+""".split())
+
+# Terms that change the meaning of a question, e.g. RSI vs MACD or buy vs
+# sell. Two questions only match when they share exactly the same ones.
+KEY_TERMS = frozenset("""
+rsi macd sma ema bollinger band signal line histogram volume price trend support resistance
+buy sell hold strong overbought oversold divergence crossover cross golden death breakout
+upper lower average moving risk allocation entry exit stop target short long
+""".split())
+
+
+def normalize_question(text):
+    """Lower-cased, singular question words without punctuation and filler words."""
+    tokens = re.findall(r'[a-z0-9]+', text.lower())
+    kept = [t for t in tokens if t not in STOPWORDS] or tokens
+    return ' '.join(t[:-1] if len(t) > 3 and t.endswith('s') and not t.endswith('ss') else t for t in kept)
+
+
+def _key_terms(normalized):
+    return {t for t in normalized.split() if t in KEY_TERMS or t.isdigit()}
+
+
+def shingles(normalized, k=3):
+    """Character k-grams of the normalized question, padded at word edges."""
+    text = f" {normalized} "
+    return {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+
+
+def similarity(a, b):
+    """Jaccard similarity of two normalized questions, 0 when their key terms differ."""
+    if a == b:
+        return 1.0
+    if _key_terms(a) != _key_terms(b):
+        return 0.0
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+
+def context_key(kind, context):
+    """Short stable id for the report/analysis context a question is asked in."""
+    return hashlib.sha1(f"{kind}\0{context or ''}".encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Redis-backed cache of chatbot responses, shared by all app instances.
+
+    Entries are keyed by context id plus the hash of the normalized question
+    and expire after ``ttl`` seconds. A lookup that misses the exact key
+    compares against the other questions cached for the same context and
+    returns the closest one above ``threshold``. The total number of entries
+    is bounded by ``max_entries`` with least-recently-used eviction.
+
+    Keys:
+      llm_cache:entry:{ctx}:{qhash}  JSON entry, with a TTL
+      llm_cache:ctx:{ctx}            set of qhashes cached for a context
+      llm_cache:lru                  zset of "{ctx}:{qhash}" by last access time
+      llm_cache:stats                hash of hit/near_hit/miss/store/evict counters
+    """
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 threshold=DEFAULT_THRESHOLD):
+        self._client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+
+    @property
+    def r(self):
+        # The shared client is only resolved on the first lookup
+        return self._client or db.r
+
+    def _entry_key(self, ctx, qhash):
+        return f"{KEY_PREFIX}:entry:{ctx}:{qhash}"
+
+    def _count(self, field):
+        self.r.hincrby(f"{KEY_PREFIX}:stats", field, 1)
+
+    def get(self, kind, context, question):
+        """Cached response for a question in a context, or None."""
+        try:
+            return self._get(context_key(kind, context), normalize_question(question))
+        except Exception as e:
+            logger.error(f"Error reading LLM cache: {str(e)}")
+            return None
+
+    def _get(self, ctx, normalized):
+        qhash = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+        raw = self.r.get(self._entry_key(ctx, qhash))
+        if raw is not None:
+            self._touch(ctx, qhash)
+            self._count('hits')
+            return json.loads(raw)['response']
+
+        qhashes = list(self.r.smembers(f"{KEY_PREFIX}:ctx:{ctx}"))[:MAX_CANDIDATES]
+        if not qhashes:
+            self._count('misses')
+            return None
+
+        pipe = self.r.pipeline(transaction=False)
+        for candidate in qhashes:
+            pipe.get(self._entry_key(ctx, candidate))
+        best, best_score, expired = None, self.threshold, []
+        for candidate, raw in zip(qhashes, pipe.execute()):
+            if raw is None:
+                expired.append(candidate)
+                continue
+            entry = json.loads(raw)
+            score = similarity(normalized, entry['question'])
+            if score >= best_score:
+                best, best_score = (candidate, entry), score
+        if expired:
+            self.r.srem(f"{KEY_PREFIX}:ctx:{ctx}", *expired)
+
+        if best is None:
+            self._count('misses')
+            return None
+        self._touch(ctx, best[0])
+        self._count('near_hits')
+        return best[1]['response']
+
+    def _touch(self, ctx, qhash):
+        self.r.zadd(f"{KEY_PREFIX}:lru", {f"{ctx}:{qhash}": time.time()})
+
+    def set(self, kind, context, question, response):
+        """Cache a response, evicting least recently used entries over the limit."""
+        try:
+            self._set(context_key(kind, context), normalize_question(question), response)
+        except Exception as e:
+            logger.error(f"Error writing LLM cache: {str(e)}")
+
+    def _set(self, ctx, normalized, response):
+        qhash = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+        entry = {'question': normalized, 'response': response, 'created': time.time()}
+        pipe = self.r.pipeline()
+        pipe.set(self._entry_key(ctx, qhash), json.dumps(entry), ex=self.ttl)
+        pipe.sadd(f"{KEY_PREFIX}:ctx:{ctx}", qhash)
+        pipe.expire(f"{KEY_PREFIX}:ctx:{ctx}", self.ttl)
+        pipe.zadd(f"{KEY_PREFIX}:lru", {f"{ctx}:{qhash}": time.time()})
+        pipe.hincrby(f"{KEY_PREFIX}:stats", 'stores', 1)
+        pipe.zcard(f"{KEY_PREFIX}:lru")
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def _evict(self, count):
+        # Also drops LRU members whose entry already expired through the TTL
+        victims = self.r.zpopmin(f"{KEY_PREFIX}:lru", count)
+        pipe = self.r.pipeline(transaction=False)
+        for member, _ in victims:
+            ctx, qhash = member.split(':', 1)
+            pipe.delete(self._entry_key(ctx, qhash))
+            pipe.srem(f"{KEY_PREFIX}:ctx:{ctx}", qhash)
+        pipe.hincrby(f"{KEY_PREFIX}:stats", 'evictions', len(victims))
+        pipe.execute()
+
+    def stats(self):
+        """Hit/miss counters plus the current number of entries."""
+        counters = {
+            field: int(self.r.hget(f"{KEY_PREFIX}:stats", field) or 0)
+            for field in ('hits', 'near_hits', 'misses', 'stores', 'evictions')
+        }
+        lookups = counters['hits'] + counters['near_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['hits'] + counters['near_hits']) / lookups if lookups else 0.0
+        counters['entries'] = self.r.zcard(f"{KEY_PREFIX}:lru")
+        return counters
+
+    def clear(self):
+        """Remove every cache entry and reset the counters."""
+        keys = list(self.r.scan_iter(match=f"{KEY_PREFIX}:*", count=500))
+        for i in range(0, len(keys), 500):
+            self.r.delete(*keys[i:i + 500])
+        return len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the chatbot response cache")
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args()
+
+    cache = ResponseCache()
+    if args.command == 'stats':
+        for field, value in cache.stats().items():
+            print(f"{field}: {value:.2%}" if field == 'hit_rate' else f"{field}: {value}")
+    else:
+        print(f"Deleted {cache.clear()} keys")
+
+
+if __name__ == '__main__':
+    main()
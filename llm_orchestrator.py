@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from dotenv import load_dotenv
+from groq import AsyncGroq, APIConnectionError, APIStatusError, InternalServerError, RateLimitError
+from chart_digest import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+DEFAULT_MODEL = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+
+# Defaults sized for the Groq free tier of llama3-70b-8192
+DEFAULT_RPM = float(os.getenv('LLM_RPM', '30'))
+DEFAULT_TPM = float(os.getenv('LLM_TPM', '6000'))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+DEFAULT_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv('LLM_IDLE_TIMEOUT', '15'))
+DEFAULT_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` per second up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1.0):
+        # A request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def _retry_after(error):
+    if isinstance(error, APIStatusError):
+        try:
+            return float(error.response.headers.get('retry-after', 0))
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(m['content']) for m in messages)
+
+
+class LLMOrchestrator:
+    """Rate-limited, retrying access to the Groq chat completions API.
+
+    All requests run on one event loop in a background thread so the
+    limits hold for every caller in the process: Streamlit sessions use the
+    blocking ``complete``/``stream`` methods, batch jobs ``complete_many``
+    or ``await acomplete(...)`` from their own event loop.
+
+    - requests and estimated prompt tokens per minute are limited by token buckets
+    - at most ``max_concurrency`` requests are in flight
+    - each request has a deadline covering queueing and retries; for
+      streams it ends at the first chunk, after which each further chunk
+      must arrive within ``idle_timeout``
+    - a stream keeps its concurrency slot until it is read to the end or closed
+    - rate limit, connection and 5xx errors are retried with jittered
+      exponential backoff, honouring Retry-After
+    - identical prompts in flight at the same time share one request
+    """
+
+    def __init__(self, client=None, model=DEFAULT_MODEL, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=0.5, max_backoff=20.0):
+        # Retries are done here, with the shared limits, not inside the client
+        self.client = client or AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+        self.model = model
+        self.rpm, self.tpm = rpm, tpm
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {'requests': 0, 'coalesced': 0, 'retries': 0, 'failures': 0, 'timeouts': 0}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='llm-orchestrator', daemon=True).start()
+                # The limiters belong to the orchestrator loop
+                future = asyncio.run_coroutine_threadsafe(self._setup(), self._loop)
+                future.result()
+        return self._loop
+
+    async def _setup(self):
+        self._requests = TokenBucket(self.rpm / 60, max(self.rpm / 10, 1))
+        self._tokens = TokenBucket(self.tpm / 60, self.tpm / 4)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = {}
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def complete(self, messages, timeout=None, **params):
+        """Completion text for a list of chat messages, blocking the calling thread."""
+        return self._submit(self._complete(messages, timeout, params)).result()
+
+    def submit(self, messages, timeout=None, **params):
+        """Start ``complete`` on the orchestrator loop; returns a concurrent.futures.Future of the text."""
+        return self._submit(self._complete(messages, timeout, params))
+
+    async def acomplete(self, messages, timeout=None, **params):
+        """Awaitable ``complete`` for callers running their own event loop."""
+        return await asyncio.wrap_future(self._submit(self._complete(messages, timeout, params)))
+
+    def complete_many(self, requests, timeout=None, **params):
+        """Complete many message lists concurrently within the shared limits.
+
+        Returns the text or the exception for each request, in order.
+        """
+        futures = [self._submit(self._complete(messages, timeout, params)) for messages in requests]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stream(self, messages, timeout=None, **params):
+        """Yield completion text chunks as they arrive, blocking the calling thread."""
+        chunks = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self._stream(messages, timeout, params):
+                    chunks.put((chunk, None))
+            except BaseException as e:
+                chunks.put((None, e))
+                raise
+            chunks.put((None, None))
+
+        future = self._submit(pump())
+        try:
+            while True:
+                chunk, error = chunks.get()
+                if error is not None:
+                    raise error
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            future.cancel()
+
+    def _key(self, messages, params):
+        payload = json.dumps([self.model, messages, params], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    async def _complete(self, messages, timeout, params):
+        key = self._key(messages, params)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(messages, timeout, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats['coalesced'] += 1
+        # One caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _request(self, messages, timeout, params):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        try:
+            async with asyncio.timeout_at(self._loop_time(deadline)):
+                return await self._attempts(messages, deadline, params, stream=False)
+        except TimeoutError:
+            self.stats['timeouts'] += 1
+            raise TimeoutError(f"LLM request timed out after {timeout or self.timeout:g}s") from None
+
+    async def _stream(self, messages, timeout, params):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        stream = None
+        try:
+            # The deadline covers queueing, retries and the first chunk only,
+            # so long answers are not cut off while tokens keep arriving
+            try:
+                async with asyncio.timeout_at(self._loop_time(deadline)):
+                    stream = await self._attempts(messages, deadline, params, stream=True)
+                    chunks = aiter(stream)
+                    chunk = await anext(chunks, None)
+            except TimeoutError:
+                self.stats['timeouts'] += 1
+                raise TimeoutError(f"LLM request timed out after {timeout or self.timeout:g}s") from None
+
+            while chunk is not None:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                try:
+                    async with asyncio.timeout(self.idle_timeout):
+                        chunk = await anext(chunks, None)
+                except TimeoutError:
+                    self.stats['timeouts'] += 1
+                    raise TimeoutError(f"LLM stream stalled for {self.idle_timeout:g}s") from None
+        finally:
+            if stream is not None:
+                # _attempts hands over the stream with its slot still held
+                try:
+                    await stream.close()
+                finally:
+                    self._slots.release()
+
+    def _loop_time(self, deadline):
+        return asyncio.get_running_loop().time() + (deadline - time.monotonic())
+
+    async def _attempts(self, messages, deadline, params, stream):
+        # Streams are only retried until the response starts. An opened
+        # stream is returned with its slot still acquired; _stream releases
+        # it once the stream is read or closed.
+        attempt = 0
+        while True:
+            await self._requests.acquire()
+            await self._tokens.acquire(_prompt_tokens(messages))
+            try:
+                await self._slots.acquire()
+                try:
+                    self.stats['requests'] += 1
+                    response = await self.client.chat.completions.create(
+                        messages=messages,
+                        model=self.model,
+                        stream=stream,
+                        timeout=max(deadline - time.monotonic(), 0.1),
+                        **params
+                    )
+                except BaseException:
+                    self._slots.release()
+                    raise
+                if stream:
+                    return response
+                self._slots.release()
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                delay = max(
+                    random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)),
+                    _retry_after(e)
+                )
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + delay >= deadline:
+                    self.stats['failures'] += 1
+                    raise
+                self.stats['retries'] += 1
+                logger.warning(f"LLM request failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except Exception:
+                self.stats['failures'] += 1
+                raise
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator():
+    """Process-wide orchestrator, so every caller shares one set of limits."""
+    global _orchestrator
+    with _orchestrator_lock:
+        if _orchestrator is None:
+            _orchestrator = LLMOrchestrator()
+    return _orchestrator
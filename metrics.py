@@ -0,0 +1,263 @@
+import atexit
+import bisect
+import inspect
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# METRICS_ENABLED=off turns every timer and counter into a no-op
+ENABLED = os.getenv('METRICS_ENABLED', 'on').lower() not in ('0', 'off', 'false')
+NAMESPACE = 'stock_bot'
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000)
+BYTE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6)
+
+# Metrics written by the app, for # HELP lines
+HELP = {
+    'stage_seconds': 'Wall time of instrumented pipeline stages',
+    'stage_errors_total': 'Instrumented stage calls that raised',
+    'redis_bytes_total': 'Report payload bytes written to or read from Redis',
+    'payload_bytes': 'Size of single report payloads',
+    'llm_prompt_tokens': 'Estimated prompt tokens sent to the LLM',
+    'llm_prompt_chars_total': 'Prompt characters sent to the LLM',
+    'ingest_quotes_total': 'Quotes appended to Redis Streams by ingest.py',
+    'ingest_late_quotes_total': 'Quotes older than the forming bar, stored but not applied',
+    'signal_changes_total': 'Signal changes published by ingest.py',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    """Label value escaped as the Prometheus text format requires."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Registry:
+    """Thread-safe in-process counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._buckets = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            buckets = self._buckets.setdefault(name, buckets)
+            hist = self._histograms.get(key)
+            if hist is None:
+                # [per-bucket counts..., +Inf count], sum, count, max
+                hist = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0, 0.0]
+            hist[0][bisect.bisect_left(buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+            hist[3] = max(hist[3], value)
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            full = f"{NAMESPACE}_{name}"
+            if name in HELP:
+                lines.append(f"# HELP {full} {HELP[name]}")
+            lines.append(f"# TYPE {full} counter")
+            for (n, key), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{full}{_format_labels(key)} {value:g}")
+        for name in sorted({name for name, _ in histograms}):
+            full = f"{NAMESPACE}_{name}"
+            if name in HELP:
+                lines.append(f"# HELP {full} {HELP[name]}")
+            lines.append(f"# TYPE {full} histogram")
+            bounds = [f"{b:g}" for b in self._buckets[name]] + ['+Inf']
+            for (n, key), (counts, total, count) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(bounds, counts):
+                    cumulative += c
+                    lines.append(f"{full}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{full}_count{_format_labels(key)} {count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def snapshot(self):
+        """Stage timings as rows for display, slowest total first."""
+        with self._lock:
+            histograms = dict(self._histograms)
+            errors = {dict(key).get('stage'): v for (n, key), v in self._counters.items()
+                      if n == 'stage_errors_total'}
+        rows = []
+        for (name, key), (_, total, count, peak) in histograms.items():
+            if name != 'stage_seconds':
+                continue
+            stage = dict(key)['stage']
+            rows.append({
+                'stage': stage,
+                'calls': count,
+                'mean_ms': round(total / count * 1000, 2),
+                'max_ms': round(peak * 1000, 2),
+                'total_s': round(total, 3),
+                'errors': errors.get(stage, 0),
+            })
+        return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+    def counters(self):
+        with self._lock:
+            return {f"{name}{_format_labels(key)}": value for (name, key), value in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    if ENABLED:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    if ENABLED:
+        registry.observe(name, value, buckets, **labels)
+
+
+class timer:
+    """Context manager recording the wall time of a block as ``stage_seconds{stage=...}``."""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if ENABLED:
+            registry.observe('stage_seconds', time.perf_counter() - self.start, stage=self.stage)
+            if exc_type is not None:
+                registry.inc('stage_errors_total', stage=self.stage)
+        return False
+
+
+def timed(stage):
+    """Decorator version of timer, for plain and async functions."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not ENABLED:
+                    return await func(*args, **kwargs)
+                with timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_file(path):
+    """Write the metrics for a textfile collector; the file is replaced atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0'):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics-http').start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_file(path)
+        except Exception as e:
+            logger.error(f"Error writing metrics file: {str(e)}")
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(port_offset=0):
+    """Start the exporters configured in the environment, once per process.
+
+    METRICS_PORT serves /metrics over HTTP (worker processes add their
+    index to the port); METRICS_FILE is rewritten every
+    METRICS_FILE_INTERVAL seconds and at exit, and may contain {pid}.
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started or not ENABLED:
+            return
+        _exporter_started = True
+
+    port = os.getenv('METRICS_PORT')
+    if port:
+        try:
+            start_http_server(int(port) + port_offset)
+        except OSError as e:
+            logger.error(f"Could not serve metrics on port {int(port) + port_offset}: {str(e)}")
+    path = os.getenv('METRICS_FILE')
+    if path:
+        path = path.format(pid=os.getpid())
+        interval = float(os.getenv('METRICS_FILE_INTERVAL', '15'))
+        threading.Thread(
+            target=_write_periodically, args=(path, interval), daemon=True, name='metrics-file'
+        ).start()
+        # Short runs like batch_reports.py finish between writes
+        atexit.register(write_file, path)
@@ -0,0 +1,55 @@
+# migrate.py
+import argparse
+import json
+from db import db
+from report_payload import convert_legacy
+
+
+def analyst_index(args):
+    count = db.rebuild_analyst_index()
+    print(f"Indexed {count} investor assignments")
+
+
+def report_index(args):
+    count = db.rebuild_report_index()
+    print(f"Indexed {count} reports")
+
+
+def report_payloads(args):
+    converted = saved = 0
+    for report_id in db.scan_report_ids():
+        report = db.get_report(report_id)
+        if not report:
+            continue
+        try:
+            analysis = json.loads(report['analysis'])
+            compact = convert_legacy(analysis, report['stock'])
+        except Exception as e:
+            print(f"Skipping report {report_id}: {e}")
+            continue
+        if compact is None:
+            continue
+        if not args.dry_run:
+            db.update_report_analysis(report_id, compact)
+        converted += 1
+        saved += len(report['analysis']) - len(json.dumps(compact))
+    print(f"Converted {converted} reports, {saved / 1024:.1f} KiB smaller")
+
+
+MIGRATIONS = {
+    'analyst-index': analyst_index,
+    'report-index': report_index,
+    'report-payloads': report_payloads,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-off Redis data migrations")
+    parser.add_argument('migration', choices=list(MIGRATIONS))
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+    args = parser.parse_args()
+    MIGRATIONS[args.migration](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from analysis import fetch_stock_data, calculate_technical_indicators, generate_signals
+from chart_digest import build_digest
+from db import db
+import metrics
+from report_payload import encode_analysis, report_figures
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever indicators, signals, summary or payload format change, so
+# memoized results from older code are not served
+ENGINE_VERSION = 1
+
+KEY_PREFIX = 'analysis'
+DEFAULT_LRU_SIZE = int(os.getenv('ANALYSIS_LRU_SIZE', '64'))
+DEFAULT_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', str(24 * 3600)))
+
+# Fields of a result that are shared through Redis; figures stay in process
+SHARED_FIELDS = ['key', 'ticker', 'period', 'interval', 'last_bar', 'status', 'bars', 'action',
+                 'allocation', 'summary', 'digest', 'analysis_json']
+
+
+def build_summary(action, rsi_value):
+    rsi_display = f"{rsi_value:.2f}" if not pd.isna(rsi_value) else "N/A"
+    return f"""
+                                        **Technical Analysis Summary:**
+                                        - Trend: {'Bullish' if 'Bullish' in action else 'Bearish' if 'Bearish' in action else 'Neutral'}
+                                        - MACD: {'Bullish' if 'Buy' in action else 'Bearish' if 'Sell' in action else 'Neutral'}
+                                        - RSI: {rsi_display}
+                                    """
+
+
+def analysis_key(ticker, period, data, interval='1d'):
+    """Content address of an analysis: ticker, period, interval, last bar and engine version.
+
+    The last close is part of the key as well, so a revised bar for the
+    current day is analysed again.
+    """
+    last = data.index[-1]
+    # Daily keys are unchanged from before intervals existed
+    span = period if interval == '1d' else f"{period}/{interval}"
+    content = f"{ENGINE_VERSION}|{ticker}|{span}|{pd.Timestamp(last).isoformat()}|{data['Close'].iloc[-1]!r}"
+    return f"{KEY_PREFIX}:{ENGINE_VERSION}:{hashlib.sha1(content.encode()).hexdigest()[:20]}"
+
+
+def compute_analysis(data, ticker, period, key=None, interval='1d'):
+    """Indicators, signal, summary, digest and report payload for a price frame.
+
+    Chart figures are not built here: workers and batch runs never show
+    them; pages get them on demand from AnalysisCache.figures().
+    """
+    result = {
+        'key': key, 'ticker': ticker, 'period': period, 'interval': interval,
+        'last_bar': str(data.index[-1]) if len(data) else '', 'bars': len(data),
+    }
+    processed_data = calculate_technical_indicators(data)
+    if processed_data.empty:
+        return {**result, 'status': 'insufficient'}
+
+    action, allocation = generate_signals(processed_data)
+    summary = build_summary(action, processed_data.iloc[-1].get('RSI', np.nan))
+    with metrics.timer('encode_report'):
+        analysis = encode_analysis(processed_data, ticker, summary)
+        # Serialized once, for both the report and the shared cache
+        analysis_json = json.dumps(analysis)
+    return {
+        **result,
+        'status': 'ok',
+        'action': action,
+        'allocation': float(allocation),
+        'summary': summary,
+        'digest': build_digest(processed_data, ticker),
+        'analysis': analysis,
+        'analysis_json': analysis_json,
+    }
+
+
+class AnalysisCache:
+    """Two-tier memo of analysis results: in-process LRU, then shared Redis.
+
+    Results are stored under their content address (see analysis_key), so
+    every session and app instance asking for the same ticker, period and
+    latest bar reuses one computation. A per-key lock makes concurrent
+    sessions in one process wait for the first computation instead of
+    repeating it. Chart figures are built on demand and kept apart from the
+    shared results, in a per-key LRU of the same size (see figures()).
+    """
+
+    def __init__(self, client=None, lru_size=DEFAULT_LRU_SIZE, ttl=DEFAULT_TTL):
+        self.r = client or db.r
+        self.lru_size = lru_size
+        self.ttl = ttl
+        self._lru = OrderedDict()
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.stats = {'lru_hits': 0, 'redis_hits': 0, 'misses': 0}
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _lru_get(self, key):
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+            return result
+
+    def _lru_put(self, key, result):
+        with self._lock:
+            self._lru[key] = result
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                evicted, _ = self._lru.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+
+    def _figures_put(self, key, figures):
+        with self._lock:
+            self._figures[key] = figures
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.lru_size:
+                self._figures.popitem(last=False)
+
+    def figures(self, result):
+        """(price, macd, rsi) figures of an 'ok' result, built once per key from its payload."""
+        key = result['key']
+        with self._lock:
+            figures = self._figures.get(key)
+            if figures is not None:
+                self._figures.move_to_end(key)
+                return figures
+        figures = report_figures(result['analysis'])
+        self._figures_put(key, figures)
+        return figures
+
+    def _redis_get(self, key):
+        try:
+            raw = self.r.get(key)
+        except Exception as e:
+            logger.error(f"Error reading analysis cache: {str(e)}")
+            return None
+        if raw is None:
+            return None
+        try:
+            result = json.loads(raw)
+            result['analysis'] = json.loads(result['analysis_json'])
+        except (ValueError, TypeError, KeyError) as e:
+            # A corrupt entry is recomputed and overwritten
+            logger.error(f"Error decoding analysis cache entry {key}: {str(e)}")
+            return None
+        return result
+
+    def _redis_put(self, key, result):
+        try:
+            self.r.set(key, json.dumps({field: result[field] for field in SHARED_FIELDS}), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing analysis cache: {str(e)}")
+
+    def get_or_compute(self, key, compute):
+        result = self._lru_get(key)
+        if result is not None:
+            self._count('lru_hits')
+            return result
+
+        cached = False
+        try:
+            with self._key_lock(key):
+                result = self._lru_get(key)
+                if result is not None:
+                    self._count('lru_hits')
+                    cached = True
+                    return result
+
+                result = self._redis_get(key)
+                if result is not None:
+                    self._count('redis_hits')
+                else:
+                    self._count('misses')
+                    start = time.perf_counter()
+                    result = compute()
+                    logger.info(f"Computed {key} in {time.perf_counter() - start:.3f}s")
+                    if result['status'] != 'ok':
+                        return result
+                    self._redis_put(key, result)
+                self._lru_put(key, result)
+                cached = True
+        finally:
+            if not cached:
+                # Only cached keys keep a lock (until evicted); results that
+                # are not cached would otherwise leak one each
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._figures.clear()
+            self._key_locks.clear()
+
+
+_analysis_cache = None
+
+
+def get_analysis_cache():
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache()
+    return _analysis_cache
+
+
+def result_figures(result, cache=None):
+    """(price, macd, rsi) figures of a result, built once per process; the result is not modified."""
+    return (cache or get_analysis_cache()).figures(result)
+
+
+def run_analysis(ticker, period='1y', cache=None, price_cache=None, interval='1d'):
+    """Memoized fetch -> indicators -> signals -> charts pipeline for one ticker.
+
+    Returns a result dict whose 'status' is 'ok', 'no_data' (nothing to
+    fetch) or 'insufficient' (too few bars for the indicators). Indicators
+    and signals run on bars of ``interval``, daily by default. Results are
+    shared, so callers must not modify them.
+    """
+    data = fetch_stock_data(ticker, period, cache=price_cache, interval=interval)
+    if data.empty:
+        return {'key': None, 'ticker': ticker, 'period': period, 'interval': interval,
+                'status': 'no_data', 'bars': 0}
+
+    cache = cache or get_analysis_cache()
+    key = analysis_key(ticker, period, data, interval)
+    return cache.get_or_compute(key, lambda: compute_analysis(data, ticker, period, key, interval))
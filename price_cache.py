@@ -0,0 +1,371 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+import pandas as pd
+from metrics import timed
+from resample import INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+# Offsets matching the yfinance ``period`` strings offered by the app
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+# yfinance intraday intervals and the longest history Yahoo serves for each
+INTRADAY_LIMITS = {
+    '1m': pd.DateOffset(days=7),
+    '5m': pd.DateOffset(days=60),
+    '15m': pd.DateOffset(days=60),
+    '30m': pd.DateOffset(days=60),
+    '1h': pd.DateOffset(days=730),
+}
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.stock_bot', 'prices.sqlite')
+DEFAULT_MAX_BARS = 2_000_000
+DEFAULT_MAX_AGE = 15 * 60  # seconds before a cached ticker is topped up again
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    ticker TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    dividends REAL, splits REAL,
+    PRIMARY KEY (ticker, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    ticker TEXT PRIMARY KEY,
+    tz TEXT,
+    covered_from INTEGER,
+    last_ts INTEGER,
+    n_bars INTEGER,
+    fetched_at REAL,
+    last_access REAL
+);
+"""
+
+
+def period_start(period, now=None):
+    """Return the first timestamp covered by ``period`` or None for 'max'."""
+    now = now or pd.Timestamp.now(tz='UTC')
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period: {period}")
+    return now.normalize() - PERIOD_OFFSETS[period]
+
+
+def base_interval(interval, period):
+    """Interval to download for ``interval`` bars over ``period``.
+
+    This is the finest interval Yahoo serves for the whole period that
+    coarser bars can be built from, so one cached series of e.g. minute
+    bars serves every intraday timeframe of the last few days. Raises
+    ValueError when no downloadable interval covers the period.
+    """
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    if interval == '1d':
+        return '1d'
+    now = pd.Timestamp.now(tz='UTC')
+    start = period_start(period, now)
+    for base, limit in INTRADAY_LIMITS.items():
+        if (INTERVAL_SECONDS[interval] % INTERVAL_SECONDS[base] == 0
+                and start is not None and start >= now.normalize() - limit):
+            return base
+    raise ValueError(f"{interval} bars are not available for period {period}")
+
+
+def cache_key(ticker, interval='1d'):
+    """Cache entry of a ticker's bars; daily bars keep the plain ticker."""
+    return ticker if interval == '1d' else f"{ticker}@{interval}"
+
+
+class YahooSource:
+    """Default data source backed by yfinance, imported on the first download."""
+
+    @timed('yahoo_history')
+    def history(self, ticker, period=None, start=None, interval='1d'):
+        import yfinance as yf
+        stock = yf.Ticker(ticker)
+        if start is not None:
+            hist = stock.history(start=start, interval=interval)
+        else:
+            hist = stock.history(period=period, interval=interval)
+        # Rows without a close are dropped, as in history_many
+        return hist.dropna(subset=['Close']) if 'Close' in hist else hist
+
+    @timed('yahoo_history_many')
+    def history_many(self, tickers, period=None, start=None, interval='1d'):
+        """Download several tickers in one request, returning {ticker: frame}."""
+        import yfinance as yf
+        kwargs = {'start': start} if start is not None else {'period': period}
+        raw = yf.download(
+            list(tickers), group_by='ticker', actions=True, auto_adjust=True,
+            threads=True, progress=False, interval=interval, **kwargs
+        )
+        frames = {}
+        for ticker in tickers:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if ticker not in raw.columns.get_level_values(0):
+                    frames[ticker] = pd.DataFrame()
+                    continue
+                frame = raw[ticker]
+            else:
+                frame = raw
+            frames[ticker] = frame.dropna(subset=['Close'])
+        return frames
+
+
+class PriceCache:
+    """SQLite store of bars keyed by ticker and interval.
+
+    The first request for a ticker downloads the full period; later requests
+    only download bars from the last cached date onwards and slice the
+    requested period out of the store. Least recently used tickers are evicted
+    once the store holds more than ``max_bars`` rows. Intraday intervals are
+    stored as separate entries (see cache_key) and topped up at most once
+    per bar.
+    """
+
+    def __init__(self, path=None, source=None, max_bars=DEFAULT_MAX_BARS, max_age=DEFAULT_MAX_AGE):
+        self.path = path or os.getenv('PRICE_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.source = source or YahooSource()
+        self.max_bars = max_bars
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, ticker, period='1y', interval='1d'):
+        ticker = ticker.upper()
+        key = cache_key(ticker, interval)
+        start_ts = self._start_ts(period)
+
+        with self._lock:
+            meta = self._meta(key)
+            now = time.time()
+
+            if meta is None or not self._covers(meta, start_ts):
+                hist = self.source.history(ticker, period=period, interval=interval)
+                if hist.empty:
+                    return pd.DataFrame()
+                self._replace(key, hist, start_ts, now)
+            elif now - meta['fetched_at'] > self._max_age(interval):
+                self._top_up(ticker, interval, meta, now)
+
+            self._conn.execute('UPDATE meta SET last_access = ? WHERE ticker = ?', (now, key))
+            self._evict(keep=key)
+            self._conn.commit()
+            return self._load(key, start_ts)
+
+    def get_many(self, tickers, period='1y', interval='1d'):
+        """Batch version of get(), returning {ticker: frame}.
+
+        Missing tickers are downloaded together in one request and stale ones
+        are topped up together from the oldest last cached date.
+        """
+        tickers = [t.upper() for t in tickers]
+        start_ts = self._start_ts(period)
+
+        with self._lock:
+            now = time.time()
+            missing, stale = [], {}
+            for ticker in tickers:
+                meta = self._meta(cache_key(ticker, interval))
+                if meta is None or not self._covers(meta, start_ts):
+                    missing.append(ticker)
+                elif now - meta['fetched_at'] > self._max_age(interval):
+                    stale[ticker] = meta
+
+            if missing:
+                for ticker, hist in self._history_many(missing, period=period, interval=interval).items():
+                    if not hist.empty:
+                        self._replace(cache_key(ticker, interval), hist, start_ts, now)
+
+            if stale:
+                start = pd.Timestamp(min(m['last_ts'] for m in stale.values()))
+                try:
+                    fresh = self._history_many(list(stale), start=start.strftime('%Y-%m-%d'), interval=interval)
+                except Exception as e:
+                    logger.warning(f"Batch top-up failed, serving cached bars: {str(e)}")
+                    fresh = {}
+                for ticker, meta in stale.items():
+                    key = cache_key(ticker, interval)
+                    new = fresh.get(ticker, pd.DataFrame())
+                    if not new.empty:
+                        self._write(key, new)
+                    self._refresh_meta(key, meta['tz'] or self._tz_name(new), meta['covered_from'], now)
+
+            result = {}
+            for ticker in tickers:
+                key = cache_key(ticker, interval)
+                if self._meta(key) is None:
+                    result[ticker] = pd.DataFrame()
+                    continue
+                self._conn.execute('UPDATE meta SET last_access = ? WHERE ticker = ?', (now, key))
+                result[ticker] = self._load(key, start_ts)
+            self._evict(keep=None)
+            self._conn.commit()
+            return result
+
+    def _history_many(self, tickers, period=None, start=None, interval='1d'):
+        if hasattr(self.source, 'history_many'):
+            return self.source.history_many(tickers, period=period, start=start, interval=interval)
+        return {t: self.source.history(t, period=period, start=start, interval=interval) for t in tickers}
+
+    def _max_age(self, interval):
+        # Intraday entries are worth topping up once a new bar may exist
+        return self.max_age if interval == '1d' else min(self.max_age, INTERVAL_SECONDS[interval])
+
+    def invalidate(self, ticker):
+        """Drop the cached bars of a ticker, for every interval."""
+        ticker = ticker.upper()
+        with self._lock:
+            for table in ('bars', 'meta'):
+                self._conn.execute(f'DELETE FROM {table} WHERE ticker = ? OR ticker LIKE ?',
+                                   (ticker, f"{ticker}@%"))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def _start_ts(period):
+        start = period_start(period)
+        return None if start is None else start.tz_localize(None).value
+
+    def _meta(self, ticker):
+        row = self._conn.execute(
+            'SELECT tz, covered_from, last_ts, n_bars, fetched_at FROM meta WHERE ticker = ?',
+            (ticker,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('tz', 'covered_from', 'last_ts', 'n_bars', 'fetched_at'), row))
+
+    @staticmethod
+    def _covers(meta, start_ts):
+        if meta['covered_from'] is None:
+            return True
+        return start_ts is not None and start_ts >= meta['covered_from']
+
+    def _top_up(self, ticker, interval, meta, now):
+        key = cache_key(ticker, interval)
+        last = pd.Timestamp(meta['last_ts'])
+        try:
+            # Re-download the last cached bar too, it may have been partial
+            new = self.source.history(ticker, start=last.strftime('%Y-%m-%d'), interval=interval)
+        except Exception as e:
+            logger.warning(f"Top-up failed for {key}, serving cached bars: {str(e)}")
+            return
+
+        if not new.empty:
+            self._write(key, new)
+        self._refresh_meta(key, meta['tz'] or self._tz_name(new), meta['covered_from'], now)
+
+    def _replace(self, ticker, hist, start_ts, now):
+        self._conn.execute('DELETE FROM bars WHERE ticker = ?', (ticker,))
+        self._write(ticker, hist)
+        self._refresh_meta(ticker, self._tz_name(hist), start_ts, now)
+
+    @staticmethod
+    def _tz_name(hist):
+        tz = getattr(hist.index, 'tz', None)
+        return str(tz) if tz is not None else ''
+
+    def _write(self, ticker, hist):
+        # Bars are keyed by exchange wall-clock time so tz-aware and naive
+        # downloads of the same session land on the same row
+        index = pd.to_datetime(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        frame = hist.reindex(columns=COLUMNS)
+        frame[['Dividends', 'Stock Splits']] = frame[['Dividends', 'Stock Splits']].fillna(0.0)
+        rows = zip(
+            (ticker,) * len(frame),
+            index.asi8.tolist(),
+            *(frame[col].astype(float).tolist() for col in COLUMNS)
+        )
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+        )
+
+    def _refresh_meta(self, ticker, tz, covered_from, now):
+        last_ts, n_bars = self._conn.execute(
+            'SELECT MAX(ts), COUNT(*) FROM bars WHERE ticker = ?', (ticker,)
+        ).fetchone()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (ticker, tz, covered_from, last_ts, n_bars, now, now)
+        )
+
+    def _evict(self, keep):
+        total = self._conn.execute('SELECT COALESCE(SUM(n_bars), 0) FROM meta').fetchone()[0]
+        if total <= self.max_bars:
+            return
+
+        candidates = self._conn.execute(
+            'SELECT ticker, n_bars FROM meta WHERE ticker != ? ORDER BY last_access', (keep or '',)
+        ).fetchall()
+        for ticker, n_bars in candidates:
+            if total <= self.max_bars:
+                break
+            self._conn.execute('DELETE FROM bars WHERE ticker = ?', (ticker,))
+            self._conn.execute('DELETE FROM meta WHERE ticker = ?', (ticker,))
+            total -= n_bars
+            logger.info(f"Evicted {ticker} from price cache ({n_bars} bars)")
+
+    def _load(self, ticker, start_ts):
+        tz = self._meta(ticker)['tz']
+        frame = pd.read_sql_query(
+            'SELECT ts, open, high, low, close, volume, dividends, splits FROM bars '
+            'WHERE ticker = ? AND ts >= ? ORDER BY ts',
+            self._conn,
+            params=(ticker, start_ts if start_ts is not None else -2**63)
+        )
+        index = pd.DatetimeIndex(pd.to_datetime(frame.pop('ts')), name='Date')
+        if tz:
+            index = index.tz_localize(tz)
+        frame.index = index
+        frame.columns = COLUMNS
+        if not frame['Volume'].isna().any():
+            frame['Volume'] = frame['Volume'].astype('int64')
+        return frame
+
+
+_default_cache = None
+
+
+def get_price_cache():
+    """Return the process-wide cache used by fetch_stock_data.
+
+    PRICE_BACKEND=mmap selects the memory-mapped PriceStore, which
+    processes on one host share through the page cache.
+    """
+    global _default_cache
+    if _default_cache is None:
+        if os.getenv('PRICE_BACKEND', 'sqlite').lower() == 'mmap':
+            from price_store import PriceStore
+            _default_cache = PriceStore()
+        else:
+            _default_cache = PriceCache()
+    return _default_cache
@@ -0,0 +1,288 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from price_cache import COLUMNS, DEFAULT_MAX_AGE, YahooSource, cache_key, period_start
+from resample import INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser('~'), '.stock_bot', 'price_store')
+
+
+class PriceStore:
+    """Columnar price store of memory-mapped ``.npy`` files, one per ticker.
+
+    Each ticker file holds a ``(1 + len(COLUMNS), n)`` float64 array: bar
+    times in epoch seconds (exchange wall-clock) followed by one contiguous
+    row per column. Files are opened with ``mmap_mode='r'``, so every
+    process on a host reads the same pages from the OS page cache, and the
+    frames returned by get() are read-only views on them instead of heap
+    copies. Writers replace files atomically; readers pick up the new
+    version on their next call.
+
+    It has the get()/get_many() interface of PriceCache and can be passed
+    as ``cache=`` to fetch_stock_data. Unlike PriceCache, 'Volume' is
+    float64 like the other columns. Intraday intervals get their own files,
+    named after cache_key (``AAPL@5m.npy``).
+    """
+
+    def __init__(self, path=None, source=None, max_age=DEFAULT_MAX_AGE):
+        self.path = path or os.getenv('PRICE_STORE_PATH', DEFAULT_STORE_PATH)
+        self.source = source or YahooSource()
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._maps = {}
+        os.makedirs(self.path, exist_ok=True)
+
+    def get(self, ticker, period='1y', interval='1d'):
+        ticker = ticker.upper()
+        key = cache_key(ticker, interval)
+        start_s = self._start_s(period)
+
+        with self._lock:
+            meta = self._meta(key)
+            now = time.time()
+
+            if meta is None or not self._covers(meta, start_s):
+                hist = self.source.history(ticker, period=period, interval=interval)
+                if hist.empty:
+                    return pd.DataFrame()
+                self._save(key, hist, start_s, now)
+            elif now - meta['fetched_at'] > self._max_age(interval):
+                self._top_up(ticker, interval, meta, now)
+            return self._frame(key, start_s)
+
+    def get_many(self, tickers, period='1y', interval='1d'):
+        """Batch version of get(), returning {ticker: frame}.
+
+        Missing tickers are downloaded together in one request and stale ones
+        are topped up together from the oldest last stored date.
+        """
+        tickers = [t.upper() for t in tickers]
+        start_s = self._start_s(period)
+
+        with self._lock:
+            now = time.time()
+            missing, stale = [], {}
+            for ticker in tickers:
+                meta = self._meta(cache_key(ticker, interval))
+                if meta is None or not self._covers(meta, start_s):
+                    missing.append(ticker)
+                elif now - meta['fetched_at'] > self._max_age(interval):
+                    stale[ticker] = meta
+
+            if missing:
+                for ticker, hist in self._history_many(missing, period=period, interval=interval).items():
+                    if not hist.empty:
+                        self._save(cache_key(ticker, interval), hist, start_s, now)
+
+            if stale:
+                start = pd.Timestamp(min(m['last'] for m in stale.values()), unit='s')
+                try:
+                    fresh = self._history_many(list(stale), start=start.strftime('%Y-%m-%d'), interval=interval)
+                except Exception as e:
+                    logger.warning(f"Batch top-up failed, serving stored bars: {str(e)}")
+                    fresh = {}
+                for ticker, meta in stale.items():
+                    self._merge(cache_key(ticker, interval), meta, fresh.get(ticker, pd.DataFrame()), now)
+
+            result = {}
+            for ticker in tickers:
+                key = cache_key(ticker, interval)
+                result[ticker] = self._frame(key, start_s) if self._meta(key) else pd.DataFrame()
+            return result
+
+    def columns(self, ticker, period='max', interval='1d'):
+        """(bar times in epoch seconds, {column: array}) read-only views of stored bars, no download."""
+        array = self._array(cache_key(ticker.upper(), interval))
+        if array is None:
+            return None, {}
+        first = self._first(array, self._start_s(period))
+        return array[0, first:], {col: array[i + 1, first:] for i, col in enumerate(COLUMNS)}
+
+    def tickers(self, interval='1d'):
+        suffix = '.npy' if interval == '1d' else f"@{interval}.npy"
+        return sorted(name[:-len(suffix)] for name in os.listdir(self.path)
+                      if name.endswith(suffix) and '@' not in name[:-len(suffix)])
+
+    def invalidate(self, ticker):
+        """Remove the files of a ticker, for every interval."""
+        ticker = ticker.upper()
+        with self._lock:
+            for name in os.listdir(self.path):
+                key, ext = os.path.splitext(name)
+                if ext in ('.npy', '.json') and (key == ticker or key.startswith(f"{ticker}@")):
+                    self._maps.pop(key, None)
+                    os.remove(os.path.join(self.path, name))
+
+    def close(self):
+        self._maps.clear()
+
+    def _history_many(self, tickers, period=None, start=None, interval='1d'):
+        if hasattr(self.source, 'history_many'):
+            return self.source.history_many(tickers, period=period, start=start, interval=interval)
+        return {t: self.source.history(t, period=period, start=start, interval=interval) for t in tickers}
+
+    def _max_age(self, interval):
+        # Intraday files are worth topping up once a new bar may exist
+        return self.max_age if interval == '1d' else min(self.max_age, INTERVAL_SECONDS[interval])
+
+    def _file(self, ticker, ext):
+        return os.path.join(self.path, f"{ticker}.{ext}")
+
+    @staticmethod
+    def _start_s(period):
+        start = period_start(period)
+        return None if start is None else start.tz_localize(None).value // 10**9
+
+    @staticmethod
+    def _covers(meta, start_s):
+        if meta['covered_from'] is None:
+            return True
+        return start_s is not None and start_s >= meta['covered_from']
+
+    @staticmethod
+    def _first(array, start_s):
+        return 0 if start_s is None else int(np.searchsorted(array[0], start_s))
+
+    def _meta(self, ticker):
+        try:
+            with open(self._file(ticker, 'json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _array(self, ticker):
+        """Memory map of a ticker file, reopened when another process replaced it."""
+        path = self._file(ticker, 'npy')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._maps.pop(ticker, None)
+            return None
+        cached = self._maps.get(ticker)
+        if cached is None or cached[0] != mtime:
+            cached = self._maps[ticker] = (mtime, np.load(path, mmap_mode='r'))
+        return cached[1]
+
+    def _frame(self, ticker, start_s):
+        array = self._array(ticker)
+        if array is None:
+            return pd.DataFrame()
+        view = array[:, self._first(array, start_s):]
+        index = pd.DatetimeIndex(pd.to_datetime(view[0].astype('int64'), unit='s'), name='Date')
+        tz = self._meta(ticker)['tz']
+        if tz:
+            index = index.tz_localize(tz)
+        # copy=False keeps every column a view on the memory map
+        return pd.DataFrame({col: view[i + 1] for i, col in enumerate(COLUMNS)}, index=index, copy=False)
+
+    def _top_up(self, ticker, interval, meta, now):
+        key = cache_key(ticker, interval)
+        last = pd.Timestamp(meta['last'], unit='s')
+        try:
+            # Re-download the last stored bar too, it may have been partial
+            new = self.source.history(ticker, start=last.strftime('%Y-%m-%d'), interval=interval)
+        except Exception as e:
+            logger.warning(f"Top-up failed for {key}, serving stored bars: {str(e)}")
+            return
+        self._merge(key, meta, new, now)
+
+    def _merge(self, ticker, meta, new, now):
+        old = self._array(ticker)
+        if new.empty or old is None:
+            self._write_meta(ticker, {**meta, 'fetched_at': now})
+            return
+        new_array = self._to_array(new)
+        keep = old[:, old[0] < new_array[0, 0]]
+        self._write(ticker, np.hstack([keep, new_array]), meta['tz'] or self._tz_name(new),
+                    meta['covered_from'], now)
+
+    @staticmethod
+    def _tz_name(hist):
+        tz = getattr(hist.index, 'tz', None)
+        return str(tz) if tz is not None else ''
+
+    @staticmethod
+    def _to_array(hist):
+        # Bars are keyed by exchange wall-clock time, as in PriceCache
+        index = pd.to_datetime(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        frame = hist.reindex(columns=COLUMNS).astype(float)
+        frame[['Dividends', 'Stock Splits']] = frame[['Dividends', 'Stock Splits']].fillna(0.0)
+        order = np.argsort(index.asi8, kind='stable')
+        array = np.empty((len(COLUMNS) + 1, len(frame)))
+        array[0] = index.asi8[order] // 10**9
+        array[1:] = frame.to_numpy().T[:, order]
+        return array
+
+    def _save(self, ticker, hist, covered_from, now):
+        self._write(ticker, self._to_array(hist), self._tz_name(hist), covered_from, now)
+
+    def _write(self, ticker, array, tz, covered_from, now):
+        # Write to a temporary file and rename it over the old one, so
+        # readers in other processes never see a partial file and keep their
+        # current map until they reopen
+        path = self._file(ticker, 'npy')
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp, path)
+        self._write_meta(ticker, {
+            'tz': tz,
+            'covered_from': covered_from,
+            'last': float(array[0, -1]) if array.shape[1] else None,
+            'n_bars': int(array.shape[1]),
+            'fetched_at': now,
+        })
+
+    def _write_meta(self, ticker, meta):
+        path = self._file(ticker, 'json')
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill or inspect the memory-mapped price store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load = subparsers.add_parser('load', help="Download tickers into the store")
+    load.add_argument('tickers', nargs='*')
+    load.add_argument('--file', help="File with one ticker per line")
+    load.add_argument('--period', default='max')
+    load.add_argument('--interval', default='1d')
+    load.add_argument('--batch-size', type=int, default=100)
+    subparsers.add_parser('info', help="Show what the store holds")
+    parser.add_argument('--path', help="Store directory (default PRICE_STORE_PATH)")
+    args = parser.parse_args()
+
+    store = PriceStore(args.path)
+    if args.command == 'load':
+        tickers = list(args.tickers)
+        if args.file:
+            with open(args.file) as f:
+                tickers += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        for i in range(0, len(tickers), args.batch_size):
+            batch = tickers[i:i + args.batch_size]
+            frames = store.get_many(batch, args.period, interval=args.interval)
+            empty = [t for t, frame in frames.items() if frame.empty]
+            print(f"Loaded {i + len(batch)}/{len(tickers)} tickers"
+                  + (f", no data for {', '.join(empty)}" if empty else ""))
+    else:
+        # Every file, daily and intraday
+        keys = [name[:-len('.npy')] for name in os.listdir(store.path) if name.endswith('.npy')]
+        bars = sum((store._meta(k) or {}).get('n_bars', 0) for k in keys)
+        size = sum(os.path.getsize(store._file(k, 'npy')) for k in keys)
+        print(f"{store.path}: {len(store.tickers())} tickers, {len(keys)} files, {bars} bars, "
+              f"{size / 2**20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import base64
+import zlib
+import numpy as np
+import pandas as pd
+from analysis import plot_technical_chart
+from chart_digest import build_digest
+
+PAYLOAD_FORMAT = 'series'
+PAYLOAD_VERSION = 1
+
+# Columns of the indicator frame that the charts are rebuilt from
+SERIES_COLUMNS = [
+    'Close', 'SMA_50', 'SMA_200', 'SMA_Long', 'BB_Upper', 'BB_Lower', 'MACD', 'Signal_Line', 'RSI',
+]
+
+# Trace names written by plot_technical_chart, used to convert legacy reports
+_TRACE_COLUMNS = {
+    'Price': 'Close',
+    '50-Day SMA': 'SMA_50',
+    '200-Day SMA': 'SMA_200',
+    'Upper Band': 'BB_Upper',
+    'Lower Band': 'BB_Lower',
+    'MACD': 'MACD',
+    'Signal Line': 'Signal_Line',
+    'RSI': 'RSI',
+}
+
+LEGACY_CHART_KEYS = ('price_chart', 'macd_chart', 'rsi_chart')
+
+
+def _pack(array):
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes(), 6)).decode('ascii')
+
+
+def _unpack(text, dtype, shape):
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).reshape(shape)
+
+
+def is_compact(analysis):
+    return analysis.get('format') == PAYLOAD_FORMAT
+
+
+def encode_analysis(data, ticker, summary):
+    """Build the report ``analysis`` dict from an indicator frame.
+
+    Stores the chart series as zlib-compressed float32 columns and the date
+    index as int64 deltas instead of full Plotly figure JSON.
+    """
+    columns = [col for col in SERIES_COLUMNS if col in data]
+    index = pd.DatetimeIndex(data.index)
+    tz = str(index.tz) if index.tz is not None else ''
+    stamps = (index.tz_localize(None) if tz else index).asi8
+    deltas = np.diff(stamps, prepend=0)
+
+    return {
+        'format': PAYLOAD_FORMAT,
+        'version': PAYLOAD_VERSION,
+        'ticker': ticker,
+        'summary': summary,
+        'length': len(data),
+        'tz': tz,
+        'columns': columns,
+        'index': _pack(deltas.astype('<i8')),
+        'values': _pack(data[columns].to_numpy(dtype='<f4').T),
+    }
+
+
+def decode_analysis(analysis):
+    """Rebuild the indicator frame stored by encode_analysis."""
+    if analysis.get('version', 0) > PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported report payload version: {analysis['version']}")
+
+    n, columns = analysis['length'], analysis['columns']
+    stamps = np.cumsum(_unpack(analysis['index'], '<i8', (n,)))
+    index = pd.DatetimeIndex(stamps.astype('datetime64[ns]'), name='Date')
+    if analysis.get('tz'):
+        index = index.tz_localize(analysis['tz'])
+    values = _unpack(analysis['values'], '<f4', (len(columns), n))
+    return pd.DataFrame(dict(zip(columns, values.astype(np.float64))), index=index)
+
+
+def report_figures(analysis):
+    """Return (price, macd, rsi) figures for a report, rebuilt on demand.
+
+    Legacy reports that still carry Plotly JSON are parsed as before; a
+    missing legacy chart is returned as None.
+    """
+    if is_compact(analysis):
+        return plot_technical_chart(decode_analysis(analysis), analysis['ticker'])
+    import plotly.io
+    return tuple(
+        plotly.io.from_json(analysis[key]) if analysis.get(key) else None
+        for key in LEGACY_CHART_KEYS
+    )
+
+
+def report_digest(analysis, ticker):
+    """Compact text digest of a report's charts for the chatbot context."""
+    compact = analysis if is_compact(analysis) else convert_legacy(analysis, ticker)
+    if compact is None:
+        return ''
+    return build_digest(decode_analysis(compact), ticker)
+
+
+def _trace_values(values):
+    # Plotly 6 serializes numeric arrays as base64 typed arrays
+    if isinstance(values, dict) and 'bdata' in values:
+        return np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype']).astype(float)
+    return np.asarray(values, dtype=float)
+
+
+def convert_legacy(analysis, ticker):
+    """Convert a Plotly-JSON report analysis to the compact format.
+
+    Returns None when the analysis is already compact or has no price chart.
+    """
+    if is_compact(analysis) or not analysis.get('price_chart'):
+        return None
+
+    import plotly.io
+    series, index = {}, None
+    for key in LEGACY_CHART_KEYS:
+        if not analysis.get(key):
+            continue
+        for trace in plotly.io.from_json(analysis[key]).data:
+            name = trace.name or ''
+            column = _TRACE_COLUMNS.get(name)
+            if column is None and name.endswith('-Day SMA'):
+                column = 'SMA_Long'
+            if column is None or trace.y is None:
+                continue
+            series[column] = _trace_values(trace.y)
+            if column == 'Close':
+                # Keep the exchange wall-clock date; the UTC offset is dropped
+                index = pd.DatetimeIndex(pd.to_datetime([str(x)[:19] for x in trace.x]), name='Date')
+
+    if index is None:
+        return None
+    frame = pd.DataFrame(
+        {col: values for col, values in series.items() if len(values) == len(index)}, index=index
+    )
+    return encode_analysis(frame, ticker, analysis.get('summary', ''))
+
@@ -1,7 +1,9 @@
 import streamlit as st
 from db import db
 import json
-import plotly.io
+import math
+from report_payload import report_figures
+import metrics
 
 def display_report(report):
     st.subheader(f"Report for {report['stock']}")
@@ -21,26 +23,17 @@ def display_report(report):
     
     st.subheader("Technical Analysis")
     
-    if 'price_chart' in analysis:
-        try:
-            price_fig = plotly.io.from_json(analysis['price_chart'])
-            st.plotly_chart(price_fig, use_container_width=True)
-        except Exception as e:
-            st.error(f"Error loading price chart: {e}")
-    
-    if 'macd_chart' in analysis:
-        try:
-            macd_fig = plotly.io.from_json(analysis['macd_chart'])
-            st.plotly_chart(macd_fig, use_container_width=True)
-        except Exception as e:
-            st.error(f"Error loading MACD chart: {e}")
+    try:
+        figures = report_figures(analysis)
+    except Exception as e:
+        st.error(f"Error loading charts: {e}")
+        figures = ()
     
-    if 'rsi_chart' in analysis:
-        try:
-            rsi_fig = plotly.io.from_json(analysis['rsi_chart'])
-            st.plotly_chart(rsi_fig, use_container_width=True)
-        except Exception as e:
-            st.error(f"Error loading RSI chart: {e}")
+    # Figures are serialized to JSON for the browser here
+    with metrics.timer('render_charts'):
+        for fig in figures:
+            if fig is not None:
+                st.plotly_chart(fig, use_container_width=True)
     
     if 'summary' in analysis:
         st.write(analysis['summary'])
@@ -50,17 +43,54 @@ def display_report(report):
     # Store in session state for chatbot
     st.session_state.selected_report = report
 
-def report_history_section():
-    st.subheader("Historical Reports")
-    reports = db.get_reports(st.session_state['username'])
+REPORTS_PER_PAGE = 20
+ACTIONS = ['All', 'STRONG BUY', 'BUY', 'HOLD', 'SELL', 'STRONG SELL']
+
+def report_picker(username, key):
+    """Filterable, paginated report selector. Returns the full selected report or None.
     
+    Only report metadata is listed; the analysis payload is loaded for the
+    selected report alone.
+    """
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        stock = st.text_input("Filter by Stock", key=f"{key}_stock").strip().upper() or None
+    with col2:
+        action = st.selectbox("Filter by Action", ACTIONS, key=f"{key}_action")
+    action = None if action == 'All' else action
+    # Counted with the same filters as the listing, so every page has reports
+    total = db.count_reports(username, stock=stock, action=action)
+    with col3:
+        pages = max(1, math.ceil(total / REPORTS_PER_PAGE))
+        if st.session_state.get(f"{key}_page", 1) > pages:
+            # A narrower filter leaves fewer pages than the one selected
+            st.session_state[f"{key}_page"] = pages
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    
+    reports = db.list_reports(
+        username,
+        offset=(page - 1) * REPORTS_PER_PAGE,
+        limit=REPORTS_PER_PAGE,
+        stock=stock,
+        action=action
+    )
     if not reports:
-        st.info("No reports found")
-        return
+        return None
     
     report_titles = [f"{r['stock']} - {r['date']}" for r in reports]
-    selected_report = st.selectbox("Select Report", report_titles)
+    selected_report = st.selectbox("Select Report", report_titles, key=key)
     
     if selected_report:
         report_index = report_titles.index(selected_report)
-        display_report(reports[report_index])
\ No newline at end of file
+        return db.get_report(reports[report_index]['id'])
+    return None
+
+def report_history_section():
+    st.subheader("Historical Reports")
+    report = report_picker(st.session_state['username'], key="report_history")
+    
+    if not report:
+        st.info("No reports found")
+        return
+    
+    display_report(report)
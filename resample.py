@@ -0,0 +1,276 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Bar widths in seconds. '4h' is never downloaded, only built by resampling.
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 4 * 3600,
+    '1d': 24 * 3600,
+}
+
+# Intraday buckets are anchored at the session open, so hourly bars run
+# 09:30-10:30, ... like Yahoo's. Times are exchange wall-clock.
+SESSION_OPEN = os.getenv('SESSION_OPEN', '09:30')
+
+# How each column is combined into a coarser bar; other columns keep the last value
+AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+    'Dividends': 'sum',
+    'Stock Splits': 'max',
+}
+
+_NS = 10**9
+_DAY_NS = 24 * 3600 * _NS
+
+
+def _sum(values, first, last):
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        if missing.any():
+            values = np.where(missing, 0, values)
+    return np.add.reduceat(values, first)
+
+
+_REDUCERS = {
+    'first': lambda values, first, last: values[first],
+    'last': lambda values, first, last: values[last],
+    'max': lambda values, first, last: np.fmax.reduceat(values, first),
+    'min': lambda values, first, last: np.fmin.reduceat(values, first),
+    'sum': _sum,
+}
+
+
+def interval_seconds(interval):
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return INTERVAL_SECONDS[interval]
+
+
+def _origin_ns(origin):
+    hours, minutes = origin.split(':')
+    return (int(hours) * 3600 + int(minutes) * 60) * _NS
+
+
+def bucket_starts(stamps, interval, origin=SESSION_OPEN):
+    """Start of the ``interval`` bar each wall-clock timestamp (int64 ns) falls in."""
+    width = interval_seconds(interval) * _NS
+    day = stamps // _DAY_NS * _DAY_NS
+    if width >= _DAY_NS:
+        return day
+    anchor = day + _origin_ns(origin)
+    return anchor + (stamps - anchor) // width * width
+
+
+def _nests(fine, coarse, origin):
+    """True when every ``coarse`` bar is made of whole ``fine`` bars."""
+    fine_s, coarse_s = interval_seconds(fine), interval_seconds(coarse)
+    if coarse_s % fine_s:
+        return False
+    # Daily bars start at midnight, which must also be a fine bar boundary
+    return coarse_s < INTERVAL_SECONDS['1d'] or (_origin_ns(origin) // _NS) % fine_s == 0
+
+
+def _rollup(groups, stamps, columns):
+    """Combine consecutive rows with equal (group, bucket) keys.
+
+    ``groups`` (ticker numbers) and ``stamps`` (bucket starts) must be
+    sorted together; returns the keys and columns of the combined rows.
+    """
+    n = len(stamps)
+    if n == 0:
+        return groups, stamps, columns
+    new = np.empty(n, dtype=bool)
+    new[0] = True
+    np.not_equal(stamps[1:], stamps[:-1], out=new[1:])
+    new[1:] |= groups[1:] != groups[:-1]
+    first = np.flatnonzero(new)
+    last = np.append(first[1:], n) - 1
+    combined = {
+        col: _REDUCERS[AGGREGATIONS.get(col, 'last')](values, first, last)
+        for col, values in columns.items()
+    }
+    return groups[first], stamps[first], combined
+
+
+def frame_arrays(frame):
+    """(wall-clock int64 ns stamps, {column: array}, tz name) of a price frame, without NaN closes."""
+    index = pd.DatetimeIndex(frame.index)
+    tz = str(index.tz) if index.tz is not None else ''
+    stamps = (index.tz_localize(None) if tz else index).asi8
+    columns = {col: frame[col].to_numpy() for col in frame.columns}
+    if 'Close' in columns:
+        valid = ~pd.isna(columns['Close'])
+        if not valid.all():
+            stamps = stamps[valid]
+            columns = {col: values[valid] for col, values in columns.items()}
+    return stamps, columns, tz
+
+
+def arrays_frame(stamps, columns, tz=''):
+    index = pd.DatetimeIndex(stamps.astype('datetime64[ns]'), name='Date')
+    if tz:
+        index = index.tz_localize(tz)
+    return pd.DataFrame(columns, index=index)
+
+
+def resample_many(frames, intervals, origin=SESSION_OPEN):
+    """Roll price frames up into several coarser intervals at once.
+
+    ``frames`` maps tickers to sorted OHLCV frames of one base interval;
+    returns ``{interval: {ticker: frame}}``. The whole watchlist is stacked
+    into one set of arrays and every interval is one vectorized pass,
+    built from the coarsest interval already computed that nests in it
+    (1m -> 5m -> 15m -> 1h) rather than from the base bars each time.
+    Bars are labelled with their start; buckets without bars are dropped.
+    The frames of one interval are slices of a single frame, so treat them
+    as read-only.
+    """
+    parts = {t: frame_arrays(frame) for t, frame in frames.items() if not frame.empty}
+    result = {interval: {t: pd.DataFrame() for t in frames} for interval in intervals}
+    if not parts:
+        return result
+
+    # Stacked by time zone, so each zone's rows are contiguous and become one frame
+    tickers = sorted(parts, key=lambda t: parts[t][2])
+    names = list(parts[tickers[0]][1])
+    stamps = np.concatenate([parts[t][0] for t in tickers])
+    groups = np.repeat(np.arange(len(tickers)), [len(parts[t][0]) for t in tickers])
+    columns = {col: np.concatenate([parts[t][1][col] for t in tickers]) for col in names}
+    zones = {}
+    for i, t in enumerate(tickers):
+        zones.setdefault(parts[t][2], []).append(i)
+
+    built = []
+    for interval in sorted(set(intervals), key=interval_seconds):
+        source = next(((g, s, c) for level, (g, s, c) in reversed(built) if _nests(level, interval, origin)),
+                      (groups, stamps, columns))
+        g, s, c = _rollup(source[0], bucket_starts(source[1], interval, origin), source[2])
+        built.append((interval, (g, s, c)))
+
+        bounds = np.searchsorted(g, np.arange(len(tickers) + 1))
+        for tz, members in zones.items():
+            first, last = bounds[members[0]], bounds[members[-1] + 1]
+            stacked = arrays_frame(s[first:last], {col: c[col][first:last] for col in names}, tz)
+            for i in members:
+                result[interval][tickers[i]] = stacked.iloc[bounds[i] - first:bounds[i + 1] - first]
+    return result
+
+
+def resample_ohlcv(frame, interval, origin=SESSION_OPEN):
+    """``frame`` rolled up into ``interval`` bars, like resample(...).agg(AGGREGATIONS) without empty bars."""
+    if frame.empty:
+        return pd.DataFrame()
+    return resample_many({'': frame}, [interval], origin)[interval]['']
+
+
+class BarAggregator:
+    """Incremental multi-timeframe bars for one ticker.
+
+    update() takes new base bars, or revised copies of the latest ones,
+    and only re-aggregates the base bars of the buckets that are still
+    open, so following a live series costs time in proportion to the new
+    bars and not to the history. A bucket closes once a bar from a later
+    bucket arrives. ``max_bars`` caps the closed bars kept per interval.
+    """
+
+    def __init__(self, intervals, origin=SESSION_OPEN, max_bars=None):
+        self.intervals = sorted(set(intervals), key=interval_seconds)
+        self.origin = origin
+        self.max_bars = max_bars
+        self.tz = ''
+        # Base bars from the start of the oldest open bucket onwards
+        self._stamps = np.empty(0, dtype='int64')
+        self._columns = None
+        # Per interval: list of closed (stamps, columns) chunks, the open bars
+        # and the start of the first bucket that is not closed yet
+        self._closed = {interval: [] for interval in self.intervals}
+        self._open = {}
+        self._open_from = dict.fromkeys(self.intervals, np.iinfo('int64').min)
+
+    def update(self, bars):
+        """Add base bars (a frame); returns ``{interval: number of newly closed bars}``."""
+        stamps, columns, tz = frame_arrays(bars)
+        return self.update_arrays(stamps, columns, tz)
+
+    def update_arrays(self, stamps, columns, tz=''):
+        """update() for wall-clock int64 ns ``stamps`` and ``{column: array}``."""
+        self.tz = self.tz or tz
+        if not len(stamps):
+            return dict.fromkeys(self.intervals, 0)
+        if self._columns is None:
+            self._columns = {col: values[:0] for col, values in columns.items()}
+
+        # Bars before the oldest open bucket are too late to change anything;
+        # new bars replace stored ones from their first timestamp on
+        keep_new = stamps >= min(self._open_from.values())
+        stamps = stamps[keep_new]
+        keep_old = self._stamps < stamps[0] if len(stamps) else np.ones(len(self._stamps), dtype=bool)
+        self._stamps = np.concatenate([self._stamps[keep_old], stamps])
+        self._columns = {col: np.concatenate([self._columns[col][keep_old], columns[col][keep_new]])
+                         for col in self._columns}
+
+        closed = {}
+        groups = np.zeros(len(self._stamps), dtype='int64')
+        for interval in self.intervals:
+            _, starts, combined = _rollup(groups, bucket_starts(self._stamps, interval, self.origin),
+                                          self._columns)
+            current = starts[-1] if len(starts) else self._open_from[interval]
+            done = (starts >= self._open_from[interval]) & (starts < current)
+            if done.any():
+                self._closed[interval].append((starts[done], {c: v[done] for c, v in combined.items()}))
+                self._trim(interval)
+            is_open = starts >= current
+            self._open[interval] = (starts[is_open], {c: v[is_open] for c, v in combined.items()})
+            self._open_from[interval] = current
+            closed[interval] = int(done.sum())
+
+        # Only the base bars of open buckets are needed for the next update
+        keep = self._stamps >= min(self._open_from.values())
+        self._stamps = self._stamps[keep]
+        self._columns = {col: values[keep] for col, values in self._columns.items()}
+        return closed
+
+    def _trim(self, interval):
+        chunks = self._closed[interval]
+        if self.max_bars is None or sum(len(s) for s, _ in chunks) <= 2 * self.max_bars:
+            return
+        stamps, columns = self._concat(chunks)
+        self._closed[interval] = [(stamps[-self.max_bars:], {c: v[-self.max_bars:] for c, v in columns.items()})]
+
+    def _concat(self, chunks):
+        if len(chunks) == 1:
+            return chunks[0]
+        stamps = np.concatenate([s for s, _ in chunks])
+        columns = {col: np.concatenate([c[col] for _, c in chunks]) for col in chunks[0][1]}
+        return stamps, columns
+
+    def arrays(self, interval, include_open=True):
+        """(stamps, {column: array}) of the bars built so far for ``interval``."""
+        chunks = self._closed[interval]
+        if chunks:
+            # Merge the chunks once, later calls reuse the result
+            chunks[:] = [self._concat(chunks)]
+        if include_open and interval in self._open:
+            chunks = chunks + [self._open[interval]]
+        if not chunks:
+            return np.empty(0, dtype='int64'), {col: values[:0] for col, values in (self._columns or {}).items()}
+        stamps, columns = self._concat(chunks)
+        if self.max_bars is not None:
+            stamps, columns = stamps[-self.max_bars:], {c: v[-self.max_bars:] for c, v in columns.items()}
+        return stamps, columns
+
+    def frame(self, interval, include_open=True):
+        """The bars built so far for ``interval``; the last one may still be forming."""
+        stamps, columns = self.arrays(interval, include_open)
+        if not len(stamps):
+            return pd.DataFrame()
+        return arrays_frame(stamps, columns, self.tz)
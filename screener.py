@@ -0,0 +1,148 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from analysis import calculate_technical_indicators, generate_signals
+from price_cache import get_price_cache, base_interval
+from resample import resample_many
+
+logger = logging.getLogger(__name__)
+
+# Lower rank sorts first in the screening table
+ACTION_RANK = {
+    'STRONG BUY': 0,
+    'BUY': 1,
+    'HOLD': 2,
+    'SELL': 3,
+    'STRONG SELL': 4,
+}
+
+SCREEN_COLUMNS = ['Ticker', 'Action', 'Allocation', 'Close', 'RSI', 'MACD_Hist', 'Bars']
+
+
+def screen_ticker(ticker, data):
+    """Run indicators and signals for one ticker and return a table row."""
+    row = dict.fromkeys(SCREEN_COLUMNS, np.nan)
+    row.update(Ticker=ticker, Action='NO DATA', Allocation=0.0, Bars=len(data))
+
+    if data.empty or len(data) < 5:
+        return row
+
+    processed = calculate_technical_indicators(data)
+    action, allocation = generate_signals(processed)
+    row.update(Action=action, Allocation=allocation)
+
+    if not processed.empty:
+        latest = processed.iloc[-1]
+        row.update(
+            Close=latest['Close'],
+            RSI=latest.get('RSI', np.nan),
+            MACD_Hist=latest.get('MACD', np.nan) - latest.get('Signal_Line', np.nan),
+        )
+    return row
+
+
+def screen_watchlist(tickers, period='1y', batch_size=100, workers=1, cache=None, interval='1d'):
+    """Screen a watchlist and return a table ranked by signal.
+
+    Tickers are fetched through the price cache in batches of ``batch_size``;
+    the next batch downloads in the background while the current one is
+    being scored. With ``workers > 1`` scoring is spread over a process pool.
+    Intraday intervals are built from the base interval of the period for
+    the whole batch at once (see resample_many).
+    """
+    cache = cache or get_price_cache()
+    base = base_interval(interval, period)
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    rows = []
+
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(cache.get_many, batches[0], period, base) if batches else None
+        for i in range(len(batches)):
+            try:
+                frames = pending.result()
+            except Exception as e:
+                logger.error(f"Error fetching batch {i + 1}/{len(batches)}: {str(e)}")
+                frames = {}
+            if i + 1 < len(batches):
+                pending = prefetch.submit(cache.get_many, batches[i + 1], period, base)
+
+            if base != interval:
+                frames = resample_many(frames, [interval])[interval]
+            rows.extend(_score_batch(batches[i], frames, pool))
+
+    if pool is not None:
+        pool.shutdown()
+
+    logger.info(f"Screened {len(tickers)} tickers in {time.perf_counter() - start:.2f}s")
+    return rank_results(pd.DataFrame(rows, columns=SCREEN_COLUMNS))
+
+
+def _score_batch(tickers, frames, pool):
+    data = [frames.get(ticker, pd.DataFrame()) for ticker in tickers]
+    if pool is not None:
+        try:
+            return list(pool.map(screen_ticker, tickers, data, chunksize=16))
+        except Exception as e:
+            logger.error(f"Error scoring batch in worker pool: {str(e)}")
+
+    rows = []
+    for ticker, frame in zip(tickers, data):
+        try:
+            rows.append(screen_ticker(ticker, frame))
+        except Exception as e:
+            logger.error(f"Error screening {ticker}: {str(e)}")
+            rows.append({'Ticker': ticker, 'Action': 'ERROR', 'Allocation': 0.0})
+    return rows
+
+
+def rank_results(table):
+    """Sort a screening table: strongest buys first, unusable rows last."""
+    if table.empty:
+        return table
+    rank = table['Action'].map(ACTION_RANK).fillna(len(ACTION_RANK))
+    # Within BUY ranks prefer lower RSI, within SELL ranks prefer higher RSI
+    rsi_key = np.where(rank <= ACTION_RANK['HOLD'], table['RSI'], -table['RSI'])
+    ordered = table.assign(_rank=rank, _alloc=-table['Allocation'], _rsi=rsi_key)
+    ordered = ordered.sort_values(['_rank', '_alloc', '_rsi'], na_position='last')
+    return ordered.drop(columns=['_rank', '_alloc', '_rsi']).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen a watchlist by technical signal")
+    parser.add_argument('tickers', nargs='*', help="Ticker symbols")
+    parser.add_argument('--file', help="File with one ticker per line")
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--interval', default='1d', help="Bar size: 1m, 5m, 15m, 30m, 1h, 4h or 1d")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1, help="Processes used for scoring")
+    parser.add_argument('--output', help="Write the table to this CSV file")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers.extend(line.strip() for line in f if line.strip())
+    if not tickers:
+        parser.error("no tickers given")
+    try:
+        base_interval(args.interval, args.period)
+    except ValueError as e:
+        parser.error(str(e))
+
+    table = screen_watchlist(
+        tickers, period=args.period, batch_size=args.batch_size, workers=args.workers,
+        interval=args.interval
+    )
+    if args.output:
+        table.to_csv(args.output, index=False)
+    print(table.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+import math
+import sys
+from collections import deque
+
+NAN = float('nan')
+
+# Bollinger windows whose variance is below this fraction of the mean
+# square are recomputed from the window itself, as in indicators.py
+_VAR_RECOMPUTE = 1e8 * sys.float_info.epsilon
+
+
+class StreamingEMA:
+    """EMA updated one value at a time.
+
+    Matches ``Series.ewm(alpha=alpha, adjust=False, min_periods=min_periods)``.
+    ``update(x, replace=True)`` revises the latest value instead of appending
+    a new one, which is how a still-forming intraday bar is refreshed.
+    """
+
+    def __init__(self, alpha, min_periods=1):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+        self._prev = NAN
+
+    @classmethod
+    def from_span(cls, span):
+        return cls(2.0 / (span + 1), min_periods=span)
+
+    def update(self, x, replace=False):
+        if replace and self.count:
+            self.value = self._prev
+            self.count -= 1
+        self._prev = self.value
+        self.value = x if self.count == 0 else self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.current
+
+    @property
+    def current(self):
+        return self.value if self.count >= self.min_periods else NAN
+
+    def to_dict(self):
+        return {'alpha': self.alpha, 'min_periods': self.min_periods,
+                'value': self.value, 'count': self.count, 'prev': self._prev}
+
+    @classmethod
+    def from_dict(cls, state):
+        ema = cls(state['alpha'], state['min_periods'])
+        ema.value, ema.count, ema._prev = state['value'], state['count'], state['prev']
+        return ema
+
+
+class StreamingSMA:
+    """Simple moving average kept as a ring buffer plus running sum."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self._updates = 0
+
+    def update(self, x, replace=False):
+        if replace and self.values:
+            self.total += x - self.values[-1]
+            self.values[-1] = x
+        else:
+            if len(self.values) == self.window:
+                self.total -= self.values[0]
+            self.values.append(x)
+            self.total += x
+
+        # Re-sum once per window to stop floating point drift; amortised O(1)
+        self._updates += 1
+        if self._updates >= self.window:
+            self.total = math.fsum(self.values)
+            self._updates = 0
+        return self.current
+
+    @property
+    def current(self):
+        if len(self.values) < self.window:
+            return NAN
+        return self.total / self.window
+
+    def to_dict(self):
+        return {'window': self.window, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, state):
+        sma = cls(state['window'])
+        sma.values.extend(state['values'])
+        sma.total = math.fsum(sma.values)
+        return sma
+
+
+class StreamingBollinger:
+    """Bollinger Bands from running sums of the window (population std, like ``ta``)."""
+
+    def __init__(self, window=20, dev=2.0):
+        self.dev = dev
+        self.sma = StreamingSMA(window)
+        self.sq = StreamingSMA(window)
+        self.offset = None
+
+    def update(self, x, replace=False):
+        # Sums are taken relative to the first close to limit cancellation
+        if self.offset is None:
+            self.offset = x
+        centred = x - self.offset
+        self.sma.update(centred, replace)
+        self.sq.update(centred * centred, replace)
+        return self.current
+
+    @property
+    def current(self):
+        mean = self.sma.current
+        if math.isnan(mean):
+            return NAN, NAN
+        square = self.sq.current
+        var = square - mean * mean
+        if var < _VAR_RECOMPUTE * square:
+            # Cancellation, e.g. a flat run far from the first close
+            values = self.sma.values
+            var = math.fsum((v - mean) ** 2 for v in values) / len(values)
+        std = math.sqrt(max(var, 0.0))
+        mean += self.offset
+        return mean + self.dev * std, mean - self.dev * std
+
+    def to_dict(self):
+        return {'dev': self.dev, 'offset': self.offset,
+                'sma': self.sma.to_dict(), 'sq': self.sq.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        bb = cls(state['sma']['window'], state['dev'])
+        bb.offset = state['offset']
+        bb.sma = StreamingSMA.from_dict(state['sma'])
+        bb.sq = StreamingSMA.from_dict(state['sq'])
+        return bb
+
+
+class StreamingRSI:
+    """RSI with Wilder smoothing of gains and losses, matching ``ta.momentum.RSIIndicator``."""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.up = StreamingEMA(1.0 / window, min_periods=window)
+        self.down = StreamingEMA(1.0 / window, min_periods=window)
+        self.last_close = None
+        self._prev_close = None
+
+    def update(self, x, replace=False):
+        if not (replace and self.up.count):
+            self._prev_close = self.last_close
+        self.last_close = x
+        diff = 0.0 if self._prev_close is None else x - self._prev_close
+        self.up.update(max(diff, 0.0), replace)
+        self.down.update(max(-diff, 0.0), replace)
+        return self.current
+
+    @property
+    def current(self):
+        up, down = self.up.current, self.down.current
+        if math.isnan(down):
+            return NAN
+        if down == 0:
+            return 100.0
+        return 100 - 100 / (1 + up / down)
+
+    def to_dict(self):
+        return {'window': self.window, 'last_close': self.last_close, 'prev_close': self._prev_close,
+                'up': self.up.to_dict(), 'down': self.down.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        rsi = cls(state['window'])
+        rsi.last_close, rsi._prev_close = state['last_close'], state['prev_close']
+        rsi.up = StreamingEMA.from_dict(state['up'])
+        rsi.down = StreamingEMA.from_dict(state['down'])
+        return rsi
+
+
+class StreamingMACD:
+    """MACD line and signal line from three EMA states, matching ``ta.trend.MACD``."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA.from_span(fast)
+        self.slow = StreamingEMA.from_span(slow)
+        self.signal = StreamingEMA.from_span(signal)
+
+    def update(self, x, replace=False):
+        self.fast.update(x, replace)
+        self.slow.update(x, replace)
+        macd = self.macd
+        if not math.isnan(macd):
+            self.signal.update(macd, replace)
+        return self.current
+
+    @property
+    def macd(self):
+        return self.fast.value - self.slow.current
+
+    @property
+    def current(self):
+        return self.macd, self.signal.current
+
+    def to_dict(self):
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(),
+                'signal': self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        macd = cls()
+        macd.fast = StreamingEMA.from_dict(state['fast'])
+        macd.slow = StreamingEMA.from_dict(state['slow'])
+        macd.signal = StreamingEMA.from_dict(state['signal'])
+        return macd
+
+
+class IndicatorState:
+    """All indicators of ``calculate_technical_indicators`` updated in O(1) per bar.
+
+    ``update`` returns the latest row as a dict with the same column names as
+    the batch computation. Unlike the batch path, the long moving average is
+    always ``SMA_<sma_slow>`` and stays NaN until enough bars have been seen
+    (the batch path falls back to ``SMA_Long`` on short histories).
+    State round-trips through ``to_dict``/``from_dict`` as plain JSON types.
+    """
+
+    def __init__(self, sma_fast=50, sma_slow=200, rsi_window=14, bb_window=20, bb_dev=2.0,
+                 macd_fast=12, macd_slow=26, macd_signal=9):
+        self.sma_fast = StreamingSMA(sma_fast)
+        self.sma_slow = StreamingSMA(sma_slow)
+        self.rsi = StreamingRSI(rsi_window)
+        self.bb = StreamingBollinger(bb_window, bb_dev)
+        self.macd = StreamingMACD(macd_fast, macd_slow, macd_signal)
+        self.last_close = NAN
+        self.bars = 0
+
+    @classmethod
+    def from_history(cls, closes, **params):
+        state = cls(**params)
+        for close in closes:
+            state.update(float(close))
+        return state
+
+    def update(self, close, replace=False):
+        """Add a new bar, or revise the latest one with ``replace=True``."""
+        replace = replace and self.bars > 0
+        self.sma_fast.update(close, replace)
+        self.sma_slow.update(close, replace)
+        self.rsi.update(close, replace)
+        self.bb.update(close, replace)
+        self.macd.update(close, replace)
+        self.last_close = close
+        if not replace:
+            self.bars += 1
+        return self.current
+
+    @property
+    def current(self):
+        upper, lower = self.bb.current
+        macd, signal = self.macd.current
+        return {
+            'Close': self.last_close,
+            'RSI': self.rsi.current,
+            'BB_Upper': upper,
+            'BB_Lower': lower,
+            f'SMA_{self.sma_fast.window}': self.sma_fast.current,
+            f'SMA_{self.sma_slow.window}': self.sma_slow.current,
+            'MACD': macd,
+            'Signal_Line': signal,
+        }
+
+    def to_dict(self):
+        return {
+            'sma_fast': self.sma_fast.to_dict(),
+            'sma_slow': self.sma_slow.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'bb': self.bb.to_dict(),
+            'macd': self.macd.to_dict(),
+            'last_close': self.last_close,
+            'bars': self.bars,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls.__new__(cls)
+        state.sma_fast = StreamingSMA.from_dict(data['sma_fast'])
+        state.sma_slow = StreamingSMA.from_dict(data['sma_slow'])
+        state.rsi = StreamingRSI.from_dict(data['rsi'])
+        state.bb = StreamingBollinger.from_dict(data['bb'])
+        state.macd = StreamingMACD.from_dict(data['macd'])
+        state.last_close = data['last_close']
+        state.bars = data['bars']
+        return state
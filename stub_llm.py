@@ -0,0 +1,107 @@
+import argparse
+import json
+import logging
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLY = (
+    "This is a canned reply from the local stub completion server. "
+    "The MACD is above its signal line and the RSI is neutral."
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal Groq/OpenAI chat completions endpoint for local testing.
+
+    Replies with a fixed text, streamed word by word as server-sent events
+    when the request sets ``stream``.
+    """
+
+    reply = DEFAULT_REPLY
+    delay = 0.05
+    latency = 0.0
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        model = body.get('model', 'stub')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        time.sleep(self.latency)
+
+        if not body.get('stream'):
+            self._send_json({
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': self.reply},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        words = self.reply.split(' ')
+        for i, word in enumerate(words):
+            piece = word if i == 0 else ' ' + word
+            self._send_event(completion_id, model, {'content': piece}, None)
+            time.sleep(self.delay)
+        self._send_event(completion_id, model, {}, 'stop')
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, completion_id, model, delta, finish_reason):
+        chunk = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub for the Groq chat completions API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--reply', default=DEFAULT_REPLY, help="Text returned for every request")
+    parser.add_argument('--delay', type=float, default=0.05, help="Seconds between streamed words")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before the first token")
+    args = parser.parse_args()
+
+    StubHandler.reply, StubHandler.delay, StubHandler.latency = args.reply, args.delay, args.latency
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub completion server on http://{args.host}:{args.port} "
+          f"(set GROQ_BASE_URL=http://{args.host}:{args.port} and any GROQ_API_KEY)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
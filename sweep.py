@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from backtest import DEFAULT_PARAMS, indicator_values, positions_from_indicators, simulate
+from price_cache import get_price_cache
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change the indicators; the RSI thresholds only change the
+# signals, so one indicator pass is shared by every threshold pair
+INDICATOR_PARAMS = ('sma_fast', 'sma_slow', 'macd_fast', 'macd_slow', 'macd_signal')
+
+DEFAULT_GRID = {
+    'sma_fast': [20, 50],
+    'sma_slow': [100, 150, 200],
+    'rsi_upper': [65, 70, 75, 80],
+    'rsi_lower': [20, 25, 30, 35],
+    'macd_fast': [12],
+    'macd_slow': [26],
+    'macd_signal': [9],
+}
+
+SUMMARY_COLUMNS = [
+    'tickers', 'mean_return', 'median_return', 'mean_sharpe', 'mean_max_drawdown',
+    'mean_hit_rate', 'mean_exposure', 'mean_trades',
+]
+
+# Per-worker view of the shared price block, set by _attach()
+_prices = None
+
+
+def param_grid(grid=None):
+    """Expand ``{param: [values]}`` into parameter dicts, skipping inconsistent ones."""
+    grid = {**{k: [v] for k, v in DEFAULT_PARAMS.items()}, **(grid or DEFAULT_GRID)}
+    names = list(grid)
+    combos = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        if params['sma_fast'] >= params['sma_slow']:
+            continue
+        if params['macd_fast'] >= params['macd_slow']:
+            continue
+        if params['rsi_lower'] >= params['rsi_upper']:
+            continue
+        combos.append(params)
+    return combos
+
+
+class SharedPrices:
+    """Close arrays of many tickers packed into one shared memory block.
+
+    Tickers are stored back to back with an offsets table, so workers can
+    slice zero-copy views instead of receiving pickled DataFrames.
+    """
+
+    def __init__(self, closes):
+        self.tickers = list(closes)
+        lengths = [len(closes[t]) for t in self.tickers]
+        self.offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        size = max(int(self.offsets[-1]), 1) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        block = np.ndarray(int(self.offsets[-1]), dtype=np.float64, buffer=self.shm.buf)
+        for ticker, start, stop in zip(self.tickers, self.offsets[:-1], self.offsets[1:]):
+            block[start:stop] = np.asarray(closes[ticker], dtype=np.float64)
+
+    @property
+    def spec(self):
+        """Picklable description a worker needs to attach."""
+        return self.shm.name, self.offsets
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name, offsets):
+    global _prices
+    shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray(int(offsets[-1]), dtype=np.float64, buffer=shm.buf)
+    _prices = (shm, block, offsets)
+
+
+def _run_group(indicator_params, signal_params, ticker_range, cost):
+    """Backtest one indicator parameter set and all its RSI thresholds on a ticker range."""
+    _, block, offsets = _prices
+    rows = []
+    for i in range(*ticker_range):
+        close = block[offsets[i]:offsets[i + 1]]
+        if len(close) < 2:
+            continue
+        values = indicator_values(close, **indicator_params)
+        for j, thresholds in enumerate(signal_params):
+            _, positions = positions_from_indicators(values, **thresholds)
+            metrics, _ = simulate(close, positions, cost)
+            rows.append((j, i, metrics))
+    return rows
+
+
+def run_sweep(prices, grid=None, workers=None, cost=0.0, chunk_size=50, details=False):
+    """Grid-search signal parameters over ``{ticker: frame or close array}``.
+
+    Work is split into (indicator parameter set x ticker chunk) tasks over a
+    process pool that reads prices from shared memory. Returns a table with
+    one row per parameter set, best mean Sharpe first, or with
+    ``details=True`` also the per-ticker metrics.
+    """
+    closes = {
+        ticker: data['Close'].to_numpy(dtype=float) if isinstance(data, pd.DataFrame) else data
+        for ticker, data in prices.items()
+    }
+    combos = param_grid(grid)
+    groups = {}
+    for params in combos:
+        key = tuple(params[name] for name in INDICATOR_PARAMS)
+        groups.setdefault(key, []).append(
+            {'rsi_upper': params['rsi_upper'], 'rsi_lower': params['rsi_lower']}
+        )
+
+    n = len(closes)
+    ranges = [(i, min(i + chunk_size, n)) for i in range(0, n, chunk_size)]
+    workers = workers or os.cpu_count()
+    shared = SharedPrices(closes)
+    detail_rows = []
+
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=shared.spec) as pool:
+            futures = {}
+            for key, signal_params in groups.items():
+                indicator_params = dict(zip(INDICATOR_PARAMS, key))
+                for ticker_range in ranges:
+                    future = pool.submit(_run_group, indicator_params, signal_params, ticker_range, cost)
+                    futures[future] = (indicator_params, signal_params)
+
+            for future, (indicator_params, signal_params) in futures.items():
+                for j, i, metrics in future.result():
+                    detail_rows.append({
+                        **indicator_params, **signal_params[j],
+                        'Ticker': shared.tickers[i], **metrics,
+                    })
+    finally:
+        shared.close()
+
+    logger.info(
+        f"Swept {len(combos)} parameter sets x {n} tickers "
+        f"in {time.perf_counter() - start:.2f}s on {workers} workers"
+    )
+    detail = pd.DataFrame(detail_rows)
+    summary = summarize(detail)
+    return (summary, detail) if details else summary
+
+
+def summarize(detail):
+    """Aggregate per-ticker sweep metrics into one row per parameter set."""
+    param_names = [name for name in DEFAULT_PARAMS if name in detail]
+    if detail.empty:
+        return pd.DataFrame(columns=param_names + SUMMARY_COLUMNS)
+    summary = detail.groupby(param_names).agg(
+        tickers=('Ticker', 'count'),
+        mean_return=('total_return', 'mean'),
+        median_return=('total_return', 'median'),
+        mean_sharpe=('sharpe', 'mean'),
+        mean_max_drawdown=('max_drawdown', 'mean'),
+        mean_hit_rate=('hit_rate', 'mean'),
+        mean_exposure=('exposure', 'mean'),
+        mean_trades=('trades', 'mean'),
+    )
+    return summary.reset_index().sort_values('mean_sharpe', ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search the generate_signals parameters")
+    parser.add_argument('tickers', nargs='*', help="Ticker symbols")
+    parser.add_argument('--file', help="File with one ticker per line")
+    parser.add_argument('--period', default='10y')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cost', type=float, default=0.0)
+    for name, values in DEFAULT_GRID.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, nargs='+', default=values)
+    parser.add_argument('--output', help="Write the results table to this CSV file")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file) as f:
+            tickers.extend(line.strip() for line in f if line.strip())
+    if not tickers:
+        parser.error("no tickers given")
+
+    prices = get_price_cache().get_many(tickers, args.period)
+    grid = {name: getattr(args, name) for name in DEFAULT_GRID}
+    table = run_sweep(
+        {t: f for t, f in prices.items() if not f.empty},
+        grid=grid, workers=args.workers, cost=args.cost
+    )
+    if args.output:
+        table.to_csv(args.output, index=False)
+    print(table.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
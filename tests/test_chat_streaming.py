@@ -0,0 +1,69 @@
+"""Streamed chatbot replies through LLMOrchestrator against the stub_llm.py server."""
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from groq import AsyncGroq
+
+from chatbot import StockAnalystChatbot
+from llm_orchestrator import LLMOrchestrator
+from stub_llm import StubHandler
+
+
+class FastStub(StubHandler):
+    delay = 0.01
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FastStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def bot(stub_url, monkeypatch):
+    monkeypatch.setenv('GROQ_API_KEY', 'test')
+    client = AsyncGroq(api_key='test', base_url=stub_url, max_retries=0)
+    return StockAnalystChatbot(orchestrator=LLMOrchestrator(client=client, timeout=5, idle_timeout=2))
+
+
+def test_general_chat_streams_the_reply_word_by_word(bot):
+    reply = bot.stream_general_chat("What is the RSI indicating?", context="AAPL report")
+    chunks = list(reply)
+    assert len(chunks) == len(FastStub.reply.split(' '))
+    assert ''.join(chunks) == FastStub.reply
+    assert not reply.failed
+
+
+def test_chart_stream_matches_the_blocking_call(bot):
+    streamed = ''.join(bot.stream_analyze_charts("digest", "Is the MACD bullish?"))
+    assert streamed == bot.analyze_charts("digest", "Is the MACD bullish?") == FastStub.reply
+
+
+def test_closing_a_stream_early_releases_its_slot(bot):
+    chunks = iter(bot.stream_general_chat("Summarize the trend"))
+    next(chunks)
+    chunks.close()
+    # max_concurrency slots are all free again for the next reply
+    assert ''.join(bot.stream_general_chat("And the volume?")) == FastStub.reply
+    assert bot.orchestrator._slots._value == bot.orchestrator.max_concurrency
+
+
+def test_failed_stream_is_marked(monkeypatch):
+    monkeypatch.setenv('GROQ_API_KEY', 'test')
+    # Nothing listens on port 9 (discard), so the connection is refused
+    client = AsyncGroq(api_key='test', base_url='http://127.0.0.1:9', max_retries=0)
+    bot = StockAnalystChatbot(orchestrator=LLMOrchestrator(client=client, timeout=2, max_retries=0))
+    reply = bot.stream_general_chat("Hello")
+    text = ''.join(reply)
+    assert reply.failed and text.startswith("Error in chatbot:")
+
+
+def test_missing_api_key_is_a_failed_reply(monkeypatch):
+    monkeypatch.delenv('GROQ_API_KEY', raising=False)
+    reply = StockAnalystChatbot().stream_general_chat("Hello")
+    assert reply.failed and 'GROQ_API_KEY' in ''.join(reply)
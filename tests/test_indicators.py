@@ -0,0 +1,105 @@
+"""indicators.compute_indicators against the ta package and pandas rolling means."""
+import numpy as np
+import pandas as pd
+import pytest
+
+ta = pytest.importorskip('ta')
+from ta.momentum import RSIIndicator
+from ta.trend import MACD
+from ta.volatility import BollingerBands
+
+from analysis import calculate_technical_indicators
+from indicators import INDICATOR_COLUMNS, compute_indicators, ema
+
+LENGTHS = [5, 13, 14, 19, 20, 26, 27, 49, 50, 99, 100, 101, 199, 200, 201, 1000, 5000]
+
+
+def prices(n, seed=0, start=100.0):
+    rng = np.random.default_rng(seed)
+    return start * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+
+def reference(close, sma_slow=200):
+    """The indicators as calculate_technical_indicators computed them with ta."""
+    close = pd.Series(close)
+    bb = BollingerBands(close)
+    macd = MACD(close)
+    return pd.DataFrame({
+        'RSI': RSIIndicator(close).rsi(),
+        'BB_Upper': bb.bollinger_hband(),
+        'BB_Lower': bb.bollinger_lband(),
+        'SMA_Fast': close.rolling(window=50).mean(),
+        'SMA_Slow': close.rolling(window=sma_slow).mean(),
+        'MACD': macd.macd(),
+        'Signal_Line': macd.macd_signal(),
+    })[INDICATOR_COLUMNS].to_numpy()
+
+
+def assert_matches(actual, expected, rtol, atol=0.0):
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    valid = ~np.isnan(expected)
+    np.testing.assert_allclose(actual[valid], expected[valid], rtol=rtol, atol=atol)
+
+
+@pytest.mark.parametrize('n', LENGTHS)
+def test_float64_matches_ta(n):
+    close = prices(n, seed=n)
+    # Short histories use the longest available slow SMA, as analysis does
+    sma_slow = 200 if n >= 200 else min(n, 100)
+    # MACD crosses zero, where only an error relative to the price scale is meaningful
+    assert_matches(compute_indicators(close, sma_slow=sma_slow), reference(close, sma_slow),
+                   rtol=1e-9, atol=1e-12 * close.max())
+
+
+@pytest.mark.parametrize('n', [50, 200, 5000])
+def test_float32_close_to_ta(n):
+    close = prices(n, seed=n)
+    out = compute_indicators(close, dtype=np.float32)
+    assert out.dtype == np.float32
+    # MACD crosses zero, so it is compared relative to the price scale
+    assert_matches(out.astype(np.float64), reference(close), rtol=1e-4, atol=1e-4 * close.max())
+
+
+def test_price_scale_and_flat_run():
+    # Large prices stress the prefix sums; a flat run has zero RSI losses
+    close = np.concatenate([prices(300, seed=1, start=50000.0), np.full(60, 51000.0)])
+    assert_matches(compute_indicators(close), reference(close), rtol=1e-9, atol=1e-12 * close.max())
+
+
+def test_ema_matches_pandas():
+    x = prices(3000, seed=7)
+    for alpha in (2 / 13, 2 / 27, 1 / 14, 0.9):
+        expected = pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+        np.testing.assert_allclose(ema(x, alpha), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('n', [30, 150, 250])
+def test_calculate_technical_indicators_matches_ta_frame(n):
+    index = pd.date_range('2024-01-01', periods=n, freq='D', name='Date')
+    data = pd.DataFrame({'Close': prices(n, seed=n), 'Volume': np.arange(n, dtype=float)}, index=index)
+    long_name, window = ('SMA_200', 200) if n >= 200 else ('SMA_Long', min(n, 100))
+
+    expected = pd.DataFrame(reference(data['Close'].to_numpy(), window),
+                            columns=INDICATOR_COLUMNS, index=index)
+    expected = expected.rename(columns={'SMA_Fast': 'SMA_50', 'SMA_Slow': long_name})
+    expected = pd.concat([data, expected], axis=1).dropna()
+
+    result = calculate_technical_indicators(data)
+    assert list(result.columns) == list(data.columns) + [
+        'RSI', 'BB_Upper', 'BB_Lower', 'SMA_50', long_name, 'MACD', 'Signal_Line']
+    pd.testing.assert_index_equal(result.index, expected.index)
+    pd.testing.assert_frame_equal(result, expected[result.columns], rtol=1e-9)
+
+
+def test_calculate_technical_indicators_skips_nan_closes():
+    index = pd.date_range('2024-01-01', periods=300, freq='D', name='Date')
+    data = pd.DataFrame({'Close': prices(300, seed=9), 'Volume': np.ones(300)}, index=index)
+    gappy = data.copy()
+    gappy.iloc[[0, 120, 121, 250, 299], 0] = np.nan
+    pd.testing.assert_frame_equal(calculate_technical_indicators(gappy),
+                                  calculate_technical_indicators(gappy.dropna()))
+
+
+def test_calculate_technical_indicators_empty():
+    assert calculate_technical_indicators(pd.DataFrame()).empty
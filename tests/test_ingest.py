@@ -0,0 +1,110 @@
+"""ingest.QuoteIngestor replaying quotes into Redis Streams on fakeredis."""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+from analysis import calculate_technical_indicators, generate_signal_series, generate_signals
+from benchmarks.synthetic import synthetic_minutes
+from ingest import (BAR_STREAM, SIGNAL_STREAM, QuoteIngestor, ReplaySource, is_stale,
+                    latest_signals, read_signals, write_replay)
+from streaming import IndicatorState
+
+fakeredis = pytest.importorskip('fakeredis')
+
+TICKERS = ['SYNA', 'SYNB']
+# Quotes within each minute bar: open, high, low and close
+OFFSETS = (1, 20, 40, 59)
+
+
+@pytest.fixture(scope='module')
+def frames():
+    return {t: synthetic_minutes(t, 2, end='2025-03-07') for t in TICKERS}
+
+
+@pytest.fixture(scope='module')
+def replayed(frames, tmp_path_factory):
+    quotes = []
+    for ticker, frame in frames.items():
+        epoch = frame.index.tz_convert('UTC').asi8 / 1e9
+        bars = frame[['Open', 'High', 'Low', 'Close']].to_numpy()
+        volumes = frame['Volume'].to_numpy() / 4
+        for ts, bar, volume in zip(epoch, bars, volumes):
+            quotes += [(ticker, ts + offset, price, volume) for offset, price in zip(OFFSETS, bar)]
+    quotes.sort(key=lambda q: q[1])
+    path = str(tmp_path_factory.mktemp('ingest') / 'quotes.csv')
+    write_replay(quotes, path)
+
+    database = SimpleNamespace(r=fakeredis.FakeRedis(decode_responses=True))
+    ingestor = QuoteIngestor('1m', database=database, warmup=False)
+    count = ingestor.run(ReplaySource(path, batch_size=200))
+    return SimpleNamespace(database=database, ingestor=ingestor, count=count, quotes=quotes)
+
+
+def test_every_quote_is_stored(replayed):
+    assert replayed.count == len(replayed.quotes)
+    r = replayed.database.r
+    assert sum(r.xlen(f"quotes:{t}") for t in TICKERS) == len(replayed.quotes)
+
+
+def test_closed_bars_match_the_history(replayed, frames):
+    for ticker, frame in frames.items():
+        bars = [fields for _, fields in replayed.database.r.xrange(BAR_STREAM.format(ticker=ticker, interval='1m'))]
+        # The last bar is still forming
+        assert len(bars) == len(frame) - 1
+        assert bars[0]['start'] == frame.index[0].tz_localize(None).isoformat()
+        closed = frame.iloc[:-1]
+        for field, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close')):
+            np.testing.assert_allclose([float(b[field]) for b in bars], closed[column])
+        np.testing.assert_allclose([float(b['volume']) for b in bars], closed['Volume'])
+
+
+def test_signal_stream_follows_the_batch_signals(replayed, frames):
+    changes = [fields for _, fields in replayed.database.r.xrange(SIGNAL_STREAM)]
+    for ticker, frame in frames.items():
+        processed = calculate_technical_indicators(frame)
+        expected, _ = generate_signal_series(processed)
+
+        ours = [c for c in changes if c['ticker'] == ticker]
+        assert ours and ours[0]['previous'] == 'NO DATA'
+        assert all(a['action'] == b['previous'] for a, b in zip(ours, ours[1:]))
+        # The published action in effect when each bar's closing quote was applied
+        ts = np.array([float(c['ts']) for c in ours])
+        closes = processed.index.tz_convert('UTC').asi8 / 1e9 + OFFSETS[-1]
+        live = [ours[np.searchsorted(ts, close, side='right') - 1]['action'] for close in closes]
+        assert live == list(expected)
+        assert replayed.ingestor.tickers[ticker].action == generate_signals(processed)[0]
+
+
+def test_latest_signals_and_read_signals(replayed, frames):
+    signals = latest_signals(replayed.database, include_stale=True)
+    assert set(signals) == set(TICKERS)
+    for ticker, entry in signals.items():
+        assert entry['last_price'] == frames[ticker]['Close'].iloc[-1]
+        assert entry['action'] == replayed.ingestor.tickers[ticker].action
+    # A replay of old sessions has no live tickers
+    assert latest_signals(replayed.database) == {}
+
+    last_id, changes = read_signals('0', block=None, count=3, database=replayed.database)
+    assert len(changes) == 3 and last_id != '0'
+    assert {'ticker', 'action', 'previous', 'price', 'ts', 'rsi'} <= set(changes[0])
+
+
+def test_is_stale_uses_the_last_quote():
+    now = 1_700_000_000.0
+    assert not is_stale({'interval': '1m', 'last_ts': now - 60, 'ts': now - 3600}, now)
+    assert is_stale({'interval': '1m', 'last_ts': now - 4 * 60}, now)
+    assert not is_stale({'interval': '1h', 'last_ts': now - 4 * 60}, now)
+    assert is_stale({'interval': '1m', 'ts': now - 3600}, now)
+
+
+def test_signal_uses_the_state_windows():
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(4).normal(0, 0.01, 120)))
+    state = IndicatorState.from_history(closes, sma_fast=20, sma_slow=100)
+    row = state.current
+    frame = pd.DataFrame({'SMA_50': [row['SMA_20']], 'SMA_200': [row['SMA_100']], 'MACD': [row['MACD']],
+                          'Signal_Line': [row['Signal_Line']], 'RSI': [row['RSI']], 'Close': [row['Close']]})
+    labels, allocations = generate_signal_series(frame)
+    assert ingest._signal(state) == (labels[0], allocations[0])
@@ -0,0 +1,107 @@
+"""jobs.py queueing, claiming, heartbeats and stale job recovery on fakeredis."""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import jobs
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(jobs, 'QUEUE_ENABLED', True)
+    runs = []
+
+    def run_job(job, database=None):
+        runs.append(job['ticker'])
+        if job['ticker'] == 'FAIL':
+            raise ValueError("No data found for this ticker.")
+        time.sleep(float(job.get('duration', 0)))
+        return {'report_id': f"r-{job['ticker']}"}
+
+    monkeypatch.setattr(jobs, 'run_job', run_job)
+    return SimpleNamespace(r=fakeredis.FakeRedis(decode_responses=True), runs=runs)
+
+
+def test_enqueue_and_queue_position(database):
+    first = jobs.enqueue_analysis('analyst', 'investor', 'AAPL', '1y', database=database)
+    second = jobs.enqueue_analysis('analyst', 'investor', 'MSFT', '6mo', database=database, interval='1h')
+    assert jobs.get_job(second, database)['interval'] == '1h'
+    assert jobs.get_job(first, database)['status'] == 'queued'
+    assert [jobs.queue_position(j, database) for j in (first, second)] == [0, 1]
+    assert jobs.queue_stats(database) == {'queued': 2, 'running': 0}
+
+
+def test_jobs_are_claimed_in_order_and_finished(database):
+    first = jobs.enqueue_analysis('analyst', 'investor', 'AAPL', '1y', database=database)
+    failing = jobs.enqueue_analysis('analyst', 'investor', 'FAIL', '1y', database=database)
+    assert jobs.process_next('w1', timeout=1, database=database) == first
+    assert jobs.process_next('w1', timeout=1, database=database) == failing
+    assert jobs.process_next('w1', timeout=0.1, database=database) is None
+
+    done, failed = jobs.get_job(first, database), jobs.get_job(failing, database)
+    assert done['status'] == 'done' and done['result'] == {'report_id': 'r-AAPL'}
+    assert done['worker'] == 'w1' and done['attempts'] == '1'
+    assert failed['status'] == 'failed' and 'No data' in failed['error']
+    assert jobs.queue_position(first, database) is None
+    assert jobs.queue_stats(database) == {'queued': 0, 'running': 0}
+    assert database.r.ttl(f"job:{first}") > 0
+
+
+def test_inline_jobs_without_workers(database, monkeypatch):
+    monkeypatch.setattr(jobs, 'QUEUE_ENABLED', False)
+    job_id = jobs.enqueue_analysis('analyst', 'investor', 'AAPL', '1y', database=database)
+    assert jobs.get_job(job_id, database)['status'] == 'done'
+    assert jobs.queue_stats(database) == {'queued': 0, 'running': 0}
+
+
+def test_heartbeat_keeps_a_long_job_from_being_requeued(database, monkeypatch):
+    # Heartbeats every second, a job running longer than stale_after
+    monkeypatch.setattr(jobs, 'STALE_AFTER', 3)
+    job_id = jobs.enqueue_analysis('analyst', 'investor', 'AAPL', '1y', database=database)
+    database.r.hset(f"job:{job_id}", 'duration', 2.5)
+    worker = threading.Thread(target=jobs.process_next, args=('w1', 1, database))
+    worker.start()
+    requeued = 0
+    while worker.is_alive():
+        requeued += jobs.requeue_stale(stale_after=1.8, database=database)
+        time.sleep(0.1)
+    assert requeued == 0
+    assert database.runs == ['AAPL'] and jobs.get_job(job_id, database)['status'] == 'done'
+
+
+def claim(database):
+    return database.r.lmove(jobs.QUEUE_KEY, jobs.PROCESSING_KEY, 'RIGHT', 'LEFT')
+
+
+def test_lost_job_is_requeued_after_its_heartbeat_stops(database):
+    job_id = jobs.enqueue_analysis('analyst', 'investor', 'AAPL', '1y', database=database)
+    claim(database)
+    # Claimed but not started: the grace period starts now
+    assert jobs.requeue_stale(stale_after=60, database=database) == 0
+    assert database.r.hget(f"job:{job_id}", 'heartbeat')
+
+    database.r.hset(f"job:{job_id}", mapping={'status': 'running', 'heartbeat': time.time() - 61})
+    assert jobs.requeue_stale(stale_after=60, database=database) == 1
+    job = jobs.get_job(job_id, database)
+    assert job['status'] == 'queued' and 'heartbeat' not in job
+    assert jobs.queue_position(job_id, database) == 0
+
+    # The late outcome of the lost run is discarded
+    assert not jobs._finish(database.r, job_id, status='failed', error='lost')
+    assert jobs.get_job(job_id, database)['status'] == 'queued'
+    assert jobs.process_next('w2', timeout=1, database=database) == job_id
+    assert jobs.get_job(job_id, database)['status'] == 'done'
+
+
+def test_job_fails_after_max_attempts(database):
+    job_id = jobs.enqueue_analysis('analyst', 'investor', 'AAPL', '1y', database=database)
+    claim(database)
+    database.r.hset(f"job:{job_id}", mapping={'attempts': 3, 'heartbeat': time.time() - 61})
+    assert jobs.requeue_stale(stale_after=60, max_attempts=3, database=database) == 0
+    job = jobs.get_job(job_id, database)
+    assert job['status'] == 'failed' and 'Gave up after 3 attempts' in job['error']
+    assert jobs.queue_stats(database) == {'queued': 0, 'running': 0}
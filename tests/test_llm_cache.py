@@ -0,0 +1,72 @@
+"""llm_cache.ResponseCache hits, paraphrase matches, misses and LRU eviction on fakeredis."""
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache
+from llm_cache import ResponseCache, normalize_question, similarity
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # A strictly increasing clock keeps the LRU order deterministic
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(llm_cache, 'time', SimpleNamespace(time=lambda: float(next(ticks))))
+    return ResponseCache(client=fakeredis.FakeRedis(decode_responses=True), max_entries=3)
+
+
+def test_exact_hit(cache):
+    cache.set('chat', 'AAPL', "What is the RSI?", "RSI is 55")
+    assert cache.get('chat', 'AAPL', "What is the RSI?") == "RSI is 55"
+    assert cache.stats()['hits'] == 1
+
+
+def test_paraphrase_is_a_near_hit(cache):
+    cache.set('chat', 'AAPL', "Is the RSI overbought?", "Not yet")
+    assert cache.get('chat', 'AAPL', "Is the RSI overbought right now?") == "Not yet"
+    assert cache.stats()['near_hits'] == 1
+
+
+def test_misses(cache):
+    cache.set('chat', 'AAPL', "What is the RSI indicating?", "Neutral")
+    # Another context, another indicator, another kind of call
+    assert cache.get('chat', 'MSFT', "What is the RSI indicating?") is None
+    assert cache.get('chat', 'AAPL', "What is the MACD indicating?") is None
+    assert cache.get('charts', 'AAPL', "What is the RSI indicating?") is None
+    stats = cache.stats()
+    assert stats['misses'] == 3 and stats['hit_rate'] == 0.0
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for ticker in ('A', 'B', 'C'):
+        cache.set('chat', ticker, "Should I buy?", f"answer {ticker}")
+    assert cache.get('chat', 'A', "Should I buy?") == "answer A"
+
+    cache.set('chat', 'D', "Should I buy?", "answer D")
+    assert cache.get('chat', 'B', "Should I buy?") is None
+    assert [cache.get('chat', t, "Should I buy?") for t in 'ACD'] == ["answer A", "answer C", "answer D"]
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['evictions'] == 1 and stats['stores'] == 4
+
+
+def test_clear(cache):
+    cache.set('chat', 'AAPL', "What is the RSI?", "RSI is 55")
+    assert cache.clear() > 0
+    assert cache.get('chat', 'AAPL', "What is the RSI?") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_redis_errors_are_misses(cache, caplog):
+    cache._client = SimpleNamespace()
+    assert cache.get('chat', 'AAPL', "What is the RSI?") is None
+    cache.set('chat', 'AAPL', "What is the RSI?", "RSI is 55")
+    assert "Error reading LLM cache" in caplog.text and "Error writing LLM cache" in caplog.text
+
+
+def test_key_terms_must_agree():
+    a, b = normalize_question("Is it a buy?"), normalize_question("Is it a sell?")
+    assert similarity(a, b) == 0.0
+    assert similarity(a, a) == 1.0
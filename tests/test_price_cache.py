@@ -0,0 +1,124 @@
+"""price_cache.PriceCache downloads, top-ups and eviction against an in-memory source."""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from price_cache import PriceCache, period_start
+
+
+class FakeSource:
+    """Serves slices of fixed frames and records every request.
+
+    Only the first ``visible`` bars of each frame exist yet; raising it
+    simulates new sessions arriving.
+    """
+
+    def __init__(self, frames, visible):
+        self.frames = frames
+        self.visible = visible
+        self.calls = []
+        self.fail = False
+
+    def _frame(self, ticker, period, start):
+        if self.fail:
+            raise ConnectionError("source down")
+        frame = self.frames.get(ticker, pd.DataFrame())[:self.visible]
+        if frame.empty:
+            return frame
+        since = pd.Timestamp(start) if start is not None else period_start(period).tz_localize(None)
+        return frame[frame.index.tz_localize(None) >= since]
+
+    def history(self, ticker, period=None, start=None, interval='1d'):
+        self.calls.append(('history', ticker, period, start))
+        return self._frame(ticker, period, start)
+
+    def history_many(self, tickers, period=None, start=None, interval='1d'):
+        self.calls.append(('history_many', tuple(tickers), period, start))
+        return {t: self._frame(t, period, start) for t in tickers}
+
+
+@pytest.fixture
+def source():
+    frames = {t: synthetic_ohlcv(t, 300) for t in ('AAA', 'BBB', 'CCC')}
+    return FakeSource(frames, visible=290)
+
+
+def expected(source, ticker, period='1y'):
+    return source._frame(ticker, period, None)
+
+
+def assert_bars_equal(actual, wanted):
+    pd.testing.assert_frame_equal(actual, wanted, check_dtype=False, check_names=False, check_freq=False)
+
+
+def test_first_get_downloads_then_serves_from_the_store(source):
+    cache = PriceCache(':memory:', source=source)
+    first = cache.get('aaa', '1y')
+    assert source.calls == [('history', 'AAA', '1y', None)]
+    assert_bars_equal(first, expected(source, 'AAA'))
+
+    assert_bars_equal(cache.get('AAA', '6mo'), expected(source, 'AAA', '6mo'))
+    assert len(source.calls) == 1
+
+
+def test_stale_entry_is_topped_up_from_the_last_cached_bar(source):
+    cache = PriceCache(':memory:', source=source, max_age=0)
+    cache.get('AAA', '1y')
+    last = expected(source, 'AAA').index[-1]
+
+    # New sessions arrive and the last cached bar is revised
+    source.frames['AAA'].loc[last, 'Close'] += 1.0
+    source.visible = 300
+    topped_up = cache.get('AAA', '1y')
+
+    assert source.calls[-1] == ('history', 'AAA', None, last.strftime('%Y-%m-%d'))
+    assert_bars_equal(topped_up, expected(source, 'AAA'))
+    assert topped_up.loc[last, 'Close'] == source.frames['AAA'].loc[last, 'Close']
+
+
+def test_failed_top_up_serves_cached_bars(source):
+    cache = PriceCache(':memory:', source=source, max_age=0)
+    cached = cache.get('AAA', '1y')
+    source.fail, source.visible = True, 300
+    assert_bars_equal(cache.get('AAA', '1y'), cached)
+
+
+def test_longer_period_downloads_again(source):
+    cache = PriceCache(':memory:', source=source)
+    cache.get('AAA', '6mo')
+    assert_bars_equal(cache.get('AAA', '1y'), expected(source, 'AAA'))
+    assert [call[2] for call in source.calls] == ['6mo', '1y']
+
+
+def test_get_many_batches_missing_and_stale_tickers(source):
+    cache = PriceCache(':memory:', source=source, max_age=0)
+    cache.get('AAA', '1y')
+    last = expected(source, 'AAA').index[-1]
+    source.visible = 300
+    frames = cache.get_many(['AAA', 'BBB', 'CCC', 'NONE'], '1y')
+
+    assert source.calls[1:] == [
+        ('history_many', ('BBB', 'CCC', 'NONE'), '1y', None),
+        ('history_many', ('AAA',), None, last.strftime('%Y-%m-%d')),
+    ]
+    for ticker in ('AAA', 'BBB', 'CCC'):
+        assert_bars_equal(frames[ticker], expected(source, ticker))
+    assert frames['NONE'].empty
+
+
+def test_least_recently_used_ticker_is_evicted(source):
+    bars = len(expected(source, 'AAA'))
+    cache = PriceCache(':memory:', source=source, max_bars=2 * bars)
+    for ticker in ('AAA', 'BBB', 'AAA', 'CCC'):
+        cache.get(ticker, '1y')
+    assert cache._meta('BBB') is None
+    assert cache._meta('AAA') is not None and cache._meta('CCC') is not None
+
+
+def test_invalidate_drops_every_interval(source):
+    cache = PriceCache(':memory:', source=source)
+    cache.get('AAA', '1y')
+    cache.invalidate('aaa')
+    assert cache._meta('AAA') is None
+    cache.get('AAA', '1y')
+    assert len(source.calls) == 2
@@ -0,0 +1,91 @@
+"""resample.py against pandas resample, and BarAggregator against one-shot resampling."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_minutes
+from resample import AGGREGATIONS, BarAggregator, resample_many, resample_ohlcv
+
+INTERVALS = ['5m', '15m', '30m', '1h', '4h', '1d']
+RULES = {'5m': '5min', '15m': '15min', '30m': '30min', '1h': '1h', '4h': '4h', '1d': '1D'}
+
+
+@pytest.fixture(scope='module')
+def minutes():
+    frame = synthetic_minutes('SYNA', 3, end='2025-03-07')
+    frame['Dividends'] = 0.0
+    frame['Stock Splits'] = 0.0
+    return frame
+
+
+def reference(frame, interval):
+    """pandas resample on exchange wall-clock time, intraday buckets from the 09:30 open."""
+    wall = frame.tz_localize(None)
+    offset = None if interval == '1d' else '9h30min'
+    bars = wall.resample(RULES[interval], offset=offset).agg(AGGREGATIONS).dropna(subset=['Close'])
+    bars.index = bars.index.tz_localize(frame.index.tz)
+    bars.index.name = 'Date'
+    return bars
+
+
+def assert_bars_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False, check_freq=False)
+
+
+@pytest.mark.parametrize('interval', INTERVALS)
+def test_matches_pandas(minutes, interval):
+    assert_bars_equal(resample_ohlcv(minutes, interval), reference(minutes, interval))
+
+
+def test_resample_many_matches_single_frames(minutes):
+    frames = {
+        'SYNA': minutes,
+        'SYNB': synthetic_minutes('SYNB', 2, end='2025-03-07'),
+        'LON': synthetic_minutes('LON', 2, end='2025-03-07').tz_convert('Europe/London'),
+        'EMPTY': pd.DataFrame(),
+    }
+    result = resample_many(frames, INTERVALS)
+    for interval in INTERVALS:
+        assert result[interval]['EMPTY'].empty
+        for ticker in ('SYNA', 'SYNB', 'LON'):
+            assert_bars_equal(result[interval][ticker], resample_ohlcv(frames[ticker], interval))
+
+
+def test_nan_closes_are_dropped(minutes):
+    gappy = minutes.copy()
+    gappy.iloc[5:400, gappy.columns.get_loc('Close')] = np.nan
+    assert_bars_equal(resample_ohlcv(gappy, '1h'), resample_ohlcv(minutes.drop(minutes.index[5:400]), '1h'))
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 390])
+def test_bar_aggregator_matches_one_shot(minutes, chunk):
+    aggregator = BarAggregator(INTERVALS)
+    closed = dict.fromkeys(INTERVALS, 0)
+    for start in range(0, len(minutes), chunk):
+        for interval, count in aggregator.update(minutes.iloc[start:start + chunk]).items():
+            closed[interval] += count
+    for interval in INTERVALS:
+        expected = resample_ohlcv(minutes, interval)
+        assert_bars_equal(aggregator.frame(interval), expected)
+        # Only the last bucket is still open
+        assert closed[interval] == len(expected) - 1
+        assert_bars_equal(aggregator.frame(interval, include_open=False), expected.iloc[:-1])
+
+
+def test_bar_aggregator_revises_the_forming_bar(minutes):
+    aggregator = BarAggregator(['5m', '1h'])
+    aggregator.update(minutes.iloc[:100])
+    # A provisional copy of the next bar, then the final one
+    provisional = minutes.iloc[100:101].copy()
+    provisional[['High', 'Close']] *= 1.05
+    aggregator.update(provisional)
+    aggregator.update(minutes.iloc[100:200])
+    for interval in ('5m', '1h'):
+        assert_bars_equal(aggregator.frame(interval), resample_ohlcv(minutes.iloc[:200], interval))
+
+
+def test_bar_aggregator_max_bars(minutes):
+    aggregator = BarAggregator(['5m'], max_bars=10)
+    for start in range(0, len(minutes), 50):
+        aggregator.update(minutes.iloc[start:start + 50])
+    assert_bars_equal(aggregator.frame('5m'), resample_ohlcv(minutes, '5m').iloc[-10:])
@@ -0,0 +1,83 @@
+"""streaming.IndicatorState against the batch kernel in indicators.compute_indicators."""
+import json
+
+import numpy as np
+import pytest
+
+from indicators import INDICATOR_COLUMNS, compute_indicators
+from streaming import IndicatorState
+
+from tests.test_indicators import prices
+
+ROW_COLUMNS = ['RSI', 'BB_Upper', 'BB_Lower', 'SMA_50', 'SMA_200', 'MACD', 'Signal_Line']
+
+
+def as_row(state):
+    return [state.current[column] for column in ROW_COLUMNS]
+
+
+def assert_row_matches(state, expected, scale):
+    actual = np.array(as_row(state))
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    valid = ~np.isnan(expected)
+    np.testing.assert_allclose(actual[valid], expected[valid], rtol=1e-9, atol=1e-12 * scale)
+
+
+def test_row_columns_follow_the_kernel():
+    assert len(ROW_COLUMNS) == len(INDICATOR_COLUMNS)
+    assert set(ROW_COLUMNS) < set(IndicatorState().current)
+
+
+@pytest.mark.parametrize('n', [10, 60, 250, 1000])
+def test_update_matches_batch(n):
+    close = prices(n, seed=n)
+    expected = compute_indicators(close)
+    state = IndicatorState()
+    for i, x in enumerate(close):
+        state.update(float(x))
+        assert_row_matches(state, expected[i], close.max())
+    assert state.bars == n and state.current['Close'] == close[-1]
+
+
+def test_replace_revises_the_latest_bar():
+    # Every bar is first seen at a provisional price and then revised twice
+    close = prices(400, seed=3)
+    expected = compute_indicators(close)
+    state = IndicatorState()
+    for i, x in enumerate(close):
+        state.update(float(x) * 1.01)
+        state.update(float(x) * 0.98, replace=True)
+        state.update(float(x), replace=True)
+        assert_row_matches(state, expected[i], close.max())
+    assert state.bars == len(close)
+
+
+def test_from_history_matches_batch():
+    close = prices(300, seed=5)
+    state = IndicatorState.from_history(close)
+    assert_row_matches(state, compute_indicators(close)[-1], close.max())
+
+
+def test_json_round_trip_continues_the_stream():
+    close = prices(500, seed=11)
+    expected = compute_indicators(close)
+    state = IndicatorState.from_history(close[:250])
+    for i in range(250, len(close)):
+        state = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+        state.update(float(close[i]) + 1.0)
+        state = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+        state.update(float(close[i]), replace=True)
+        assert_row_matches(state, expected[i], close.max())
+
+
+def test_flat_run_far_from_first_close():
+    # The running sums are relative to the first close, so a nearly flat run
+    # far from it cancels in the variance unless the window is recomputed
+    flat = 51234.567 + np.random.default_rng(2).normal(0, 1e-4, 60)
+    close = np.concatenate([prices(300, seed=1), flat])
+    expected = compute_indicators(close)
+    state = IndicatorState()
+    for i, x in enumerate(close):
+        state.update(float(x))
+        assert_row_matches(state, expected[i], close.max())
+    assert state.current['BB_Upper'] - state.current['BB_Lower'] == pytest.approx(4 * flat[-20:].std())
@@ -0,0 +1,75 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import metrics
+from jobs import process_next, requeue_stale, STALE_AFTER
+
+logger = logging.getLogger(__name__)
+
+# How often each worker looks for jobs lost with a crashed worker
+REQUEUE_EVERY = 60
+
+
+def work(name, stop, max_jobs=None, index=0):
+    """Run queued analysis jobs until ``stop`` is set or ``max_jobs`` are done."""
+    # Spawned processes start with logging unconfigured
+    logging.basicConfig(level=logging.INFO)
+    # Ctrl+C goes to the whole process group; let the parent coordinate shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # One metrics port per worker process: METRICS_PORT + index
+    metrics.start_exporter(port_offset=index)
+    # Load the analysis stack now rather than on the first job
+    import pipeline  # noqa: F401
+    done = 0
+    last_requeue = 0.0
+    while not stop.is_set() and (max_jobs is None or done < max_jobs):
+        try:
+            if time.monotonic() - last_requeue >= REQUEUE_EVERY:
+                last_requeue = time.monotonic()
+                requeue_stale(STALE_AFTER)
+            if process_next(name, timeout=1) is not None:
+                done += 1
+        except Exception as e:
+            # Redis hiccups shouldn't kill the worker
+            logger.error(f"Worker {name} error: {str(e)}")
+            time.sleep(1)
+    logger.info(f"Worker {name} stopped after {done} jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run analysis jobs queued by the web app")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('ANALYSIS_WORKERS', '2')),
+                        help="Worker processes")
+    parser.add_argument('--max-jobs', type=int, help="Exit each worker after this many jobs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Each worker imports the app modules and opens its own Redis connections
+    ctx = multiprocessing.get_context('spawn')
+    stop = ctx.Event()
+    host = socket.gethostname()
+    processes = [
+        ctx.Process(target=work, args=(f"{host}:{os.getpid()}:{i}", stop, args.max_jobs, i),
+                    name=f"worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {args.workers} workers")
+
+    def shutdown(signum, frame):
+        logger.info("Stopping workers after their current job")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()